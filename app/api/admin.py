@@ -0,0 +1,129 @@
+import json
+import tempfile
+from typing import BinaryIO
+
+import asyncpg
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.core.config import (
+    BULK_INVITE_RATE_PER_SECOND,
+    BULK_INVITE_TTL_MINUTES,
+    BULK_PROVISION_MAX_BYTES,
+)
+from app.db import get_db_pool
+from app.services.bulk_invites import (
+    bulk_invite_progress,
+    count_invite_rows,
+    create_bulk_invite,
+    read_invite_emails,
+    run_bulk_invite,
+)
+from app.services.user_provisioning import CSV_TYPES, NDJSON_TYPES, provision_users, read_csv, read_ndjson
+from app.utils.auth_dependency import require_admin
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+# uploads beyond this are spooled to disk rather than held in memory
+SPOOL_MAX_MEMORY_BYTES = 1024 * 1024
+
+
+def _content_type(request: Request) -> str:
+    return request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+
+async def _spool_upload(request: Request) -> BinaryIO:
+    """The request body in a file, up to BULK_PROVISION_MAX_BYTES; the caller closes it."""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY_BYTES)
+    try:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > BULK_PROVISION_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Upload larger than {BULK_PROVISION_MAX_BYTES} bytes")
+            spool.write(chunk)
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
+    return spool
+
+
+@router.post("/users/bulk")
+async def bulk_create_users(request: Request):
+    """
+    Create users from an NDJSON (application/x-ndjson) or CSV (text/csv)
+    upload with email, phone and password fields. Streams one NDJSON
+    result per row as each finishes, in completion order with the input
+    line number, then a summary line with counts and throughput.
+    """
+    content_type = _content_type(request)
+    if content_type in CSV_TYPES:
+        read_rows = read_csv
+    elif content_type in NDJSON_TYPES:
+        read_rows = read_ndjson
+    else:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson")
+
+    # the whole upload is taken before results start: most clients do not
+    # read a response while still sending the request body
+    spool = await _spool_upload(request)
+
+    async def results():
+        try:
+            async for result in provision_users(read_rows(spool)):
+                yield json.dumps(result) + "\n"
+        finally:
+            spool.close()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@router.post("/invitations")
+async def bulk_invite(
+    request: Request,
+    purpose: str = Query("register"),
+    ttl_minutes: int = Query(BULK_INVITE_TTL_MINUTES),
+    rate_per_second: float = Query(BULK_INVITE_RATE_PER_SECOND),
+    job_id: int | None = Query(None, description="Resume this job with the same upload"),
+    pool: asyncpg.pool.Pool = Depends(get_db_pool),
+):
+    """
+    Issue OTP codes to every address in a text/plain (one per line), CSV
+    (email column) or NDJSON upload and queue the emails, sent at
+    `rate_per_second` by the outbox worker. Returns the job's progress.
+    If the request fails part way, post the same upload again with the
+    job's `id` as `job_id`: rows already committed are skipped. A list that
+    cannot be sent at that rate before its codes' partition is dropped is
+    refused with 400 before any code is issued.
+    """
+    content_type = _content_type(request)
+    if content_type == "text/plain":
+        kind = "text"
+    elif content_type in CSV_TYPES:
+        kind = "csv"
+    elif content_type in NDJSON_TYPES:
+        kind = "ndjson"
+    else:
+        raise HTTPException(status_code=415, detail="Send text/plain, text/csv or application/x-ndjson")
+
+    with await _spool_upload(request) as spool:
+        try:
+            total_rows = count_invite_rows(spool, kind)
+            if job_id is None:
+                async with pool.acquire() as conn:
+                    job_id = await create_bulk_invite(conn, purpose, ttl_minutes, rate_per_second, source="api")
+            return await run_bulk_invite(pool, job_id, read_invite_emails(spool, kind), total_rows)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/invitations/{job_id}")
+async def bulk_invite_status(job_id: int, pool: asyncpg.pool.Pool = Depends(get_db_pool)):
+    async with pool.acquire() as conn:
+        progress = await bulk_invite_progress(conn, job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Bulk invite not found")
+    return progress
@@ -1,20 +1,47 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Body, HTTPException
 import app.services.supabase_service as supabase_service
+from app.core.config import INTROSPECT_MAX_TOKENS
+from app.utils.auth_dependency import require_verification_key, verify_token
 
 router = APIRouter(prefix="/api/auth", tags=["Auth"])
 
 @router.get("/register", response_model=dict)
 async def register(email: str | None, phone: str | None, password: str):
-    token = supabase_service.register(email, phone, password)
+    token = await supabase_service.register(email, phone, password)
     return token
 
 @router.get("/login", response_model=dict)
 async def login(email: str, password: str):
-    access_token = supabase_service.login(email, password)
+    access_token = await supabase_service.login(email, password)
     return access_token
 
 @router.get("/refresh", response_model=dict)
 async def refresh(refresh_token: str):
-    refresh_token = supabase_service.refresh(refresh_token)
+    refresh_token = await supabase_service.refresh(refresh_token)
     return refresh_token
 
+@router.post("/introspect", response_model=list)
+async def introspect(tokens: list[str] = Body(...)):
+    """
+    Validate a batch of bearer tokens (JSON array) in one call.
+    Returns one entry per input token, in order: the claims when the token
+    is valid, or the reason it was rejected. Duplicates are decoded once.
+    """
+    if len(tokens) > INTROSPECT_MAX_TOKENS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {INTROSPECT_MAX_TOKENS} tokens per request",
+        )
+    # one 503 for the batch rather than every token reported inactive
+    require_verification_key()
+
+    results: dict[str, dict] = {}
+    for token in tokens:
+        if token in results:
+            continue
+        try:
+            results[token] = {"active": True, "claims": verify_token(token)}
+        except HTTPException as e:
+            results[token] = {"active": False, "error": e.detail}
+
+    return [results[token] for token in tokens]
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
-import asyncpg
+from fastapi import APIRouter, Depends, HTTPException, Query
 
-from app.db import get_db_pool
+from app.services.otp_store import OtpStore, get_otp_store
+from app.services.rate_limiter import limit_otp_start
+from app.utils.idempotency import IdempotencyRoute
+from app.utils.otp_utils import OTP_LENGTH
 from app.services.email_otp_service import (
     start_register_with_email_otp,
     complete_register_with_email_otp,
@@ -9,28 +11,31 @@ from app.services.email_otp_service import (
     complete_login_with_email_otp,
 )
 
-router = APIRouter(prefix="/api/auth/otp", tags=["Auth OTP"])
+router = APIRouter(prefix="/api/auth/otp", tags=["Auth OTP"], route_class=IdempotencyRoute)
 
+# malformed codes are refused before they reach the OTP checks
+OTP_PATTERN = rf"^[0-9]{{{OTP_LENGTH}}}$"
 
-@router.post("/register/start")
+
+@router.post("/register/start", dependencies=[Depends(limit_otp_start)])
 async def start_register(
     email: str,
     password: str,
-    pool: asyncpg.pool.Pool = Depends(get_db_pool),
+    store: OtpStore = Depends(get_otp_store),
 ):
-    return await start_register_with_email_otp(pool=pool, email=email, password=password)
+    return await start_register_with_email_otp(store=store, email=email, password=password)
 
 
 @router.post("/register/complete")
 async def finish_register(
     email: str,
     password: str,
-    otp: str,
-    pool: asyncpg.pool.Pool = Depends(get_db_pool),
+    otp: str = Query(pattern=OTP_PATTERN),
+    store: OtpStore = Depends(get_otp_store),
 ):
     try:
         user = await complete_register_with_email_otp(
-            pool=pool,
+            store=store,
             email=email,
             password=password,
             otp=otp,
@@ -41,27 +46,29 @@ async def finish_register(
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.post("/login/start")
+@router.post("/login/start", dependencies=[Depends(limit_otp_start)])
 async def start_login(
     email: str,
-    pool: asyncpg.pool.Pool = Depends(get_db_pool),
+    store: OtpStore = Depends(get_otp_store),
 ):
-    return await start_login_with_email_otp(pool=pool, email=email)
+    return await start_login_with_email_otp(store=store, email=email)
 
 
 @router.post("/login/complete")
 async def finish_login(
     email: str,
-    otp: str,
+    otp: str = Query(pattern=OTP_PATTERN),
     new_password: str | None = None,
-    pool: asyncpg.pool.Pool = Depends(get_db_pool),
+    nonce: str | None = None,     # returned by /login/start in stateless mode
+    store: OtpStore = Depends(get_otp_store),
 ):
     try:
         result = await complete_login_with_email_otp(
-            pool=pool,
+            store=store,
             email=email,
             otp=otp,
             new_password=new_password,
+            nonce=nonce,
         )
         return result
     except ValueError as e:
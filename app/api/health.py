@@ -1,6 +1,65 @@
 from fastapi import APIRouter
+
+from app import db
+from app.db import acquire_stats, pool_gauges
+from app.services.email_outbox import queue_stats, workers
+from app.services.email_service import smtp_pool
+from app.services import otp_store, rate_limiter, supabase_service
+from app.utils import jwks
+from app.utils.auth_dependency import token_cache
+from app.utils.executors import executors
+from app.utils.idempotency import idempotency_store
+
 router = APIRouter(prefix="/api/health", tags=["API Health"])
 
 @router.get("/")
 async def health():
-    return {"ok": True, "service": "ai-labs-tn-api"}
\ No newline at end of file
+    return {"ok": True, "service": "ai-labs-tn-api"}
+
+@router.get("/outbox")
+async def outbox():
+    """
+    Email outbox depth, lag and this replica's worker counters. The memory
+    OTP store runs without a database, and so without an outbox.
+    """
+    if db.pool is None:
+        return {"backend": "memory"}
+    stats = await queue_stats(db.pool)
+    stats["workers"] = {w.name: {"sent": w.sent, "failed": w.failed} for w in workers}
+    return stats
+
+@router.get("/db")
+async def db_stats():
+    """Pool gauges, and acquire wait per route from the request-scoped connections."""
+    return {"pool": pool_gauges.stats(db.pool), "acquire_wait": acquire_stats.stats()}
+
+@router.get("/upstream")
+async def upstream():
+    """Supabase call protection: concurrency limit, retry budget, breakers and refresh coalescing."""
+    return {**supabase_service.supabase_guard.stats(), "refresh": supabase_service.refresh_flight.stats()}
+
+@router.get("/executors")
+async def executor_stats():
+    """Queue depth, rejections and latency of the executors for blocking calls."""
+    return {name: executor.stats() for name, executor in executors.items()}
+
+@router.get("/auth")
+async def auth_stats():
+    """Verified-token cache and JWKS refreshes (null without a JWKS URL)."""
+    key_set = jwks.key_set
+    return {"token_cache": token_cache.stats(), "jwks": key_set.stats() if key_set else None}
+
+@router.get("/smtp")
+async def smtp_stats():
+    """SMTP connection reuse, reconnects and send failures."""
+    return smtp_pool.stats()
+
+@router.get("/otp")
+async def otp_stats():
+    """OTP store, start rate limiter and idempotent replay counters (null before startup)."""
+    store, limiter = otp_store.otp_store, rate_limiter.rate_limiter
+    return {
+        "store": store.stats() if store else None,
+        "rate_limiter": limiter.stats() if limiter else None,
+        "idempotency": idempotency_store.stats(),
+    }
@@ -5,4 +5,159 @@ CORS_ORIGIN = os.getenv("ROOTS_VISION_AI_CORS_ORIGIN", "http://localhost:4200")
 SUPABASE_URL = os.getenv("ROOTS_VISION_AI_SB_URL", "")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("ROOTS_VISION_AI_SB_SR_KEY", "")
 SUPABASE_JWT_SECRET = os.getenv("ROOTS_VISION_AI_SB_JWT_SECRET", "")
-AUTH_DB_URL = os.getenv("ROOTS_VISION_AI_AUTH_DB_URL", "")
\ No newline at end of file
+AUTH_DB_URL = os.getenv("ROOTS_VISION_AI_AUTH_DB_URL", "")
+
+# asyncpg pool. Requests give up with 503 once the acquire timeout passes,
+# or straight away when more than DB_MAX_ACQUIRE_WAITERS are already queued.
+DB_POOL_MIN_SIZE = int(os.getenv("ROOTS_VISION_AI_DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("ROOTS_VISION_AI_DB_POOL_MAX_SIZE", "10"))
+DB_POOL_ACQUIRE_TIMEOUT_SECONDS = float(os.getenv("ROOTS_VISION_AI_DB_POOL_ACQUIRE_TIMEOUT_SECONDS", "2"))
+DB_MAX_ACQUIRE_WAITERS = int(os.getenv("ROOTS_VISION_AI_DB_MAX_ACQUIRE_WAITERS", "50"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("ROOTS_VISION_AI_DB_STATEMENT_CACHE_SIZE", "100"))
+DB_MAX_INACTIVE_CONNECTION_LIFETIME_SECONDS = float(
+    os.getenv("ROOTS_VISION_AI_DB_MAX_INACTIVE_CONNECTION_LIFETIME_SECONDS", "300")
+)
+
+# Set when AUTH_DB_URL points at PgBouncer in transaction pooling mode:
+# asyncpg's statement cache and session reset are turned off, and only the
+# hot OTP queries stay prepared (needs PgBouncer >= 1.21 with
+# max_prepared_statements > 0; otherwise they fall back to unnamed statements)
+DB_PGBOUNCER_TRANSACTION_MODE = os.getenv("ROOTS_VISION_AI_DB_PGBOUNCER_TRANSACTION_MODE", "false").lower() == "true"
+
+# Shared outbound HTTP client (Supabase)
+SUPABASE_HTTP_TIMEOUT = float(os.getenv("ROOTS_VISION_AI_SB_HTTP_TIMEOUT", "10"))
+SUPABASE_HTTP_CONNECT_TIMEOUT = float(os.getenv("ROOTS_VISION_AI_SB_HTTP_CONNECT_TIMEOUT", "5"))
+SUPABASE_HTTP_MAX_CONNECTIONS = int(os.getenv("ROOTS_VISION_AI_SB_HTTP_MAX_CONNECTIONS", "20"))
+SUPABASE_HTTP_MAX_KEEPALIVE = int(os.getenv("ROOTS_VISION_AI_SB_HTTP_MAX_KEEPALIVE", "20"))
+SUPABASE_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("ROOTS_VISION_AI_SB_HTTP_KEEPALIVE_EXPIRY", "30"))
+
+# Supabase call protection (app/utils/resilience.py). Timeouts are per
+# attempt; only login, which is safe to repeat, is retried. The breaker is
+# per endpoint; the concurrency limit and retry budget cover all of Supabase.
+SUPABASE_LOGIN_TIMEOUT_SECONDS = float(os.getenv("ROOTS_VISION_AI_SB_LOGIN_TIMEOUT_SECONDS", "5"))
+SUPABASE_REFRESH_TIMEOUT_SECONDS = float(os.getenv("ROOTS_VISION_AI_SB_REFRESH_TIMEOUT_SECONDS", "5"))
+SUPABASE_REGISTER_TIMEOUT_SECONDS = float(os.getenv("ROOTS_VISION_AI_SB_REGISTER_TIMEOUT_SECONDS", "10"))
+SUPABASE_BREAKER_FAILURE_RATIO = float(os.getenv("ROOTS_VISION_AI_SB_BREAKER_FAILURE_RATIO", "0.5"))
+SUPABASE_BREAKER_WINDOW = int(os.getenv("ROOTS_VISION_AI_SB_BREAKER_WINDOW", "20"))
+SUPABASE_BREAKER_MIN_CALLS = int(os.getenv("ROOTS_VISION_AI_SB_BREAKER_MIN_CALLS", "10"))
+SUPABASE_BREAKER_OPEN_SECONDS = float(os.getenv("ROOTS_VISION_AI_SB_BREAKER_OPEN_SECONDS", "10"))
+SUPABASE_RETRY_BUDGET_RATIO = float(os.getenv("ROOTS_VISION_AI_SB_RETRY_BUDGET_RATIO", "0.1"))
+SUPABASE_RETRY_MIN_PER_SECOND = float(os.getenv("ROOTS_VISION_AI_SB_RETRY_MIN_PER_SECOND", "1"))
+SUPABASE_MAX_ATTEMPTS = int(os.getenv("ROOTS_VISION_AI_SB_MAX_ATTEMPTS", "2"))
+SUPABASE_CONCURRENCY_INITIAL = int(os.getenv("ROOTS_VISION_AI_SB_CONCURRENCY_INITIAL", "10"))
+SUPABASE_CONCURRENCY_MIN = int(os.getenv("ROOTS_VISION_AI_SB_CONCURRENCY_MIN", "2"))
+SUPABASE_CONCURRENCY_MAX = int(os.getenv("ROOTS_VISION_AI_SB_CONCURRENCY_MAX", str(SUPABASE_HTTP_MAX_CONNECTIONS)))
+SUPABASE_CONCURRENCY_SLOW_SECONDS = float(os.getenv("ROOTS_VISION_AI_SB_CONCURRENCY_SLOW_SECONDS", "1"))
+
+# /api/auth/refresh coalescing: how long a rotated token pair is replayed to
+# late duplicates of the same refresh token, and how many pairs are kept.
+REFRESH_RESULT_TTL_SECONDS = float(os.getenv("ROOTS_VISION_AI_REFRESH_RESULT_TTL_SECONDS", "5"))
+REFRESH_RESULT_MAX_ENTRIES = int(os.getenv("ROOTS_VISION_AI_REFRESH_RESULT_MAX_ENTRIES", "10000"))
+
+# Bearer token verification cache (entries expire at the token's `exp`)
+TOKEN_CACHE_ENABLED = os.getenv("ROOTS_VISION_AI_TOKEN_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("ROOTS_VISION_AI_TOKEN_CACHE_MAX_ENTRIES", "50000"))
+
+# Asymmetric (RS256/ES256) token verification. Either an https:// JWKS URL
+# (e.g. <SUPABASE_URL>/auth/v1/.well-known/jwks.json) or a file:// path;
+# empty disables it and only HS256 tokens signed with the JWT secret verify.
+SUPABASE_JWKS_URL = os.getenv("ROOTS_VISION_AI_SB_JWKS_URL", "")
+JWKS_REFRESH_SECONDS = float(os.getenv("ROOTS_VISION_AI_JWKS_REFRESH_SECONDS", "300"))
+JWKS_MIN_REFRESH_SECONDS = float(os.getenv("ROOTS_VISION_AI_JWKS_MIN_REFRESH_SECONDS", "30"))
+
+# POST /api/auth/introspect: maximum tokens accepted in one batch
+INTROSPECT_MAX_TOKENS = int(os.getenv("ROOTS_VISION_AI_INTROSPECT_MAX_TOKENS", "500"))
+
+# Admin routes accept service_role tokens and users whose app_metadata.role is this
+ADMIN_ROLE = os.getenv("ROOTS_VISION_AI_ADMIN_ROLE", "admin")
+
+# POST /api/admin/users/bulk: Supabase calls in flight per upload (kept within
+# BULK_PROVISION_UPSTREAM_SHARE of SUPABASE_CONCURRENCY_INITIAL, so rows are only
+# refused once the limit has backed off), retries of rows refused locally with
+# 503 (the call was never sent), and upload size cap
+BULK_PROVISION_CONCURRENCY = int(os.getenv("ROOTS_VISION_AI_BULK_PROVISION_CONCURRENCY", "4"))
+BULK_PROVISION_MAX_RETRIES = int(os.getenv("ROOTS_VISION_AI_BULK_PROVISION_MAX_RETRIES", "3"))
+BULK_PROVISION_MAX_BYTES = int(os.getenv("ROOTS_VISION_AI_BULK_PROVISION_MAX_BYTES", str(64 * 1024 * 1024)))
+# Bulk rows may only use this share of the Supabase concurrency limit, so
+# interactive register/login/refresh keep the rest while an upload runs
+BULK_PROVISION_UPSTREAM_SHARE = float(os.getenv("ROOTS_VISION_AI_BULK_PROVISION_UPSTREAM_SHARE", "0.5"))
+
+# Email outbox: OTP emails are queued in Postgres with the OTP row and sent by
+# background workers (safe across replicas via FOR UPDATE SKIP LOCKED).
+EMAIL_OUTBOX_WORKERS = int(os.getenv("ROOTS_VISION_AI_EMAIL_OUTBOX_WORKERS", "4"))
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv("ROOTS_VISION_AI_EMAIL_OUTBOX_BATCH_SIZE", "10"))
+EMAIL_OUTBOX_POLL_SECONDS = float(os.getenv("ROOTS_VISION_AI_EMAIL_OUTBOX_POLL_SECONDS", "1"))
+# must outlast a whole batch of sends at the SMTP timeout (checked at startup)
+EMAIL_OUTBOX_LEASE_SECONDS = float(os.getenv("ROOTS_VISION_AI_EMAIL_OUTBOX_LEASE_SECONDS", "300"))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("ROOTS_VISION_AI_EMAIL_OUTBOX_MAX_ATTEMPTS", "8"))
+EMAIL_OUTBOX_BACKOFF_BASE_SECONDS = float(os.getenv("ROOTS_VISION_AI_EMAIL_OUTBOX_BACKOFF_BASE_SECONDS", "2"))
+EMAIL_OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv("ROOTS_VISION_AI_EMAIL_OUTBOX_BACKOFF_MAX_SECONDS", "600"))
+
+# Key for the HMAC stored in email_otp.otp_hash (codes are never stored raw)
+OTP_HASH_SECRET = os.getenv("ROOTS_VISION_AI_OTP_HASH_SECRET", "")
+
+# email_otp partition maintenance: daily partitions created ahead of time (by
+# the app at startup and every check interval, and by run_otp_maintenance.py),
+# and whole days kept before run_otp_maintenance.py drops a partition
+OTP_PARTITION_DAYS_AHEAD = int(os.getenv("ROOTS_VISION_AI_OTP_PARTITION_DAYS_AHEAD", "14"))
+OTP_PARTITION_RETENTION_DAYS = int(os.getenv("ROOTS_VISION_AI_OTP_PARTITION_RETENTION_DAYS", "2"))
+OTP_PARTITION_CHECK_SECONDS = float(os.getenv("ROOTS_VISION_AI_OTP_PARTITION_CHECK_SECONDS", "3600"))
+
+# Bulk OTP invitations (POST /api/admin/invitations, run_bulk_invite.py): input
+# rows per COPY transaction, default send rate through the outbox, and how long
+# each code stays valid after its scheduled send (at most the partition retention)
+BULK_INVITE_CHUNK_SIZE = int(os.getenv("ROOTS_VISION_AI_BULK_INVITE_CHUNK_SIZE", "5000"))
+BULK_INVITE_RATE_PER_SECOND = float(os.getenv("ROOTS_VISION_AI_BULK_INVITE_RATE_PER_SECOND", "20"))
+BULK_INVITE_TTL_MINUTES = int(os.getenv("ROOTS_VISION_AI_BULK_INVITE_TTL_MINUTES", "1440"))
+
+# Stateless OTP mode: for these purposes (comma separated; only "login" is
+# supported, checked at startup) the code is derived as
+# HMAC(secret, email|purpose|issued_at|nonce), so start writes nothing to the
+# DB and complete is pure CPU.
+OTP_STATELESS_PURPOSES = frozenset(
+    p.strip() for p in os.getenv("ROOTS_VISION_AI_OTP_STATELESS_PURPOSES", "").split(",") if p.strip()
+)
+OTP_STATELESS_SECRET = os.getenv("ROOTS_VISION_AI_OTP_STATELESS_SECRET", "")
+
+# OTP storage backend: "postgres" (email_otp table + outbox) or "memory"
+# (single process, no database; codes are lost on restart)
+OTP_STORE = os.getenv("ROOTS_VISION_AI_OTP_STORE", "postgres")
+OTP_MEMORY_TICK_SECONDS = float(os.getenv("ROOTS_VISION_AI_OTP_MEMORY_TICK_SECONDS", "1"))
+
+# OTP attempt limiting: a code is locked after this many wrong guesses.
+# Locked email+purpose pairs are remembered in-process for a short while so
+# repeat guesses are rejected without a DB round trip.
+OTP_MAX_ATTEMPTS = int(os.getenv("ROOTS_VISION_AI_OTP_MAX_ATTEMPTS", "5"))
+OTP_LOCKOUT_CACHE_SECONDS = float(os.getenv("ROOTS_VISION_AI_OTP_LOCKOUT_CACHE_SECONDS", "60"))
+OTP_LOCKOUT_CACHE_MAX_ENTRIES = int(os.getenv("ROOTS_VISION_AI_OTP_LOCKOUT_CACHE_MAX_ENTRIES", "100000"))
+
+# OTP start rate limits (sliding window, per email / client IP / global).
+# Each worker leases up to *_LEASE tokens at a time from the shared
+# Postgres counter and answers from its local allotment until it runs out.
+RATE_LIMIT_ENABLED = os.getenv("ROOTS_VISION_AI_RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_EMAIL_LIMIT = int(os.getenv("ROOTS_VISION_AI_RATE_LIMIT_EMAIL_LIMIT", "5"))
+RATE_LIMIT_EMAIL_WINDOW_SECONDS = int(os.getenv("ROOTS_VISION_AI_RATE_LIMIT_EMAIL_WINDOW_SECONDS", "600"))
+RATE_LIMIT_IP_LIMIT = int(os.getenv("ROOTS_VISION_AI_RATE_LIMIT_IP_LIMIT", "30"))
+RATE_LIMIT_IP_WINDOW_SECONDS = int(os.getenv("ROOTS_VISION_AI_RATE_LIMIT_IP_WINDOW_SECONDS", "600"))
+RATE_LIMIT_IP_LEASE = int(os.getenv("ROOTS_VISION_AI_RATE_LIMIT_IP_LEASE", "1"))
+RATE_LIMIT_GLOBAL_LIMIT = int(os.getenv("ROOTS_VISION_AI_RATE_LIMIT_GLOBAL_LIMIT", "1000"))
+RATE_LIMIT_GLOBAL_WINDOW_SECONDS = int(os.getenv("ROOTS_VISION_AI_RATE_LIMIT_GLOBAL_WINDOW_SECONDS", "60"))
+RATE_LIMIT_GLOBAL_LEASE = int(os.getenv("ROOTS_VISION_AI_RATE_LIMIT_GLOBAL_LEASE", "20"))
+# Proxies in front of the app that append to the forwarded header (0: use
+# the peer address). The client IP is the entry this many hops from the
+# right; anything further left is client-supplied and not trusted.
+RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv("ROOTS_VISION_AI_RATE_LIMIT_TRUSTED_PROXIES", "0"))
+RATE_LIMIT_FORWARDED_HEADER = os.getenv("ROOTS_VISION_AI_RATE_LIMIT_FORWARDED_HEADER", "x-forwarded-for")
+
+# A repeat OTP start for the same email+purpose within this many seconds of
+# the last code reuses that code and sends no new email (0 disables)
+OTP_RESEND_COOLDOWN_SECONDS = float(os.getenv("ROOTS_VISION_AI_OTP_RESEND_COOLDOWN_SECONDS", "60"))
+
+# Idempotency-Key replay store for the auth OTP routes (per process)
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("ROOTS_VISION_AI_IDEMPOTENCY_TTL_SECONDS", "3600"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("ROOTS_VISION_AI_IDEMPOTENCY_MAX_ENTRIES", "10000"))
+
+# Per-request Server-Timing header (total, db, http, smtp). Off by default:
+# the breakdown tells any client how long the DB and Supabase took, which on
+# the login routes can hint at whether an account exists. For local profiling.
+METRICS_SERVER_TIMING = os.getenv("ROOTS_VISION_AI_METRICS_SERVER_TIMING", "false").lower() == "true"
@@ -0,0 +1,70 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from app.core.config import (
+    SUPABASE_HTTP_TIMEOUT,
+    SUPABASE_HTTP_CONNECT_TIMEOUT,
+    SUPABASE_HTTP_MAX_CONNECTIONS,
+    SUPABASE_HTTP_MAX_KEEPALIVE,
+    SUPABASE_HTTP_KEEPALIVE_EXPIRY,
+)
+
+client: httpx.AsyncClient | None = None
+
+
+class PooledAsyncClient(httpx.AsyncClient):
+    """
+    httpx client that queues excess requests on a semaphore sized to the
+    connection pool instead of inside httpcore, whose pool rescans every
+    connection for every waiting request (quadratic under bursts).
+    """
+
+    def __init__(self, *, max_in_flight: int, **kwargs):
+        super().__init__(**kwargs)
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+
+    async def send(self, request: httpx.Request, **kwargs) -> httpx.Response:
+        async with self._in_flight:
+            return await super().send(request, **kwargs)
+
+
+def build_http_client() -> httpx.AsyncClient:
+    """
+    Build the shared keep-alive client used for outbound Supabase calls.
+    """
+    return PooledAsyncClient(
+        max_in_flight=SUPABASE_HTTP_MAX_CONNECTIONS,
+        limits=httpx.Limits(
+            max_connections=SUPABASE_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=SUPABASE_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=SUPABASE_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            SUPABASE_HTTP_TIMEOUT,
+            connect=SUPABASE_HTTP_CONNECT_TIMEOUT,
+        ),
+    )
+
+
+async def init_http_client(app: FastAPI):
+    global client
+    client = build_http_client()
+    app.state.http_client = client
+
+
+async def close_http_client(app: FastAPI):
+    global client
+    if client:
+        await client.aclose()
+        client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared client created in the app lifespan.
+    """
+    if client is None:
+        raise RuntimeError("HTTP client not initialized")
+    return client
@@ -4,21 +4,54 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .core.config import CORS_ORIGIN
+from .core.config import CORS_ORIGIN, OTP_STORE
 from .api.health import router as health_router
 from .api.auth import router as auth_router
+from .api.auth_otp import router as auth_otp_router
+from .api.admin import router as admin_router
+from .api.metrics import router as metrics_router
+from . import db
 from .db import init_db, close_db
+from .services.email_outbox import start_outbox_workers, stop_outbox_workers
+from .services.email_service import smtp_pool, smtp_executor
+from .services.otp_partitions import start_partition_maintenance, stop_partition_maintenance
+from .services.otp_store import init_otp_store, close_otp_store
+from .services.rate_limiter import init_rate_limiter, close_rate_limiter
+from .http_client import init_http_client, close_http_client
+from .utils.executors import shutdown_executors
+from .utils.jwks import init_jwks, close_jwks
+from .utils.metrics import MetricsMiddleware
+from .utils.otp_utils import check_otp_settings
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    await init_db(app)
+    check_otp_settings()
+    # the in-memory OTP store runs without Postgres (single node / load tests)
+    uses_db = OTP_STORE != "memory"
+    if uses_db:
+        await init_db(app)
+    await init_http_client(app)
+    await init_jwks(app)
+    await init_otp_store(app, db.pool)
+    await init_rate_limiter(app, db.pool)
+    if uses_db:
+        await start_partition_maintenance(app, db.pool)
+        await start_outbox_workers(app, db.pool)
     try:
         # Application is running
         yield
     finally:
         # Shutdown
+        await stop_outbox_workers(app)
+        await stop_partition_maintenance(app)
+        await close_rate_limiter(app)
+        await close_otp_store(app)
+        await smtp_executor.run(smtp_pool.close)
+        shutdown_executors()
+        await close_jwks(app)
+        await close_http_client(app)
         await close_db(app)
 
 
@@ -34,10 +67,16 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["Server-Timing"],
     )
+    # outermost, so the timings include every other middleware
+    app.add_middleware(MetricsMiddleware)
 
     app.include_router(health_router)
     app.include_router(auth_router)
+    app.include_router(auth_otp_router)
+    app.include_router(admin_router)
+    app.include_router(metrics_router)
 
     return app
 
@@ -0,0 +1,232 @@
+from datetime import datetime, timedelta
+from itertools import islice, repeat
+from typing import BinaryIO, Callable, Iterable, Iterator
+
+import asyncpg
+
+from app.core.config import (
+    BULK_INVITE_CHUNK_SIZE,
+    BULK_INVITE_RATE_PER_SECOND,
+    BULK_INVITE_TTL_MINUTES,
+    OTP_PARTITION_RETENTION_DAYS,
+)
+from app.services.user_provisioning import read_csv, read_ndjson
+from app.utils.otp_utils import generate_otps, hash_otps
+
+INVITE_PURPOSES = ("register", "login")
+
+# A code must not outlive the partition holding it. Codes land in today's
+# partition (created_at is the insert time) but expire ttl after their
+# scheduled send, so the whole schedule has to fit in the partition's life:
+# until the end of today plus OTP_PARTITION_RETENTION_DAYS.
+MAX_TTL_MINUTES = OTP_PARTITION_RETENTION_DAYS * 24 * 60
+
+PARTITION_KEPT_UNTIL_SQL = (
+    "(date_trunc('day', now() at time zone 'UTC') at time zone 'UTC')"
+    f" + make_interval(days => {OTP_PARTITION_RETENTION_DAYS + 1})"
+)
+
+
+class ScheduleTooLong(ValueError):
+    """The codes would still be valid when their partition is dropped."""
+
+    def __init__(self, expires_at: datetime, kept_until: datetime):
+        super().__init__(
+            f"Codes would expire at {expires_at:%Y-%m-%d %H:%M} UTC but are only kept until "
+            f"{kept_until:%Y-%m-%d %H:%M} UTC; raise rate_per_second, lower ttl_minutes or split the list"
+        )
+
+
+def read_invite_emails(file: BinaryIO, kind: str) -> Iterator[str | None]:
+    """
+    One entry per input row of a "text" (one address per line), "csv"
+    (email column) or "ndjson" upload; None for rows without an address.
+    Row counts are the resume offsets, so the same input always yields the
+    same sequence.
+    """
+    if kind == "text":
+        for raw in file:
+            yield raw.decode("utf-8", "replace").strip() or None
+        return
+    rows = read_csv(file) if kind == "csv" else read_ndjson(file)
+    for _, row, _ in rows:
+        yield (row or {}).get("email") or None
+
+
+def count_invite_rows(file: BinaryIO, kind: str) -> int:
+    """Rows read_invite_emails will yield for `file`, which is rewound for the real pass."""
+    rows = sum(1 for _ in read_invite_emails(file, kind))
+    file.seek(0)
+    return rows
+
+
+async def create_bulk_invite(
+    conn: asyncpg.Connection,
+    purpose: str = "register",
+    ttl_minutes: int = BULK_INVITE_TTL_MINUTES,
+    rate_per_second: float = BULK_INVITE_RATE_PER_SECOND,
+    source: str | None = None,
+) -> int:
+    if purpose not in INVITE_PURPOSES:
+        raise ValueError(f"purpose must be one of {', '.join(INVITE_PURPOSES)}")
+    if not 0 < ttl_minutes <= MAX_TTL_MINUTES:
+        raise ValueError(f"ttl_minutes must be between 1 and {MAX_TTL_MINUTES}")
+    if rate_per_second <= 0:
+        raise ValueError("rate_per_second must be positive")
+    return await conn.fetchval(
+        "insert into bulk_invite (purpose, ttl_minutes, rate_per_second, source) values ($1, $2, $3, $4) returning id;",
+        purpose, ttl_minutes, rate_per_second, source,
+    )
+
+
+LOCK_JOB_SQL = f"""
+select purpose, ttl_minutes, rate_per_second, processed, greatest(next_send_at, now()) as send_from,
+       {PARTITION_KEPT_UNTIL_SQL} as kept_until
+  from bulk_invite
+ where id = $1
+   for update;
+"""
+
+RETIRE_SQL = """
+update email_otp
+   set consumed_at = now()
+ where purpose = $1
+   and email = any($2::text[])
+   and consumed_at is null;
+"""
+
+ADVANCE_SQL = """
+update bulk_invite
+   set processed = $2,
+       queued = queued + $3,
+       skipped = skipped + $4,
+       next_send_at = $5
+ where id = $1;
+"""
+
+
+async def enqueue_invite_chunk(
+    conn: asyncpg.Connection,
+    job_id: int,
+    offset: int,
+    emails: list[str | None],
+) -> bool:
+    """
+    Turn input rows `offset`.. into codes and scheduled outbox emails in one
+    transaction: retire the addressees' active codes, COPY the hashes into
+    email_otp and the codes into email_outbox, and advance the job. Sends
+    are spaced 1/rate apart after the job's previous chunk, and each code
+    expires ttl_minutes after its own send. Returns False, writing
+    nothing, when the job is not at `offset` (the chunk already committed);
+    raises ScheduleTooLong, writing nothing, when the chunk's last code
+    would outlive its partition.
+    """
+    async with conn.transaction():
+        job = await conn.fetchrow(LOCK_JOB_SQL, job_id)
+        if job is None:
+            raise ValueError(f"No bulk invite {job_id}")
+        if job["processed"] != offset:
+            return False
+
+        addresses = list(dict.fromkeys(e.strip() for e in emails if e and "@" in e))
+        interval = timedelta(seconds=1 / job["rate_per_second"])
+        send_at = [job["send_from"] + interval * i for i in range(len(addresses))]
+        if addresses:
+            ttl = timedelta(minutes=job["ttl_minutes"])
+            if send_at[-1] + ttl > job["kept_until"]:
+                raise ScheduleTooLong(send_at[-1] + ttl, job["kept_until"])
+            otps = generate_otps(len(addresses))
+            await conn.execute(RETIRE_SQL, job["purpose"], addresses)
+            await conn.copy_records_to_table(
+                "email_otp",
+                columns=("email", "otp_hash", "purpose", "expires_at"),
+                records=zip(addresses, hash_otps(otps), repeat(job["purpose"]), (t + ttl for t in send_at)),
+            )
+            await conn.copy_records_to_table(
+                "email_outbox",
+                columns=("to_email", "otp", "next_attempt_at", "valid_minutes", "bulk_invite_id"),
+                records=zip(addresses, otps, send_at, repeat(job["ttl_minutes"]), repeat(job_id)),
+            )
+        await conn.execute(
+            ADVANCE_SQL, job_id, offset + len(emails), len(addresses), len(emails) - len(addresses),
+            job["send_from"] + interval * len(addresses),
+        )
+    return True
+
+
+PROGRESS_SQL = """
+select b.id, b.purpose, b.ttl_minutes, b.rate_per_second, b.source,
+       b.processed, b.queued, b.skipped, b.next_send_at, b.created_at, b.finished_at,
+       count(o.id) filter (where o.failed_at is null) as pending,
+       count(o.id) filter (where o.failed_at is not null) as failed
+  from bulk_invite b
+  left join email_outbox o on o.bulk_invite_id = b.id
+ where b.id = $1
+ group by b.id;
+"""
+
+
+async def bulk_invite_progress(conn: asyncpg.Connection, job_id: int) -> dict | None:
+    """
+    Job settings and counters. Sent emails leave the outbox, so sent is
+    what was queued minus what is still pending or failed for good.
+    """
+    row = await conn.fetchrow(PROGRESS_SQL, job_id)
+    if row is None:
+        return None
+    progress = dict(row)
+    progress["sent"] = progress["queued"] - progress["pending"] - progress["failed"]
+    return progress
+
+
+CHECK_SCHEDULE_SQL = f"""
+select processed,
+       greatest(next_send_at, now()) + make_interval(secs => ($2 - processed) / rate_per_second)
+           + make_interval(mins => ttl_minutes) as expires_at,
+       {PARTITION_KEPT_UNTIL_SQL} as kept_until
+  from bulk_invite
+ where id = $1;
+"""
+
+
+async def run_bulk_invite(
+    pool: asyncpg.pool.Pool,
+    job_id: int,
+    emails: Iterable[str | None],
+    total_rows: int,
+    chunk_size: int = BULK_INVITE_CHUNK_SIZE,
+    on_chunk: Callable[[int], None] | None = None,
+) -> dict:
+    """
+    Feed `emails` (the job's whole input of `total_rows` rows, from the
+    first row) into the job chunk by chunk, skipping the rows an earlier
+    run already committed. The schedule for the remaining rows is checked
+    against partition retention before anything is written, so a list too
+    long for its rate is refused up front rather than half way. Memory is
+    bounded by the chunk size. `on_chunk` gets the running count of
+    processed rows after each commit.
+    """
+    async with pool.acquire() as conn:
+        job = await conn.fetchrow(CHECK_SCHEDULE_SQL, job_id, total_rows)
+    if job is None:
+        raise ValueError(f"No bulk invite {job_id}")
+    if total_rows > job["processed"] and job["expires_at"] > job["kept_until"]:
+        raise ScheduleTooLong(job["expires_at"], job["kept_until"])
+    processed = job["processed"]
+
+    rows = iter(emails)
+    offset = sum(1 for _ in islice(rows, processed))
+    if offset != processed:
+        raise ValueError(f"Input has {offset} rows but bulk invite {job_id} already processed {processed}")
+
+    while chunk := list(islice(rows, chunk_size)):
+        async with pool.acquire() as conn:
+            if not await enqueue_invite_chunk(conn, job_id, offset, chunk):
+                raise RuntimeError(f"Bulk invite {job_id} was advanced by another run")
+        offset += len(chunk)
+        if on_chunk is not None:
+            on_chunk(offset)
+
+    async with pool.acquire() as conn:
+        await conn.execute("update bulk_invite set finished_at = now() where id = $1 and finished_at is null;", job_id)
+        return await bulk_invite_progress(conn, job_id)
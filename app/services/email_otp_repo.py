@@ -1,97 +1,135 @@
-from datetime import datetime
 from typing import Optional
 import asyncpg
 
-from app.utils.otp_utils import generate_otp, compute_expiry
+from app.utils.otp_utils import generate_otp, compute_expiry, hash_otp
+from app.core.config import OTP_MAX_ATTEMPTS, OTP_RESEND_COOLDOWN_SECONDS
+
+
+# Retire the previous codes, insert the new one and queue its email in a
+# single statement: data-modifying CTEs share one snapshot and one implicit
+# transaction, so this is one round trip with no BEGIN/COMMIT.
+# If a still-usable code was issued within the resend cooldown ($6 seconds),
+# nothing is written and no row comes back: the user keeps that code and
+# the email already queued or sent for it.
+CREATE_EMAIL_OTP_SQL = """
+with recent as (
+    select 1
+      from email_otp
+     where email = $1
+       and purpose = $2
+       and consumed_at is null
+       and created_at > now() - make_interval(secs => $6)
+       and expires_at > now()
+       and retry_count < $7
+     limit 1
+), retired as (
+    update email_otp
+       set consumed_at = now()
+     where email = $1
+       and purpose = $2
+       and consumed_at is null
+       and not exists (select 1 from recent)
+), created as (
+    insert into email_otp (email, otp_hash, purpose, expires_at)
+    select $1, $5, $2, $4
+     where not exists (select 1 from recent)
+    returning email
+)
+insert into email_outbox (to_email, otp)
+select email, $3 from created
+returning id;
+"""
 
 
 async def create_email_otp(
-    pool: asyncpg.pool.Pool,
+    conn: asyncpg.Connection,
     email: str,
     purpose: str,
     ttl_minutes: int = 10,
-) -> str:
+    cooldown_seconds: float = OTP_RESEND_COOLDOWN_SECONDS,
+    max_attempts: int = OTP_MAX_ATTEMPTS,
+) -> Optional[str]:
     """
-    Create a new OTP for an email+purpose and return the raw OTP.
-    For now we store the OTP raw in otp_hash (later: change to hash).
+    Create a new OTP for an email+purpose, queue its email in the outbox in
+    the same statement, and return the raw OTP.
+    Only the keyed hash is stored in email_otp; the outbox keeps the raw
+    code until the email is sent.
+    Returns None when a code issued less than `cooldown_seconds` ago is
+    still usable; it is reused rather than replaced. Since only its hash is
+    stored, it cannot be re-sent, so no email is queued.
     """
     otp = generate_otp(6)
     expires_at = compute_expiry(ttl_minutes)
 
-    async with pool.acquire() as conn:
-        async with conn.transaction():
-            # mark old OTPs as consumed
-            await conn.execute(
-                """
-                update email_otp
-                   set consumed_at = now()
-                 where email = $1
-                   and purpose = $2
-                   and consumed_at is null;
-                """,
-                email,
-                purpose,
-            )
+    statement = await conn.prepared("create_email_otp", CREATE_EMAIL_OTP_SQL)
+    queued = await statement.fetch(
+        email, purpose, otp, expires_at, hash_otp(otp), cooldown_seconds, max_attempts
+    )
 
-            await conn.execute(
-                """
-                insert into email_otp (email, otp_hash, purpose, expires_at)
-                values ($1, $2, $3, $4);
-                """,
-                email,
-                otp,
-                purpose,
-                expires_at,
-            )
+    return otp if queued else None
 
-    return otp
+
+# Check and consume the latest active code in one statement. FOR UPDATE
+# serialises concurrent completes: a loser waits for the winner's commit,
+# then sees the row as consumed and gets OTP_MISSING. Wrong guesses bump
+# retry_count under the same lock, so parallel guesses cannot overshoot
+# the limit; once it is reached the code is locked, even for the right OTP.
+VERIFY_EMAIL_OTP_SQL = """
+with latest as (
+    select id, created_at, otp_hash, expires_at, retry_count
+      from email_otp
+     where email = $1
+       and purpose = $2
+       and consumed_at is null
+     order by created_at desc
+     limit 1
+       for update
+), consumed as (
+    update email_otp o
+       set consumed_at = now()
+      from latest l
+     where o.id = l.id
+       and o.created_at = l.created_at  -- prunes to the row's partition
+       and l.expires_at > now()
+       and l.retry_count < $4
+       and l.otp_hash = $3
+    returning o.id
+), failed as (
+    update email_otp o
+       set retry_count = o.retry_count + 1
+      from latest l
+     where o.id = l.id
+       and o.created_at = l.created_at
+       and l.expires_at > now()
+       and l.retry_count < $4
+       and l.otp_hash <> $3
+    returning o.retry_count
+)
+select case
+         when l.id is null then 'missing'
+         when exists (select 1 from consumed) then 'ok'
+         when l.expires_at <= now() then 'expired'
+         when l.retry_count >= $4 then 'locked'
+         when (select retry_count from failed) >= $4 then 'locked'
+         else 'mismatch'
+       end
+  from (select 1) as one
+  left join latest l on true;
+"""
 
 
 async def verify_email_otp(
-    pool: asyncpg.pool.Pool,
+    conn: asyncpg.Connection,
     email: str,
     otp: str,
     purpose: str,
-) -> bool:
+    max_attempts: int = OTP_MAX_ATTEMPTS,
+) -> str:
     """
-    Verify the latest OTP for email+purpose.
-    Returns True if valid and marks it as consumed, otherwise False.
+    Verify the latest OTP for email+purpose and mark it consumed, atomically.
+    Returns OTP_OK, or the failure reason (OTP_MISSING, OTP_EXPIRED,
+    OTP_MISMATCH, or OTP_LOCKED once `max_attempts` wrong guesses were made,
+    including the guess that reached the limit).
     """
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            """
-            select id, created_at, expires_at, consumed_at, otp_hash
-              from email_otp
-             where email = $1
-               and purpose = $2
-             order by created_at desc
-             limit 1;
-            """,
-            email,
-            purpose,
-        )
-
-        if not row:
-            return False
-
-        if row["consumed_at"] is not None:
-            return False
-
-        now = datetime.utcnow()
-        if now > row["expires_at"]:
-            return False
-
-        if row["otp_hash"] != otp:
-            return False
-
-        # OTP valid -> mark as consumed
-        await conn.execute(
-            """
-            update email_otp
-               set consumed_at = now()
-             where id = $1;
-            """,
-            row["id"],
-        )
-
-    return True
+    statement = await conn.prepared("verify_email_otp", VERIFY_EMAIL_OTP_SQL)
+    return await statement.fetchval(email, purpose, hash_otp(otp), max_attempts)
@@ -1,26 +1,123 @@
-import asyncio
-import asyncpg
-
-from app.services.email_otp_repo import create_email_otp, verify_email_otp
-from app.services.email_service import send_otp_email
+from app.core.config import OTP_MAX_ATTEMPTS, OTP_LOCKOUT_CACHE_SECONDS, OTP_LOCKOUT_CACHE_MAX_ENTRIES
+from app.services.otp_store import OtpStore
+from app.services.email_service import send_otp_email_in_background
 from app.services import supabase_service
+from app.utils.otp_utils import (
+    derive_otp,
+    is_stateless,
+    is_well_formed_otp,
+    new_nonce,
+    verify_stateless_otp,
+    OTP_OK,
+    OTP_MISSING,
+    OTP_EXPIRED,
+    OTP_MISMATCH,
+    OTP_LOCKED,
+)
+from app.utils.ttl_cache import TTLCache
+
+OTP_TTL_MINUTES = 10
+
+OTP_ERRORS = {
+    OTP_MISSING: "No active OTP; please request a new one",
+    OTP_EXPIRED: "OTP expired",
+    OTP_MISMATCH: "Invalid OTP",
+    OTP_LOCKED: "Too many attempts; please request a new OTP",
+}
+
+
+def _check_otp(result: str):
+    if result != OTP_OK:
+        raise ValueError(OTP_ERRORS.get(result, "Invalid or expired OTP"))
+
+
+# Stateless purposes keep only the codes already used, until they would have
+# expired anyway. The set is per process: with several replicas a code can
+# be replayed once on each of them within its TTL.
+consumed_stateless_otps = TTLCache(maxsize=100_000, ttl=OTP_TTL_MINUTES * 60)
+stateless_failures = TTLCache(maxsize=100_000, ttl=OTP_TTL_MINUTES * 60)
+
+# email+purpose pairs whose code is locked. Guesses against them are refused
+# here without asking the store; a new start on this replica clears the
+# entry, one on another replica is seen once the entry expires.
+locked_otps = TTLCache(maxsize=OTP_LOCKOUT_CACHE_MAX_ENTRIES, ttl=OTP_LOCKOUT_CACHE_SECONDS)
+
+
+def _normalize_email(email: str) -> str:
+    """The one spelling of an address used in every lockout and failure key."""
+    return email.strip().lower()
+
+
+def _start_stateless(email: str, purpose: str) -> dict:
+    nonce = new_nonce()
+    send_otp_email_in_background(email, derive_otp(email, purpose, nonce))
+    # like a new stored code, a new nonce gets a fresh allowance of guesses
+    stateless_failures.pop((purpose, _normalize_email(email)))
+    return {"success": True, "message": "OTP sent to email", "nonce": nonce}
+
+
+def _verify_stateless(email: str, purpose: str, otp: str, nonce: str | None) -> str:
+    if not nonce:
+        raise ValueError("nonce is required")
+    # failures count per email, not per nonce: guesses spread over many
+    # nonces still add up to one lockout
+    failures_key = (purpose, _normalize_email(email))
+    if stateless_failures.get(failures_key, 0, count=False) >= OTP_MAX_ATTEMPTS:
+        return OTP_LOCKED
+    result = verify_stateless_otp(email, purpose, otp, nonce, ttl_minutes=OTP_TTL_MINUTES)
+    if result == OTP_OK:
+        key = (purpose, _normalize_email(email), nonce)
+        if key in consumed_stateless_otps:
+            return OTP_MISSING
+        consumed_stateless_otps.set(key, True)
+    elif result == OTP_MISMATCH:
+        failures = stateless_failures.get(failures_key, 0, count=False) + 1
+        stateless_failures.set(failures_key, failures)
+        if failures >= OTP_MAX_ATTEMPTS:
+            return OTP_LOCKED
+    return result
+
+
+async def _verify_otp(
+    store: OtpStore,
+    email: str,
+    otp: str,
+    purpose: str,
+    nonce: str | None = None,
+) -> str:
+    # User@x and user@x are one address: a case change must not reset the lockout
+    key = (_normalize_email(email), purpose)
+    if key in locked_otps:
+        return OTP_LOCKED
+    if not is_well_formed_otp(otp):
+        return OTP_MISMATCH
+
+    if is_stateless(purpose):
+        result = _verify_stateless(email, purpose, otp, nonce)
+    else:
+        result = await store.verify(email, otp, purpose)
+        # the caller's next step is a Supabase call; don't hold a DB connection through it
+        await store.release()
+
+    if result == OTP_LOCKED:
+        locked_otps.set(key, True)
+    return result
 
 
 # REGISTER: STEP 1 - send OTP
 async def start_register_with_email_otp(
-    pool: asyncpg.pool.Pool,
+    store: OtpStore,
     email: str,
     password: str,
 ):
     """
-    1) create OTP in DB (purpose='register')
-    2) send OTP via email
+    1) create OTP in the store (purpose='register')
+    2) the store arranges the email (Postgres: outbox workers); we return
+       without waiting on SMTP
     NOTE: do NOT create Supabase user yet.
     """
-    otp = await create_email_otp(pool, email=email, purpose="register", ttl_minutes=10)
-
-    # send_otp_email is sync -> run in thread to not block event loop
-    await asyncio.to_thread(send_otp_email, email, otp)
+    locked_otps.pop((_normalize_email(email), "register"))
+    await store.create(email, "register", ttl_minutes=OTP_TTL_MINUTES)
 
     # For security, do NOT return OTP
     # You’ll store password client-side or ask again on finish step.
@@ -29,44 +126,44 @@ async def start_register_with_email_otp(
 
 # REGISTER: STEP 2 - verify OTP and create Supabase user
 async def complete_register_with_email_otp(
-    pool: asyncpg.pool.Pool,
+    store: OtpStore,
     email: str,
     password: str,
     otp: str,
     phone: str | None = None,
 ):
-    ok = await verify_email_otp(pool, email=email, otp=otp, purpose="register")
-    if not ok:
-        raise ValueError("Invalid or expired OTP")
-
-    # OTP is valid -> create Supabase user (sync call)
-    user = await asyncio.to_thread(
-        supabase_service.register,
-        email,
-        phone,
-        password,
-    )
+    result = await _verify_otp(store, email, otp, "register")
+    _check_otp(result)
+
+    # OTP is valid -> create Supabase user
+    user = await supabase_service.register(email, phone, password)
     return user
 
 
 # LOGIN VIA EMAIL OTP (forgot password / passwordless)
 async def start_login_with_email_otp(
-    pool: asyncpg.pool.Pool,
+    store: OtpStore,
     email: str,
 ):
     """
     If user forgets password, they can login via OTP.
+    In stateless mode nothing is written; the returned nonce must be sent
+    back with the code.
     """
-    otp = await create_email_otp(pool, email=email, purpose="login", ttl_minutes=10)
-    await asyncio.to_thread(send_otp_email, email, otp)
+    locked_otps.pop((_normalize_email(email), "login"))
+    if is_stateless("login"):
+        return _start_stateless(email, "login")
+
+    await store.create(email, "login", ttl_minutes=OTP_TTL_MINUTES)
     return {"success": True, "message": "OTP sent to email"}
 
 
 async def complete_login_with_email_otp(
-    pool: asyncpg.pool.Pool,
+    store: OtpStore,
     email: str,
     otp: str,
     new_password: str | None = None,
+    nonce: str | None = None,
 ):
     """
     After OTP verification, either:
@@ -74,9 +171,8 @@ async def complete_login_with_email_otp(
       - or simply treat OTP as login and issue your own session (custom JWT).
     Here we'll assume you want to reset password and then login via Supabase.
     """
-    ok = await verify_email_otp(pool, email=email, otp=otp, purpose="login")
-    if not ok:
-        raise ValueError("Invalid or expired OTP")
+    result = await _verify_otp(store, email, otp, "login", nonce)
+    _check_otp(result)
 
     # For simplicity here, just require new_password and call Supabase login directly
     if new_password is None:
@@ -87,9 +183,5 @@ async def complete_login_with_email_otp(
     #   1) Use Supabase admin API to update the user's password
     #   2) Then call supabase_service.login(email, new_password)
     # Here we'll simply call login (assuming password already matches stored):
-    tokens = await asyncio.to_thread(
-        supabase_service.login,
-        email,
-        new_password,
-    )
+    tokens = await supabase_service.login(email, new_password)
     return tokens
@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import random
+
+import asyncpg
+from fastapi import FastAPI
+
+from app.core.config import (
+    EMAIL_OUTBOX_WORKERS,
+    EMAIL_OUTBOX_BATCH_SIZE,
+    EMAIL_OUTBOX_POLL_SECONDS,
+    EMAIL_OUTBOX_LEASE_SECONDS,
+    EMAIL_OUTBOX_MAX_ATTEMPTS,
+    EMAIL_OUTBOX_BACKOFF_BASE_SECONDS,
+    EMAIL_OUTBOX_BACKOFF_MAX_SECONDS,
+)
+from app.services.email_service import SMTP_SEND_ATTEMPTS, SMTP_TIMEOUT, send_otp_email, smtp_executor
+
+logger = logging.getLogger(__name__)
+
+
+async def claim_batch(
+    pool: asyncpg.pool.Pool,
+    limit: int = EMAIL_OUTBOX_BATCH_SIZE,
+    lease_seconds: float = EMAIL_OUTBOX_LEASE_SECONDS,
+) -> list[asyncpg.Record]:
+    """
+    Claim up to `limit` due messages. SKIP LOCKED lets workers on every
+    replica claim disjoint rows; pushing next_attempt_at out by the lease
+    hides the rows from other workers until sent, or until the lease
+    expires if this worker dies mid-batch. Interactive codes are claimed
+    first and bulk invitations only fill what is left of the batch, so a
+    bulk backlog never holds up a login.
+    """
+    async with pool.acquire() as conn:
+        return await conn.fetch(
+            """
+            with interactive as (
+                select id
+                  from email_outbox
+                 where failed_at is null
+                   and bulk_invite_id is null
+                   and next_attempt_at <= now()
+                 order by next_attempt_at
+                 limit $1
+                   for update skip locked
+            ), bulk as (
+                select id
+                  from email_outbox
+                 where failed_at is null
+                   and bulk_invite_id is not null
+                   and next_attempt_at <= now()
+                 order by next_attempt_at
+                 limit $1 - (select count(*) from interactive)
+                   for update skip locked
+            ), due as (
+                select id from interactive
+                union all
+                select id from bulk
+            )
+            update email_outbox o
+               set next_attempt_at = now() + make_interval(secs => $2),
+                   attempts = o.attempts + 1
+              from due
+             where o.id = due.id
+            returning o.id, o.to_email, o.otp, o.attempts, o.valid_minutes;
+            """,
+            limit,
+            lease_seconds,
+        )
+
+
+async def mark_sent(pool: asyncpg.pool.Pool, ids: list[int]):
+    async with pool.acquire() as conn:
+        await conn.execute("delete from email_outbox where id = any($1::bigint[]);", ids)
+
+
+async def mark_failed(
+    pool: asyncpg.pool.Pool,
+    message_id: int,
+    error: str,
+    retry_in: float | None,
+):
+    """
+    Reschedule a failed message `retry_in` seconds from now, or park it as
+    failed for good when `retry_in` is None. A parked message keeps its
+    error but not its code, which will never be sent.
+    """
+    async with pool.acquire() as conn:
+        await conn.execute(
+            """
+            update email_outbox
+               set last_error = $2,
+                   next_attempt_at = now() + make_interval(secs => coalesce($3, 0)),
+                   failed_at = case when $3::float8 is null then now() end,
+                   otp = case when $3::float8 is null then null else otp end
+             where id = $1;
+            """,
+            message_id,
+            error[:500],
+            retry_in,
+        )
+
+
+async def queue_stats(pool: asyncpg.pool.Pool) -> dict:
+    """
+    Queue depth (pending messages), lag (age of the oldest pending message)
+    and the number of messages that exhausted their retries.
+    """
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            """
+            select count(*) filter (where failed_at is null) as depth,
+                   coalesce(extract(epoch from now() - min(created_at) filter (where failed_at is null)), 0)
+                       as lag_seconds,
+                   count(*) filter (where failed_at is not null) as failed
+              from email_outbox;
+            """
+        )
+    return {"depth": row["depth"], "lag_seconds": float(row["lag_seconds"]), "failed": row["failed"]}
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff with jitter, capped at EMAIL_OUTBOX_BACKOFF_MAX_SECONDS."""
+    ceiling = min(EMAIL_OUTBOX_BACKOFF_MAX_SECONDS, EMAIL_OUTBOX_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+class OutboxWorker:
+    """
+    Polls the outbox, sends claimed messages and records the outcome.
+    `wake()` skips the poll wait, so messages enqueued by this process go
+    out right away; rows from other replicas are picked up by polling.
+    """
+
+    def __init__(self, pool: asyncpg.pool.Pool, name: str = "outbox"):
+        self.pool = pool
+        self.name = name
+        self._wake = asyncio.Event()
+        self.sent = 0
+        self.failed = 0
+
+    def wake(self):
+        self._wake.set()
+
+    async def run_once(self) -> int:
+        batch = await claim_batch(self.pool)
+        for message in batch:
+            try:
+                await smtp_executor.run(send_otp_email, message["to_email"], message["otp"], message["valid_minutes"])
+            except Exception as e:
+                self.failed += 1
+                retry_in = None
+                if message["attempts"] < EMAIL_OUTBOX_MAX_ATTEMPTS:
+                    retry_in = backoff_seconds(message["attempts"])
+                logger.warning(
+                    "%s: sending outbox message %s failed (attempt %s): %s",
+                    self.name, message["id"], message["attempts"], e,
+                )
+                await mark_failed(self.pool, message["id"], repr(e), retry_in)
+            else:
+                # acknowledged one by one: a crash or DB error later in the
+                # batch must not put already delivered messages back in line
+                await mark_sent(self.pool, [message["id"]])
+                self.sent += 1
+        return len(batch)
+
+    async def run(self):
+        while True:
+            try:
+                claimed = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("%s: outbox poll failed", self.name)
+                claimed = 0
+
+            if claimed < EMAIL_OUTBOX_BATCH_SIZE:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=EMAIL_OUTBOX_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+
+
+workers: list[OutboxWorker] = []
+_tasks: list[asyncio.Task] = []
+
+
+def wake_workers():
+    if workers:
+        random.choice(workers).wake()
+
+
+def check_lease(
+    lease_seconds: float = EMAIL_OUTBOX_LEASE_SECONDS,
+    batch_size: int = EMAIL_OUTBOX_BATCH_SIZE,
+    smtp_timeout: float = SMTP_TIMEOUT,
+):
+    """
+    Refuse a lease that can run out while its batch is still being sent:
+    the rows would become claimable again and be sent twice.
+    """
+    worst_case = batch_size * smtp_timeout * SMTP_SEND_ATTEMPTS
+    if lease_seconds <= worst_case:
+        raise RuntimeError(
+            f"ROOTS_VISION_AI_EMAIL_OUTBOX_LEASE_SECONDS ({lease_seconds:g}) must exceed batch size x "
+            f"SMTP_TIMEOUT x {SMTP_SEND_ATTEMPTS} attempts ({worst_case:g})"
+        )
+
+
+async def start_outbox_workers(app: FastAPI, pool: asyncpg.pool.Pool):
+    check_lease()
+    for i in range(EMAIL_OUTBOX_WORKERS):
+        worker = OutboxWorker(pool, name=f"outbox-{i}")
+        workers.append(worker)
+        _tasks.append(asyncio.create_task(worker.run()))
+    app.state.outbox_workers = workers
+
+
+async def stop_outbox_workers(app: FastAPI):
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+    workers.clear()
@@ -1,22 +1,265 @@
+import asyncio
+import logging
 import os
+import queue
 import smtplib
+import threading
+import time
+from email.message import Message
 from email.mime.text import MIMEText
 
+from app.utils.executors import bounded_executor
+from app.utils.metrics import record_dependency
+
+logger = logging.getLogger(__name__)
+
 SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
 SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
 SMTP_USER = os.getenv("SMTP_USER")
 SMTP_PASS = os.getenv("SMTP_PASS")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() in ("1", "true", "yes")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "10"))
+# pooled transport: open connections, messages before a connection is recycled,
+# and idle time after which a connection is probed with NOOP before reuse
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100"))
+SMTP_IDLE_CHECK_SECONDS = float(os.getenv("SMTP_IDLE_CHECK_SECONDS", "30"))
+# threads for blocking SMTP calls (more than the pool size would only wait on
+# it), and sends allowed to queue for them before new ones are refused
+SMTP_EXECUTOR_WORKERS = int(os.getenv("SMTP_EXECUTOR_WORKERS", str(SMTP_POOL_SIZE)))
+SMTP_EXECUTOR_QUEUE_SIZE = int(os.getenv("SMTP_EXECUTOR_QUEUE_SIZE", "200"))
+
+
+class _PooledSMTP:
+    __slots__ = ("smtp", "messages", "last_used")
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.messages = 0
+        self.last_used = time.monotonic()
+
+
+class _HandoffSMTP(smtplib.SMTP):
+    """smtplib.SMTP that notes when a message's DATA phase has begun."""
+
+    handed_off = False
+
+    def data(self, msg):
+        self.handed_off = True
+        return super().data(msg)
+
+
+# A pooled connection that died under us. Not OSError: SMTPException derives
+# from it, and a relay's refusal (SMTPResponseException) must fail as-is
+# rather than be sent again on a fresh connection. Not timeouts either: a
+# slow relay may still deliver, and the outbox backoff retries later.
+_CONNECTION_LOST = (smtplib.SMTPServerDisconnected, ConnectionError)
+
+# a send, plus the one retry on a fresh connection
+SMTP_SEND_ATTEMPTS = 2
+
+
+class SMTPConnectionPool:
+    """
+    Keeps up to `size` authenticated SMTP connections open and reuses them
+    across messages. Thread-safe; callers block while all connections are busy.
+
+    A connection idle for longer than `idle_check` is probed with NOOP before
+    reuse, and one that drops before the message is handed off (DATA) is
+    replaced and the message retried once. Connections are recycled after `max_messages` messages.
+    """
+
+    def __init__(
+        self,
+        host: str = SMTP_HOST,
+        port: int = SMTP_PORT,
+        user: str | None = SMTP_USER,
+        password: str | None = SMTP_PASS,
+        starttls: bool = SMTP_STARTTLS,
+        size: int = SMTP_POOL_SIZE,
+        max_messages: int = SMTP_MAX_MESSAGES_PER_CONNECTION,
+        idle_check: float = SMTP_IDLE_CHECK_SECONDS,
+        timeout: float = SMTP_TIMEOUT,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.size = size
+        self.max_messages = max_messages
+        self.idle_check = idle_check
+        self.timeout = timeout
+        self._idle: queue.LifoQueue[_PooledSMTP] = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.connections_opened = 0
+        self.connections_closed = 0
+        self.reconnects = 0
+        self.messages_sent = 0
+        self.send_failures = 0
+
+    def _connect(self) -> _PooledSMTP:
+        smtp = _HandoffSMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.user:
+                smtp.login(self.user, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        with self._lock:
+            self.connections_opened += 1
+        return _PooledSMTP(smtp)
+
+    def _discard(self, conn: _PooledSMTP):
+        try:
+            conn.smtp.quit()
+        except Exception:
+            conn.smtp.close()
+        with self._lock:
+            self.connections_closed += 1
+
+    def _is_alive(self, conn: _PooledSMTP) -> bool:
+        try:
+            return conn.smtp.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _checkout(self) -> _PooledSMTP:
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - conn.last_used < self.idle_check or self._is_alive(conn):
+                return conn
+            self._discard(conn)
 
-def send_otp_email(to_email: str, otp: str):
+    def _checkin(self, conn: _PooledSMTP):
+        conn.last_used = time.monotonic()
+        if conn.messages >= self.max_messages:
+            self._discard(conn)
+        else:
+            self._idle.put(conn)
+
+    def send(self, msg: Message):
+        with self._slots:
+            with self._lock:
+                self.in_use += 1
+            started = time.perf_counter()
+            try:
+                self._send(msg)
+            finally:
+                record_dependency("smtp", "send", time.perf_counter() - started)
+                with self._lock:
+                    self.in_use -= 1
+
+    def _send(self, msg: Message):
+        conn = self._checkout()
+        conn.smtp.handed_off = False
+        try:
+            conn.smtp.send_message(msg)
+        except _CONNECTION_LOST:
+            if conn.smtp.handed_off:
+                # the relay may already have the message: sending it again
+                # could deliver the code twice
+                self._fail(conn)
+                raise
+            # the relay dropped a pooled connection: retry once on a fresh one
+            self._discard(conn)
+            with self._lock:
+                self.reconnects += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self.send_failures += 1
+                raise
+            try:
+                conn.smtp.send_message(msg)
+            except Exception:
+                self._fail(conn)
+                raise
+        except Exception:
+            self._fail(conn)
+            raise
+
+        conn.messages += 1
+        with self._lock:
+            self.messages_sent += 1
+        self._checkin(conn)
+
+    def _fail(self, conn: _PooledSMTP):
+        with self._lock:
+            self.send_failures += 1
+        self._discard(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "in_use": self.in_use,
+            "idle": self._idle.qsize(),
+            "connections_opened": self.connections_opened,
+            "connections_closed": self.connections_closed,
+            "reconnects": self.reconnects,
+            "messages_sent": self.messages_sent,
+            "send_failures": self.send_failures,
+        }
+
+
+smtp_pool = SMTPConnectionPool()
+smtp_executor = bounded_executor("smtp", SMTP_EXECUTOR_WORKERS, SMTP_EXECUTOR_QUEUE_SIZE)
+
+
+def _validity(minutes: int) -> str:
+    if minutes >= 120 and minutes % 60 == 0:
+        return f"{minutes // 60} hours"
+    return f"{minutes} minutes"
+
+
+def build_otp_message(to_email: str, otp: str, valid_minutes: int = 10) -> MIMEText:
     subject = "Your Verification Code"
-    body = f"Your verification code is {otp}. It is valid for 10 minutes. Do not share it with anyone."
+    body = (
+        f"Your verification code is {otp}. It is valid for {_validity(valid_minutes)}. "
+        "Do not share it with anyone."
+    )
 
     msg = MIMEText(body)
     msg["Subject"] = subject
     msg["From"] = SMTP_USER
     msg["To"] = to_email
+    return msg
+
+
+def send_otp_email(to_email: str, otp: str, valid_minutes: int = 10):
+    smtp_pool.send(build_otp_message(to_email, otp, valid_minutes))
+
+
+_pending_sends: set[asyncio.Future] = set()
+
+
+def send_otp_email_in_background(to_email: str, otp: str):
+    """
+    Fire-and-forget send for codes that have no outbox row (stateless and
+    in-memory OTPs). A lost email is not retried; the user asks for a new
+    code instead. Raises ExecutorRejected when the SMTP queue is full.
+    """
+    future = smtp_executor.submit(send_otp_email, to_email, otp)
+    _pending_sends.add(future)
+    future.add_done_callback(_send_done)
+
 
-    with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-        server.starttls()
-        server.login(SMTP_USER, SMTP_PASS)
-        server.send_message(msg)
+def _send_done(future: asyncio.Future):
+    _pending_sends.discard(future)
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("sending OTP email failed: %s", future.exception())
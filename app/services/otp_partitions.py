@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import re
+from datetime import date, datetime, timedelta, timezone
+
+import asyncpg
+from fastapi import FastAPI
+
+from app.core.config import OTP_PARTITION_CHECK_SECONDS, OTP_PARTITION_DAYS_AHEAD, OTP_PARTITION_RETENTION_DAYS
+
+logger = logging.getLogger(__name__)
+
+PARENT = "email_otp"
+_PARTITION_NAME = re.compile(r"^email_otp_p(\d{8})$")
+
+
+def partition_name(day: date) -> str:
+    return f"{PARENT}_p{day:%Y%m%d}"
+
+
+def partition_day(name: str) -> date | None:
+    match = _PARTITION_NAME.match(name)
+    if not match:
+        return None
+    return datetime.strptime(match.group(1), "%Y%m%d").date()
+
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+async def ensure_partitions(
+    conn: asyncpg.Connection,
+    start: date | None = None,
+    days: int = OTP_PARTITION_DAYS_AHEAD,
+) -> list[str]:
+    """
+    Create the daily partitions for [start, start + days], skipping those
+    that already exist. Returns the names of the partitions created.
+    """
+    start = start or utc_today()
+    existing = {row["name"] for row in await _partitions(conn)}
+    created = []
+    for offset in range(days + 1):
+        day = start + timedelta(days=offset)
+        name = partition_name(day)
+        if name in existing:
+            continue
+        await conn.execute(
+            f"""
+            create table if not exists {name}
+              partition of {PARENT}
+              for values from ('{day.isoformat()} 00:00:00+00')
+                           to ('{(day + timedelta(days=1)).isoformat()} 00:00:00+00');
+            """
+        )
+        created.append(name)
+    return created
+
+
+async def ensure_partitions_locked(pool: asyncpg.pool.Pool) -> list[str]:
+    """
+    ensure_partitions under a transaction-scoped advisory lock, so replicas
+    starting together do not race to attach the same partition.
+    """
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute("select pg_advisory_xact_lock(hashtext($1));", PARENT)
+            return await ensure_partitions(conn)
+
+
+async def keep_partitions_ahead(pool: asyncpg.pool.Pool, interval: float = OTP_PARTITION_CHECK_SECONDS):
+    """
+    Top up the partitions every `interval` seconds, so inserts never reach a
+    day without one even when run_otp_maintenance.py is not scheduled.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            for name in await ensure_partitions_locked(pool):
+                logger.info("created partition %s", name)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("creating email_otp partitions failed")
+
+
+_task: asyncio.Task | None = None
+
+
+async def start_partition_maintenance(app: FastAPI, pool: asyncpg.pool.Pool):
+    """Create any missing partitions before serving, then keep them ahead in the background."""
+    global _task
+    for name in await ensure_partitions_locked(pool):
+        logger.info("created partition %s", name)
+    _task = asyncio.create_task(keep_partitions_ahead(pool))
+
+
+async def stop_partition_maintenance(app: FastAPI):
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+
+
+async def drop_expired_partitions(
+    conn: asyncpg.Connection,
+    retention_days: int = OTP_PARTITION_RETENTION_DAYS,
+    today: date | None = None,
+) -> list[tuple[str, int]]:
+    """
+    Drop every daily partition whose whole day is older than
+    `retention_days`. Dropping a partition is O(1) in its row count and
+    returns its disk space immediately, unlike DELETE + VACUUM.
+    A plain DROP of an attached partition takes an ACCESS EXCLUSIVE lock
+    on email_otp and stalls live OTP traffic, so each partition is first
+    detached CONCURRENTLY (Postgres 14+; `conn` must not be in a
+    transaction) and only the detached table is dropped. A detach left
+    pending by an interrupted run is finalized, and a table detached but
+    not yet dropped is dropped. Returns (partition, bytes reclaimed) for
+    each dropped partition.
+    """
+    cutoff = (today or utc_today()) - timedelta(days=retention_days)
+    dropped = []
+    for row in await _partition_tables(conn):
+        day = partition_day(row["name"])
+        if day is None or day >= cutoff:
+            continue
+        if row["detach_pending"]:
+            await conn.execute(f"alter table {PARENT} detach partition {row['name']} finalize;")
+        elif row["attached"]:
+            await conn.execute(f"alter table {PARENT} detach partition {row['name']} concurrently;")
+        await conn.execute(f"drop table if exists {row['name']};")
+        dropped.append((row["name"], row["bytes"]))
+    return dropped
+
+
+async def _partition_tables(conn: asyncpg.Connection) -> list[asyncpg.Record]:
+    """Daily tables next to email_otp, attached or not."""
+    return await conn.fetch(
+        """
+        select child.relname as name,
+               pg_total_relation_size(child.oid) as bytes,
+               i.inhrelid is not null as attached,
+               coalesce(i.inhdetachpending, false) as detach_pending
+          from pg_class parent
+          join pg_class child on child.relnamespace = parent.relnamespace
+          left join pg_inherits i on i.inhrelid = child.oid and i.inhparent = parent.oid
+         where parent.oid = to_regclass($1)
+           and child.relkind = 'r'
+           and child.relname like $1 || '\\_p%'
+         order by child.relname;
+        """,
+        PARENT,
+    )
+
+
+async def _partitions(conn: asyncpg.Connection) -> list[asyncpg.Record]:
+    return await conn.fetch(
+        """
+        select child.relname as name,
+               pg_total_relation_size(child.oid) as bytes
+          from pg_inherits i
+          join pg_class parent on parent.oid = i.inhparent
+          join pg_class child on child.oid = i.inhrelid
+         where parent.oid = to_regclass($1)
+         order by child.relname;
+        """,
+        PARENT,
+    )
@@ -0,0 +1,229 @@
+import hmac
+import time
+from abc import ABC, abstractmethod
+from typing import Callable
+
+import asyncpg
+from fastapi import Depends, FastAPI
+
+from app.db import RequestConnection, get_db_conn
+from app.core.config import OTP_STORE, OTP_MEMORY_TICK_SECONDS, OTP_MAX_ATTEMPTS, OTP_RESEND_COOLDOWN_SECONDS
+from app.services.email_otp_repo import create_email_otp, verify_email_otp
+from app.services.email_outbox import wake_workers
+from app.services.email_service import send_otp_email_in_background
+from app.utils.otp_utils import (
+    generate_otp,
+    hash_otp,
+    OTP_OK,
+    OTP_MISSING,
+    OTP_EXPIRED,
+    OTP_MISMATCH,
+    OTP_LOCKED,
+)
+from app.utils.timing_wheel import TimingWheel
+
+
+class OtpStore(ABC):
+    """
+    Where codes live between start and complete. `create` issues a code and
+    arranges its email, or returns None when a code issued within the
+    resend cooldown is still usable (it is kept, and no email is sent);
+    `verify` checks and consumes the latest code for
+    email+purpose and returns OTP_OK or the failure reason. Wrong guesses
+    count against the code, which locks after OTP_MAX_ATTEMPTS of them.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def create(self, email: str, purpose: str, ttl_minutes: int = 10) -> str | None:
+        ...
+
+    @abstractmethod
+    async def verify(self, email: str, otp: str, purpose: str) -> str:
+        ...
+
+    async def release(self):
+        """Give back anything held for the current request; call before slow upstream work."""
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+
+class PostgresOtpStore(OtpStore):
+    """
+    email_otp table; the email goes out through the outbox. `db` is a pool
+    or, in requests, the request's RequestConnection (see `bind`).
+    """
+
+    name = "postgres"
+
+    def __init__(
+        self,
+        db: asyncpg.pool.Pool | RequestConnection | None,
+        cooldown_seconds: float = OTP_RESEND_COOLDOWN_SECONDS,
+        counters: dict | None = None,
+    ):
+        self.db = db
+        self.cooldown_seconds = cooldown_seconds
+        self._counters = counters if counters is not None else {"reused": 0}
+
+    @property
+    def reused(self) -> int:
+        return self._counters["reused"]
+
+    def bind(self, db: RequestConnection) -> "PostgresOtpStore":
+        """This store on another connection source, sharing its counters."""
+        return PostgresOtpStore(db, self.cooldown_seconds, self._counters)
+
+    async def create(self, email: str, purpose: str, ttl_minutes: int = 10) -> str | None:
+        async with self.db.acquire() as conn:
+            otp = await create_email_otp(
+                conn, email=email, purpose=purpose, ttl_minutes=ttl_minutes,
+                cooldown_seconds=self.cooldown_seconds,
+            )
+        if otp is None:
+            self._counters["reused"] += 1
+        else:
+            wake_workers()
+        return otp
+
+    async def verify(self, email: str, otp: str, purpose: str) -> str:
+        async with self.db.acquire() as conn:
+            return await verify_email_otp(conn, email=email, otp=otp, purpose=purpose)
+
+    async def release(self):
+        # a request's connection goes back to the pool now rather than when the endpoint returns
+        if isinstance(self.db, RequestConnection):
+            await self.db.release()
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "reused": self.reused}
+
+
+class _OtpRecord:
+    __slots__ = ("key", "otp_hash", "created_at", "expires_at", "retry_count")
+
+    def __init__(self, key: tuple[str, str], otp_hash: str, created_at: float, expires_at: float):
+        self.key = key
+        self.otp_hash = otp_hash
+        self.created_at = created_at
+        self.expires_at = expires_at
+        self.retry_count = 0
+
+
+class MemoryOtpStore(OtpStore):
+    """
+    Single-process store for one-node deployments and load tests. Only the
+    latest code per email+purpose is kept, as a slotted record; purges run
+    on a timing wheel advanced on each call, so no per-code timers or
+    full scans are needed. Expired codes are kept for one more TTL so
+    complete can still answer "expired" rather than "missing".
+    """
+
+    name = "memory"
+
+    def __init__(
+        self,
+        tick_seconds: float = OTP_MEMORY_TICK_SECONDS,
+        max_attempts: int = OTP_MAX_ATTEMPTS,
+        cooldown_seconds: float = OTP_RESEND_COOLDOWN_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_attempts = max_attempts
+        self.cooldown_seconds = cooldown_seconds
+        self._records: dict[tuple[str, str], _OtpRecord] = {}
+        self._clock = clock
+        self._wheel = TimingWheel(tick_seconds=tick_seconds, clock=clock)
+        self.purged = 0
+        self.reused = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _purge(self):
+        for record in self._wheel.advance():
+            # a replaced or consumed record is no longer in the map
+            if self._records.get(record.key) is record:
+                del self._records[record.key]
+                self.purged += 1
+
+    async def create(self, email: str, purpose: str, ttl_minutes: int = 10) -> str | None:
+        self._purge()
+        now = self._clock()
+        current = self._records.get((email, purpose))
+        if (
+            current is not None
+            and now - current.created_at < self.cooldown_seconds
+            and now < current.expires_at
+            and current.retry_count < self.max_attempts
+        ):
+            self.reused += 1
+            return None
+
+        otp = generate_otp(6)
+        # queued first: if SMTP refuses it, no code is kept to trip the cooldown
+        send_otp_email_in_background(email, otp)
+        ttl = ttl_minutes * 60
+        record = _OtpRecord((email, purpose), hash_otp(otp), now, now + ttl)
+        self._records[record.key] = record
+        self._wheel.schedule(record, record.expires_at + ttl)
+        return otp
+
+    async def verify(self, email: str, otp: str, purpose: str) -> str:
+        self._purge()
+        record = self._records.get((email, purpose))
+        if record is None:
+            return OTP_MISSING
+        if self._clock() >= record.expires_at:
+            return OTP_EXPIRED
+        if record.retry_count >= self.max_attempts:
+            return OTP_LOCKED
+        if not hmac.compare_digest(record.otp_hash, hash_otp(otp)):
+            record.retry_count += 1
+            return OTP_LOCKED if record.retry_count >= self.max_attempts else OTP_MISMATCH
+        del self._records[record.key]
+        return OTP_OK
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "active": len(self._records),
+            "scheduled": len(self._wheel),
+            "purged": self.purged,
+            "reused": self.reused,
+        }
+
+
+otp_store: OtpStore | None = None
+
+
+def build_otp_store(pool: asyncpg.pool.Pool | None) -> OtpStore:
+    if OTP_STORE == "memory":
+        return MemoryOtpStore()
+    if OTP_STORE == "postgres":
+        return PostgresOtpStore(pool)
+    raise RuntimeError(f"Unknown OTP store: {OTP_STORE}")
+
+
+async def init_otp_store(app: FastAPI, pool: asyncpg.pool.Pool | None):
+    global otp_store
+    otp_store = build_otp_store(pool)
+    app.state.otp_store = otp_store
+
+
+async def close_otp_store(app: FastAPI):
+    global otp_store
+    otp_store = None
+
+
+async def get_otp_store(db: RequestConnection = Depends(get_db_conn, scope="function")) -> OtpStore:
+    """
+    FastAPI dependency to inject the configured OTP store; the Postgres
+    store runs on the request's connection.
+    """
+    if otp_store is None:
+        raise RuntimeError("OTP store not initialized")
+    if isinstance(otp_store, PostgresOtpStore):
+        return otp_store.bind(db)
+    return otp_store
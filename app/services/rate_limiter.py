@@ -0,0 +1,264 @@
+import math
+import time
+from datetime import datetime, timezone
+from typing import Callable
+
+import asyncpg
+from fastapi import Depends, FastAPI, HTTPException, Request
+
+from app.core.config import (
+    RATE_LIMIT_ENABLED,
+    RATE_LIMIT_EMAIL_LIMIT,
+    RATE_LIMIT_EMAIL_WINDOW_SECONDS,
+    RATE_LIMIT_IP_LIMIT,
+    RATE_LIMIT_IP_WINDOW_SECONDS,
+    RATE_LIMIT_IP_LEASE,
+    RATE_LIMIT_GLOBAL_LIMIT,
+    RATE_LIMIT_GLOBAL_WINDOW_SECONDS,
+    RATE_LIMIT_GLOBAL_LEASE,
+    RATE_LIMIT_TRUSTED_PROXIES,
+    RATE_LIMIT_FORWARDED_HEADER,
+)
+from app.db import RequestConnection, get_db_conn
+from app.utils.ttl_cache import TTLCache
+
+
+class RateLimit:
+    """`limit` requests per sliding `window_seconds`, leased `lease` at a time."""
+
+    __slots__ = ("name", "limit", "window_seconds", "lease")
+
+    def __init__(self, name: str, limit: int, window_seconds: int, lease: int = 1):
+        self.name = name
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.lease = max(1, min(lease, limit))
+
+
+EMAIL_LIMIT = RateLimit("otp_start:email", RATE_LIMIT_EMAIL_LIMIT, RATE_LIMIT_EMAIL_WINDOW_SECONDS)
+IP_LIMIT = RateLimit("otp_start:ip", RATE_LIMIT_IP_LIMIT, RATE_LIMIT_IP_WINDOW_SECONDS, RATE_LIMIT_IP_LEASE)
+GLOBAL_LIMIT = RateLimit(
+    "otp_start:global", RATE_LIMIT_GLOBAL_LIMIT, RATE_LIMIT_GLOBAL_WINDOW_SECONDS, RATE_LIMIT_GLOBAL_LEASE
+)
+
+
+# Take `$3` tokens for key `$1` in fixed window `$2` if the sliding-window
+# estimate stays within the limit `$5`. The estimate is the current window's
+# count plus the previous window's count weighted by `$4`, the share of the
+# previous window still inside the sliding window. Rolling the row into a
+# new window and the limit check happen in the one upsert, under the row
+# lock, so replicas cannot overshoot. No row comes back when refused.
+TAKE_SQL = """
+insert into rate_limit_counter as c (key, window_id, count, prev_count, expires_at)
+values ($1, $2, $3, 0, $6)
+on conflict (key) do update
+   set prev_count = case
+                      when c.window_id = excluded.window_id then c.prev_count
+                      when c.window_id = excluded.window_id - 1 then c.count
+                      else 0
+                    end,
+       count = case when c.window_id = excluded.window_id then c.count else 0 end + excluded.count,
+       window_id = excluded.window_id,
+       expires_at = excluded.expires_at
+ where case when c.window_id = excluded.window_id then c.count else 0 end
+       + excluded.count
+       + $4::float8 * case
+                        when c.window_id = excluded.window_id then c.prev_count
+                        when c.window_id = excluded.window_id - 1 then c.count
+                        else 0
+                      end
+       <= $5
+returning count;
+"""
+
+
+class PostgresCounter:
+    """
+    Shared tier: one rate_limit_counter row per key, for all replicas.
+    `db` overrides the pool for one call (a request's connection).
+    """
+
+    def __init__(self, pool: asyncpg.pool.Pool):
+        self.pool = pool
+
+    async def take(
+        self, key: str, window_id: int, tokens: int, prev_weight: float, limit: int, expires_at: float,
+        db: RequestConnection | None = None,
+    ) -> bool:
+        async with (db or self.pool).acquire() as conn:
+            statement = await conn.prepared("rate_limit_take", TAKE_SQL)
+            granted = await statement.fetchval(
+                key, window_id, tokens, prev_weight, limit,
+                datetime.fromtimestamp(expires_at, timezone.utc),
+            )
+        return granted is not None
+
+
+class MemoryCounter:
+    """Same contract as PostgresCounter, for a single process without a DB."""
+
+    def __init__(self):
+        self._rows: dict[str, list[int]] = {}   # key -> [window_id, count, prev_count]
+
+    async def take(
+        self, key: str, window_id: int, tokens: int, prev_weight: float, limit: int, expires_at: float,
+        db: RequestConnection | None = None,
+    ) -> bool:
+        row = self._rows.get(key)
+        if row is None:
+            self._rows[key] = [window_id, tokens, 0]
+            return True
+        if row[0] == window_id:
+            count, prev = row[1], row[2]
+        else:
+            count, prev = 0, row[1] if row[0] == window_id - 1 else 0
+        if count + tokens + prev_weight * prev > limit:
+            return False
+        self._rows[key] = [window_id, count + tokens, prev]
+        return True
+
+
+class _Allotment:
+    __slots__ = ("window_id", "tokens", "retry_at")
+
+    def __init__(self, window_id: int, tokens: int, retry_at: float = 0.0):
+        self.window_id = window_id
+        self.tokens = tokens
+        self.retry_at = retry_at
+
+
+class RateLimiter:
+    """
+    Two tiers: each worker answers from a local allotment of tokens leased
+    from the shared counter, and only goes to the counter when the
+    allotment is spent. Refusals are remembered locally until Retry-After,
+    so a flood against one key costs one counter call per window.
+    Leased tokens that go unused when the window rolls are lost, so the
+    effective limit can be up to `lease` per worker below the configured one.
+    """
+
+    def __init__(
+        self,
+        counter: PostgresCounter | MemoryCounter,
+        clock: Callable[[], float] = time.time,
+        max_local_entries: int = 100_000,
+    ):
+        self.counter = counter
+        self._clock = clock
+        self._local = TTLCache(max_local_entries, clock=clock)
+        self.local_hits = 0
+        self.local_denials = 0
+        self.shared_calls = 0
+        self.shared_denials = 0
+
+    async def hit(self, rule: RateLimit, key: str, db: RequestConnection | None = None) -> float:
+        """Count one request. Returns 0 if allowed, else seconds to wait."""
+        now = self._clock()
+        window = rule.window_seconds
+        window_id = int(now // window)
+        slot = (rule.name, key)
+
+        allotment = self._local.get(slot, count=False)
+        if allotment is not None and allotment.window_id == window_id:
+            if allotment.tokens > 0:
+                allotment.tokens -= 1
+                self.local_hits += 1
+                return 0.0
+            if allotment.retry_at > now:
+                self.local_denials += 1
+                return allotment.retry_at - now
+
+        window_end = (window_id + 1) * window
+        prev_weight = 1.0 - (now - window_id * window) / window
+        for tokens in sorted({rule.lease, 1}, reverse=True):
+            self.shared_calls += 1
+            taken = await self.counter.take(
+                f"{rule.name}:{key}", window_id, tokens, prev_weight, rule.limit, window_end + window, db=db,
+            )
+            if taken:
+                self._local.set(slot, _Allotment(window_id, tokens - 1), ttl=window_end - now)
+                return 0.0
+
+        # a hint rather than an exact time: the sliding estimate decays with
+        # the previous window, so a slot may free up a little earlier
+        self.shared_denials += 1
+        retry_after = max(window_end - now, window / rule.limit)
+        self._local.set(slot, _Allotment(window_id, 0, now + retry_after), ttl=retry_after)
+        return retry_after
+
+    def stats(self) -> dict:
+        return {
+            "local_hits": self.local_hits,
+            "local_denials": self.local_denials,
+            "shared_calls": self.shared_calls,
+            "shared_denials": self.shared_denials,
+            "local_entries": len(self._local),
+        }
+
+
+async def prune_rate_limit_counters(conn: asyncpg.Connection) -> int:
+    """Delete counters whose windows are over. Returns the number removed."""
+    status = await conn.execute("delete from rate_limit_counter where expires_at < now();")
+    return int(status.split()[-1])
+
+
+rate_limiter: RateLimiter | None = None
+
+
+async def init_rate_limiter(app: FastAPI, pool: asyncpg.pool.Pool | None):
+    global rate_limiter
+    rate_limiter = RateLimiter(PostgresCounter(pool) if pool is not None else MemoryCounter())
+    app.state.rate_limiter = rate_limiter
+
+
+async def close_rate_limiter(app: FastAPI):
+    global rate_limiter
+    rate_limiter = None
+
+
+def client_ip(request: Request, trusted_proxies: int = RATE_LIMIT_TRUSTED_PROXIES) -> str:
+    """
+    The caller's address for per-IP limits. Behind a load balancer the peer
+    is the balancer itself, so with `trusted_proxies` set the address is
+    read from the forwarded header, counting hops from the right. A header
+    with fewer entries did not come through every proxy; the peer is used.
+    """
+    peer = request.client.host if request.client else "unknown"
+    if trusted_proxies <= 0:
+        return peer
+    forwarded = [
+        entry.strip()
+        for value in request.headers.getlist(RATE_LIMIT_FORWARDED_HEADER)
+        for entry in value.split(",")
+        if entry.strip()
+    ]
+    if len(forwarded) < trusted_proxies:
+        return peer
+    return forwarded[-trusted_proxies]
+
+
+async def limit_otp_start(
+    request: Request,
+    email: str,
+    db: RequestConnection = Depends(get_db_conn, scope="function"),
+):
+    """
+    FastAPI dependency for the OTP start routes: per email, then per client
+    IP, then global, so refused requests do not use up the wider budgets.
+    Runs before the route's other dependencies; a refusal never reaches
+    the OTP store or SMTP. Shared-counter calls use the request's
+    connection, which the OTP store then reuses.
+    """
+    if not RATE_LIMIT_ENABLED:
+        return
+    if rate_limiter is None:
+        raise RuntimeError("Rate limiter not initialized")
+
+    for rule, key in ((EMAIL_LIMIT, email.lower()), (IP_LIMIT, client_ip(request)), (GLOBAL_LIMIT, "*")):
+        retry_after = await rate_limiter.hit(rule, key, db=db)
+        if retry_after:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests; please try again later",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
@@ -1,7 +1,70 @@
-import requests
-from app.core.config import SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
+import hashlib
 
-def register(email: str | None, phone: str | None, password: str):
+from app.core.config import (
+    SUPABASE_URL,
+    SUPABASE_SERVICE_ROLE_KEY,
+    REFRESH_RESULT_TTL_SECONDS,
+    REFRESH_RESULT_MAX_ENTRIES,
+    SUPABASE_LOGIN_TIMEOUT_SECONDS,
+    SUPABASE_REFRESH_TIMEOUT_SECONDS,
+    SUPABASE_REGISTER_TIMEOUT_SECONDS,
+    SUPABASE_BREAKER_FAILURE_RATIO,
+    SUPABASE_BREAKER_WINDOW,
+    SUPABASE_BREAKER_MIN_CALLS,
+    SUPABASE_BREAKER_OPEN_SECONDS,
+    SUPABASE_RETRY_BUDGET_RATIO,
+    SUPABASE_RETRY_MIN_PER_SECOND,
+    SUPABASE_MAX_ATTEMPTS,
+    SUPABASE_CONCURRENCY_INITIAL,
+    SUPABASE_CONCURRENCY_MIN,
+    SUPABASE_CONCURRENCY_MAX,
+    SUPABASE_CONCURRENCY_SLOW_SECONDS,
+    BULK_PROVISION_UPSTREAM_SHARE,
+)
+from app.http_client import get_http_client
+from app.utils.resilience import AdaptiveLimit, CircuitBreaker, Endpoint, RetryBudget, UpstreamGuard
+from app.utils.singleflight import SingleFlight
+
+# Concurrent refreshes of the same token share one upstream call (Supabase
+# rotates the token, so duplicates would otherwise be rejected).
+refresh_flight = SingleFlight(
+    result_ttl=REFRESH_RESULT_TTL_SECONDS,
+    max_results=REFRESH_RESULT_MAX_ENTRIES,
+)
+
+# Register creates a user and refresh rotates the token, so neither is
+# retried: a lost response would make the retry fail or duplicate work.
+REGISTER = Endpoint("register", SUPABASE_REGISTER_TIMEOUT_SECONDS)
+LOGIN = Endpoint("login", SUPABASE_LOGIN_TIMEOUT_SECONDS, idempotent=True)
+REFRESH = Endpoint("refresh", SUPABASE_REFRESH_TIMEOUT_SECONDS)
+# bulk provisioning: its own breaker, and only part of the concurrency limit
+BULK_REGISTER = Endpoint("bulk_register", SUPABASE_REGISTER_TIMEOUT_SECONDS, limit_share=BULK_PROVISION_UPSTREAM_SHARE)
+
+
+def build_supabase_guard() -> UpstreamGuard:
+    return UpstreamGuard(
+        "Supabase",
+        limit=AdaptiveLimit(
+            initial=SUPABASE_CONCURRENCY_INITIAL,
+            min_limit=SUPABASE_CONCURRENCY_MIN,
+            max_limit=SUPABASE_CONCURRENCY_MAX,
+            slow_seconds=SUPABASE_CONCURRENCY_SLOW_SECONDS,
+        ),
+        budget=RetryBudget(ratio=SUPABASE_RETRY_BUDGET_RATIO, min_per_second=SUPABASE_RETRY_MIN_PER_SECOND),
+        breaker_factory=lambda: CircuitBreaker(
+            failure_ratio=SUPABASE_BREAKER_FAILURE_RATIO,
+            window=SUPABASE_BREAKER_WINDOW,
+            min_calls=SUPABASE_BREAKER_MIN_CALLS,
+            open_seconds=SUPABASE_BREAKER_OPEN_SECONDS,
+        ),
+        max_attempts=SUPABASE_MAX_ATTEMPTS,
+    )
+
+
+supabase_guard = build_supabase_guard()
+
+
+async def register(email: str | None, phone: str | None, password: str, endpoint: Endpoint = REGISTER):
     url = f"{SUPABASE_URL}/auth/v1/admin/users"
     headers = {
         "apikey": SUPABASE_SERVICE_ROLE_KEY,
@@ -15,28 +78,32 @@ def register(email: str | None, phone: str | None, password: str):
         "email_confirm": bool(email),
         "phone_confirm": bool(phone),
     }
-    r = requests.post(url, json=payload, headers=headers)
+    r = await supabase_guard.call(endpoint, lambda: get_http_client().post(url, json=payload, headers=headers))
     r.raise_for_status()
     return r.json()
 
-def login(email: str, password: str):
+async def login(email: str, password: str):
     url = f"{SUPABASE_URL}/auth/v1/token?grant_type=password"
     headers = {
         "apikey": SUPABASE_SERVICE_ROLE_KEY,
         "Content-Type": "application/json",
     }
     payload = {"email": email, "password": password}
-    r = requests.post(url, json=payload, headers=headers)
+    r = await supabase_guard.call(LOGIN, lambda: get_http_client().post(url, json=payload, headers=headers))
     r.raise_for_status()
     return r.json()
 
-def refresh(refresh_token: str):
+async def refresh(refresh_token: str):
+    key = hashlib.sha256(refresh_token.encode()).hexdigest()
+    return await refresh_flight.do(key, lambda: _refresh(refresh_token))
+
+async def _refresh(refresh_token: str):
     url = f"{SUPABASE_URL}/auth/v1/token?grant_type=refresh_token"
     headers = {
         "apikey": SUPABASE_SERVICE_ROLE_KEY,
         "Content-Type": "application/json",
     }
     payload = {"refresh_token": refresh_token}
-    r = requests.post(url, json=payload, headers=headers)
+    r = await supabase_guard.call(REFRESH, lambda: get_http_client().post(url, json=payload, headers=headers))
     r.raise_for_status()
     return r.json()
@@ -0,0 +1,144 @@
+import asyncio
+import csv
+import io
+import json
+import logging
+import time
+from typing import AsyncIterator, BinaryIO, Iterator
+
+import httpx
+from fastapi import HTTPException
+
+import app.services.supabase_service as supabase_service
+from app.core.config import BULK_PROVISION_CONCURRENCY, BULK_PROVISION_MAX_RETRIES
+
+logger = logging.getLogger(__name__)
+
+CSV_TYPES = ("text/csv",)
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl", "application/ndjson")
+
+# (line number, user fields, or the reason the line could not be read)
+Row = tuple[int, dict | None, str | None]
+
+
+def read_ndjson(file: BinaryIO) -> Iterator[Row]:
+    """One JSON object per line; blank lines are skipped."""
+    for line, raw in enumerate(file, start=1):
+        if not raw.strip():
+            continue
+        try:
+            row = json.loads(raw)
+        except ValueError:
+            yield line, None, "invalid JSON"
+            continue
+        if not isinstance(row, dict):
+            yield line, None, "expected a JSON object"
+            continue
+        yield line, row, None
+
+
+def read_csv(file: BinaryIO) -> Iterator[Row]:
+    """CSV with a header row naming the columns (email, phone, password)."""
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.DictReader(text)
+        for row in reader:
+            # header is line 1; quoted newlines make line_num run ahead, which is fine for reporting
+            yield reader.line_num, {k: v for k, v in row.items() if k and v}, None
+    except (csv.Error, UnicodeDecodeError) as e:
+        yield 0, None, f"unreadable CSV: {e}"
+    finally:
+        text.detach()
+
+
+def _upstream_error(e: httpx.HTTPStatusError) -> str:
+    try:
+        body = e.response.json()
+        message = body.get("msg") or body.get("message") or body.get("error_description") or body.get("error")
+    except ValueError:
+        message = None
+    return f"{e.response.status_code} {message or e.response.reason_phrase}"
+
+
+async def provision_user(line: int, row: dict) -> dict:
+    """Create one user; the result never echoes the password. Never raises: errors become a failed result."""
+    email, phone, password = row.get("email") or None, row.get("phone") or None, row.get("password")
+    result = {"line": line, "email": email, "phone": phone}
+    if not (email or phone) or not password:
+        return {**result, "status": "invalid", "error": "email or phone, and password, are required"}
+
+    for attempt in range(BULK_PROVISION_MAX_RETRIES + 1):
+        try:
+            user = await supabase_service.register(email, phone, password, endpoint=supabase_service.BULK_REGISTER)
+        except httpx.HTTPStatusError as e:
+            return {**result, "status": "failed", "error": _upstream_error(e)}
+        except HTTPException as e:
+            # a local 503 means the call was refused before it was sent, so
+            # it is safe to try again; anything else is final for this row
+            if e.status_code != 503 or attempt == BULK_PROVISION_MAX_RETRIES:
+                return {**result, "status": "failed", "error": f"{e.status_code} {e.detail}"}
+            retry_after = float((e.headers or {}).get("Retry-After", 1))
+            await asyncio.sleep(min(retry_after, 5) * (attempt + 1))
+        except Exception as e:
+            # anything else (transport errors, bugs) fails this row, not the stream
+            logger.exception("bulk provisioning of line %s failed", line)
+            return {**result, "status": "failed", "error": f"{type(e).__name__}: {e}"}
+        else:
+            return {**result, "status": "created", "id": user.get("id")}
+
+
+async def provision_users(
+    rows: Iterator[Row],
+    concurrency: int = BULK_PROVISION_CONCURRENCY,
+) -> AsyncIterator[dict]:
+    """
+    Create users from `rows` with at most `concurrency` Supabase calls in
+    flight, yielding each row's result as it finishes (not in input order),
+    then a summary. Workers pull rows lazily and wait while the consumer
+    is behind, so memory stays flat whatever the number of rows.
+    """
+    results: asyncio.Queue[dict | None] = asyncio.Queue(maxsize=concurrency)
+    counts = {"created": 0, "failed": 0, "invalid": 0}
+    started = time.perf_counter()
+
+    async def worker():
+        for line, row, error in rows:   # a shared iterator: each row goes to one worker
+            if error is not None:
+                result = {"line": line, "status": "invalid", "error": error}
+            else:
+                result = await provision_user(line, row)
+            counts[result["status"]] += 1
+            await results.put(result)
+
+    async def run_workers():
+        try:
+            async with asyncio.TaskGroup() as group:
+                for _ in range(concurrency):
+                    group.create_task(worker())
+        except asyncio.CancelledError:
+            # nobody is left to make room in the queue once we are cancelled
+            raise
+        except BaseException:
+            # a failed worker: wake the consumer, which re-raises from `runner`
+            await results.put(None)
+            raise
+        await results.put(None)
+
+    runner = asyncio.create_task(run_workers())
+    try:
+        while (result := await results.get()) is not None:
+            yield result
+        await runner
+    finally:
+        runner.cancel()
+
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    summary = {
+        "rows": total,
+        **counts,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(total / elapsed, 1) if elapsed else None,
+    }
+    logger.info("bulk provisioning finished: %s", summary)
+    yield {"summary": summary}
@@ -1,21 +1,105 @@
+import hashlib
+import time
+
 import jwt
-from fastapi import Header, HTTPException, status
-from core.config import SUPABASE_JWT_SECRET
+from fastapi import Depends, Header, HTTPException, status
+from app.core.config import ADMIN_ROLE, SUPABASE_JWT_SECRET, TOKEN_CACHE_ENABLED, TOKEN_CACHE_MAX_ENTRIES
+from app.utils import jwks
+from app.utils.ttl_cache import TTLCache
 
 ALGO = "HS256"
 
-def get_current_user(authorization: str = Header(...)):
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid auth header")
+# sha256(token) -> decoded claims, each entry living until the token's exp.
+# Cached payloads are shared between requests: treat them as read-only.
+token_cache = TTLCache(TOKEN_CACHE_MAX_ENTRIES)
 
-    token = authorization.split(" ", 1)[1]
+
+def _signing_key(token: str):
+    """
+    Pick the verification key from the token header: the shared secret for
+    HS256, or the pre-parsed JWKS key matching `kid` for RS256/ES256.
+    HS256 is refused outright when no secret is set: an empty key is one
+    anybody can sign with.
+    """
+    if jwks.key_set is None:
+        if not SUPABASE_JWT_SECRET:
+            raise jwt.InvalidTokenError("No JWT secret configured")
+        return SUPABASE_JWT_SECRET, ALGO
+
+    header = jwt.get_unverified_header(token)
+    algorithm = header.get("alg")
+    if algorithm == ALGO:
+        if not SUPABASE_JWT_SECRET:
+            raise jwt.InvalidTokenError("HS256 tokens are not accepted")
+        return SUPABASE_JWT_SECRET, algorithm
+
+    if algorithm in jwks.ASYMMETRIC_ALGOS:
+        jwk = jwks.key_set.get_key(header.get("kid"))
+        if jwk is not None and jwk.algorithm_name == algorithm:
+            return jwk.key, algorithm
+        raise jwt.InvalidTokenError("Unknown signing key")
+
+    raise jwt.InvalidTokenError(f"Unsupported algorithm {algorithm!r}")
+
+
+def require_verification_key():
+    """
+    503 when the app has neither a JWT secret nor a JWKS: no bearer token can
+    be checked, but routes that need none (OTP, health, metrics) keep working.
+    """
+    if jwks.key_set is None and not SUPABASE_JWT_SECRET:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Token verification is not configured"
+        )
+
+
+def verify_token(token: str) -> dict:
+    """
+    Decode and validate a bearer token, serving repeat tokens from the cache.
+    Raises 401 for expired or invalid tokens (failures are never cached),
+    503 when no verification key is configured. Runs on the event loop:
+    the cache and JWKS key set are not thread-safe.
+    """
+    require_verification_key()
+    key = hashlib.sha256(token.encode()).digest()
+    if TOKEN_CACHE_ENABLED:
+        payload = token_cache.get(key)
+        if payload is not None:
+            return payload
 
     try:
-        payload = jwt.decode(token, SUPABASE_JWT_SECRET, algorithms=[ALGO])
+        signing_key, algorithm = _signing_key(token)
+        payload = jwt.decode(token, signing_key, algorithms=[algorithm])
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-    # payload['sub'] is normally the user id
+    exp = payload.get("exp")
+    if TOKEN_CACHE_ENABLED and isinstance(exp, (int, float)):
+        ttl = exp - time.time()
+        if ttl > 0:
+            token_cache.set(key, payload, ttl=ttl)
+
     return payload
+
+
+async def get_current_user(authorization: str = Header(...)):
+    if not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid auth header")
+
+    token = authorization.split(" ", 1)[1]
+
+    # payload['sub'] is normally the user id
+    return verify_token(token)
+
+
+async def require_admin(user: dict = Depends(get_current_user)) -> dict:
+    """
+    FastAPI dependency for admin routes: service_role tokens, or users whose
+    app_metadata.role (set server-side only) is ADMIN_ROLE.
+    """
+    app_metadata = user.get("app_metadata") or {}
+    if user.get("role") == "service_role" or app_metadata.get("role") == ADMIN_ROLE:
+        return user
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
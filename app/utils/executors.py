@@ -0,0 +1,126 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from fastapi import HTTPException
+
+
+class ExecutorRejected(HTTPException):
+    """The executor's queue is full; answered as 503 when it reaches a route."""
+
+    def __init__(self, name: str):
+        super().__init__(status_code=503, detail=f"{name} is busy; please retry", headers={"Retry-After": "1"})
+
+
+class BoundedExecutor:
+    """
+    Thread pool for one blocking dependency, so a slow one cannot take the
+    threads another needs (asyncio.to_thread shares the loop's default
+    executor). At most `max_workers` calls run and `max_queue` wait; past
+    that `submit` raises ExecutorRejected straight away instead of letting
+    the queue grow. The pool is created on first use and again after
+    `shutdown`, so one instance serves every app lifespan in a process.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self.pending = 0                # queued + running; event loop thread only
+        self.running = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.run_seconds_total = 0.0
+        self.run_seconds_max = 0.0
+
+    def _call(self, fn: Callable[..., Any], args: tuple, queued_at: float) -> Any:
+        started = time.perf_counter()
+        waited = started - queued_at
+        with self._lock:
+            self.running += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        failed = True
+        try:
+            result = fn(*args)
+            failed = False
+            return result
+        finally:
+            ran = time.perf_counter() - started
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.failed += failed
+                self.run_seconds_total += ran
+                self.run_seconds_max = max(self.run_seconds_max, ran)
+
+    def _done(self, future: asyncio.Future):
+        self.pending -= 1
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> asyncio.Future:
+        """Queue `fn(*args)`; must be called from the event loop."""
+        if self.pending >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise ExecutorRejected(self.name)
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix=self.name)
+        # run in a copy of the caller's context (as asyncio.to_thread does), so
+        # the call is charged to the request that made it
+        context = contextvars.copy_context()
+        future = asyncio.wrap_future(self._pool.submit(context.run, self._call, fn, args, time.perf_counter()))
+        self.pending += 1
+        self.submitted += 1
+        future.add_done_callback(self._done)
+        return future
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await self.submit(fn, *args)
+
+    def shutdown(self):
+        """Drop queued calls and let running ones finish in the background."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        completed = self.completed
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "queued": max(0, self.pending - self.running),
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "completed": completed,
+            "failed": self.failed,
+            "wait_seconds_mean": self.wait_seconds_total / completed if completed else 0.0,
+            "wait_seconds_max": self.wait_seconds_max,
+            "run_seconds_mean": self.run_seconds_total / completed if completed else 0.0,
+            "run_seconds_max": self.run_seconds_max,
+        }
+
+
+# every named executor in the process, for stats and shutdown
+executors: dict[str, BoundedExecutor] = {}
+
+
+def bounded_executor(name: str, max_workers: int, max_queue: int) -> BoundedExecutor:
+    """Create and register the executor for one blocking dependency."""
+    if name in executors:
+        raise ValueError(f"Executor {name!r} already exists")
+    executor = executors[name] = BoundedExecutor(name, max_workers, max_queue)
+    return executor
+
+
+def shutdown_executors():
+    for executor in executors.values():
+        executor.shutdown()
@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import time
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+from app.core.config import IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_MAX_ENTRIES
+from app.utils.ttl_cache import TTLCache
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+
+class _StoredResponse:
+    __slots__ = ("fingerprint", "status_code", "body", "headers")
+
+    def __init__(self, fingerprint: str, response: Response):
+        self.fingerprint = fingerprint
+        self.status_code = response.status_code
+        self.body = response.body
+        self.headers = [
+            (name, value) for name, value in response.raw_headers if name.lower() != b"content-length"
+        ]
+
+    @property
+    def cacheable(self) -> bool:
+        # server errors and throttling say nothing about the request itself,
+        # so a retry must run again
+        return self.status_code < 500 and self.status_code != 429
+
+    def response(self, replayed: bool = False) -> Response:
+        response = Response(content=self.body, status_code=self.status_code)
+        response.raw_headers.extend(self.headers)
+        if replayed:
+            response.headers[REPLAYED_HEADER] = "true"
+        return response
+
+
+class IdempotencyStore:
+    """
+    First responses per idempotency key, kept for `ttl` seconds in a bounded
+    LRU. A duplicate arriving while the first request is still running
+    waits for its response instead of running the handler again.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = IDEMPOTENCY_MAX_ENTRIES,
+        ttl: float = IDEMPOTENCY_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._responses = TTLCache(maxsize, ttl=ttl, clock=clock)
+        self._in_flight: dict[str, tuple[str, asyncio.Future]] = {}
+        self.executed = 0
+        self.replayed = 0
+        self.coalesced = 0
+        self.conflicts = 0
+
+    def _conflict(self) -> HTTPException:
+        self.conflicts += 1
+        return HTTPException(
+            status_code=422,
+            detail=f"{IDEMPOTENCY_HEADER} was already used with a different request",
+        )
+
+    async def run(
+        self,
+        key: str,
+        fingerprint: str,
+        call: Callable[[], Awaitable[_StoredResponse]],
+    ) -> Response:
+        stored = self._responses.get(key)
+        if stored is not None:
+            if stored.fingerprint != fingerprint:
+                raise self._conflict()
+            self.replayed += 1
+            return stored.response(replayed=True)
+
+        flight = self._in_flight.get(key)
+        if flight is not None:
+            in_flight_fingerprint, future = flight
+            if in_flight_fingerprint != fingerprint:
+                raise self._conflict()
+            self.coalesced += 1
+            try:
+                stored = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # the first request was abandoned; this one takes over
+                if future.cancelled():
+                    return await self.run(key, fingerprint, call)
+                raise
+            return stored.response(replayed=True)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = (fingerprint, future)
+        self.executed += 1
+        try:
+            stored = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # waiters re-raise it; nobody waiting is fine too
+            raise
+        finally:
+            del self._in_flight[key]
+
+        future.set_result(stored)
+        if stored.cacheable:
+            self._responses.set(key, stored)
+        return stored.response()
+
+    def clear(self):
+        self._responses.clear()
+
+    def stats(self) -> dict:
+        return {
+            "executed": self.executed,
+            "replayed": self.replayed,
+            "coalesced": self.coalesced,
+            "conflicts": self.conflicts,
+            "stored": len(self._responses),
+            "in_flight": len(self._in_flight),
+        }
+
+
+idempotency_store = IdempotencyStore()
+
+
+async def request_fingerprint(request: Request) -> str:
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(request.url.path.encode())
+    for name, value in sorted(request.query_params.multi_items()):
+        digest.update(f"\0{name}={value}".encode())
+    digest.update(b"\0")
+    digest.update(await request.body())
+    return digest.hexdigest()
+
+
+class IdempotencyRoute(APIRoute):
+    """
+    Route class honouring the Idempotency-Key header on mutating methods.
+    It wraps the whole route handler, so a replayed response is served
+    before any dependency runs (no DB connection, no Supabase call).
+    4xx outcomes are stored like successes; 5xx and 429 are not.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Awaitable[Response]]:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key or request.method not in ("POST", "PUT", "PATCH", "DELETE"):
+                return await handler(request)
+            if len(key) > MAX_KEY_LENGTH:
+                raise HTTPException(status_code=400, detail=f"{IDEMPOTENCY_HEADER} is too long")
+
+            fingerprint = await request_fingerprint(request)
+
+            async def call() -> _StoredResponse:
+                try:
+                    response = await handler(request)
+                except HTTPException as e:
+                    response = JSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
+                return _StoredResponse(fingerprint, response)
+
+            scoped_key = f"{request.method} {request.url.path} {key}"
+            return await idempotency_store.run(scoped_key, fingerprint, call)
+
+        return route_handler
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import jwt
+from fastapi import FastAPI
+
+from app.core.config import SUPABASE_JWKS_URL, SUPABASE_JWT_SECRET, JWKS_REFRESH_SECONDS, JWKS_MIN_REFRESH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+ASYMMETRIC_ALGOS = ("RS256", "ES256")
+
+# A fetcher returns the raw JWKS document ({"keys": [...]}).
+JWKSFetcher = Callable[[], Awaitable[dict]]
+
+
+def http_jwks_fetcher(url: str) -> JWKSFetcher:
+    async def fetch() -> dict:
+        from app.http_client import get_http_client
+
+        r = await get_http_client().get(url)
+        r.raise_for_status()
+        return r.json()
+
+    return fetch
+
+
+def file_jwks_fetcher(path: str | Path) -> JWKSFetcher:
+    async def fetch() -> dict:
+        return json.loads(Path(path).read_text())
+
+    return fetch
+
+
+def fetcher_for_url(url: str) -> JWKSFetcher:
+    if url.startswith("file://"):
+        return file_jwks_fetcher(url[len("file://"):])
+    return http_jwks_fetcher(url)
+
+
+class JWKSKeySet:
+    """
+    In-memory JWKS keyed by `kid`. Keys are parsed once per refresh and the
+    whole mapping is swapped atomically, so lookups never parse or block.
+
+    A background task refreshes every `refresh_interval` seconds. Looking up
+    an unknown `kid` (the usual sign of a key rotation) wakes the task early,
+    at most once per `min_refresh_interval`. A failed fetch keeps the
+    previous keys.
+    """
+
+    def __init__(
+        self,
+        fetcher: JWKSFetcher,
+        refresh_interval: float = JWKS_REFRESH_SECONDS,
+        min_refresh_interval: float = JWKS_MIN_REFRESH_SECONDS,
+    ):
+        self._fetcher = fetcher
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self._keys: dict[str, jwt.PyJWK] = {}
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.last_refresh = 0.0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.unknown_kid_lookups = 0
+
+    def get_key(self, kid: str | None) -> jwt.PyJWK | None:
+        key = self._keys.get(kid) if kid else None
+        if key is None:
+            self.unknown_kid_lookups += 1
+            self._wake.set()
+        return key
+
+    @property
+    def kids(self) -> list[str]:
+        return list(self._keys)
+
+    async def refresh(self) -> bool:
+        try:
+            document = await self._fetcher()
+            keys = {}
+            for data in document.get("keys", []):
+                if data.get("use", "sig") != "sig" or not data.get("kid"):
+                    continue
+                try:
+                    keys[data["kid"]] = jwt.PyJWK(data)
+                except jwt.PyJWTError as e:
+                    logger.warning("Skipping unusable JWK %s: %s", data.get("kid"), e)
+        except Exception:
+            self.refresh_failures += 1
+            logger.exception("JWKS refresh failed; keeping %d cached keys", len(self._keys))
+            return False
+
+        self._keys = keys
+        self.last_refresh = time.monotonic()
+        self.refreshes += 1
+        return True
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.refresh_interval)
+            except asyncio.TimeoutError:
+                pass
+            since_last = time.monotonic() - self.last_refresh
+            if since_last < self.min_refresh_interval:
+                await asyncio.sleep(self.min_refresh_interval - since_last)
+            self._wake.clear()
+            await self.refresh()
+
+    async def start(self):
+        await self.refresh()
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self._keys),
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "unknown_kid_lookups": self.unknown_kid_lookups,
+        }
+
+
+key_set: JWKSKeySet | None = None
+
+
+async def init_jwks(app: FastAPI):
+    global key_set
+    if not SUPABASE_JWKS_URL:
+        # no key at all: bearer-token routes answer 503, the rest still serve
+        if not SUPABASE_JWT_SECRET:
+            logger.warning(
+                "Neither ROOTS_VISION_AI_SB_JWT_SECRET nor ROOTS_VISION_AI_SB_JWKS_URL is set; "
+                "bearer tokens cannot be verified"
+            )
+        return
+    key_set = JWKSKeySet(fetcher_for_url(SUPABASE_JWKS_URL))
+    await key_set.start()
+    app.state.jwks = key_set
+
+
+async def close_jwks(app: FastAPI):
+    global key_set
+    if key_set:
+        await key_set.stop()
+        key_set = None
@@ -0,0 +1,185 @@
+import functools
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Iterator
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import METRICS_SERVER_TIMING
+
+# seconds; upper bounds of the histogram buckets (+Inf is implied)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Prometheus histogram keyed by a tuple of label values. Observing is a
+    bisect and three in-place updates, cheap enough for every request and
+    every dependency call. Written from the event loop and from executor
+    threads without a lock: a lost update under a thread race skews a
+    count by one, which a latency histogram can live with.
+    """
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...], buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series: dict[tuple[str, ...], list] = {}   # labels -> [bucket counts, sum, count]
+
+    def observe(self, labels: tuple[str, ...], seconds: float):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, seconds)] += 1
+        series[1] += seconds
+        series[2] += 1
+
+    def clear(self):
+        self._series.clear()
+
+    def count(self, labels: tuple[str, ...]) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total, count) in list(self._series.items()):
+            pairs = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, labels))
+            sep = "," if pairs else ""
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                yield f'{self.name}_bucket{{{pairs}{sep}le="{bound}"}} {cumulative}'
+            yield f'{self.name}_bucket{{{pairs}{sep}le="+Inf"}} {count}'
+            yield f"{self.name}_sum{{{pairs}}} {total}"
+            yield f"{self.name}_count{{{pairs}}} {count}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time from request start to the end of the response body, by route template and status.",
+    ("method", "route", "status"),
+)
+dependency_duration = Histogram(
+    "dependency_call_duration_seconds",
+    "Duration of each call to a dependency (db, http, smtp), by operation.",
+    ("dependency", "operation"),
+)
+request_dependency_duration = Histogram(
+    "http_request_dependency_seconds",
+    "Total time one request spent in each dependency, by route template.",
+    ("route", "dependency"),
+)
+
+histograms = (request_duration, dependency_duration, request_dependency_duration)
+
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format (0.0.4)."""
+    return "\n".join(line for histogram in histograms for line in histogram.render()) + "\n"
+
+
+class RequestTimings:
+    """Time the current request spent in each dependency, in seconds."""
+
+    __slots__ = ("seconds", "calls")
+
+    def __init__(self):
+        self.seconds: dict[str, float] = {}
+        self.calls: dict[str, int] = {}
+
+    def add(self, dependency: str, seconds: float):
+        self.seconds[dependency] = self.seconds.get(dependency, 0.0) + seconds
+        self.calls[dependency] = self.calls.get(dependency, 0) + 1
+
+    def server_timing(self, total: float) -> str:
+        entries = [f"app;dur={total * 1000:.1f}"]
+        entries += [
+            f'{name};dur={seconds * 1000:.1f};desc="{self.calls[name]} calls"'
+            for name, seconds in self.seconds.items()
+        ]
+        return ", ".join(entries)
+
+
+current_timings: ContextVar[RequestTimings | None] = ContextVar("current_timings", default=None)
+
+
+def record_dependency(dependency: str, operation: str, seconds: float):
+    """Count one dependency call, and charge it to the current request if there is one."""
+    dependency_duration.observe((dependency, operation), seconds)
+    timings = current_timings.get()
+    if timings is not None:
+        timings.add(dependency, seconds)
+
+
+def timed(dependency: str, operation: str) -> Callable:
+    """Decorator for coroutine functions: record each call's duration with record_dependency."""
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                record_dependency(dependency, operation, time.perf_counter() - started)
+
+        return wrapper
+
+    return decorate
+
+
+class MetricsMiddleware:
+    """
+    Times every HTTP request into request_duration, labelled with the
+    route template (so /users/{id} is one series) or "unmatched", and its
+    dependency time into request_dependency_duration. With
+    METRICS_SERVER_TIMING on, the response carries a Server-Timing header
+    with the same breakdown up to the moment the headers were sent.
+    Plain ASGI rather than BaseHTTPMiddleware, which would run every
+    request body and response through an extra task and memory stream.
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool = METRICS_SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_timed(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    MutableHeaders(scope=message).append(
+                        "Server-Timing", timings.server_timing(time.perf_counter() - started)
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_timings.reset(token)
+            # the router leaves the matched route in the (shared) scope
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            request_duration.observe((scope["method"], path, str(status)), elapsed)
+            for dependency, seconds in timings.seconds.items():
+                request_dependency_duration.observe((path, dependency), seconds)
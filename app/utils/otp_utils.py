@@ -1,9 +1,155 @@
+import base64
+import hashlib
+import hmac
+import os
 import random
+import secrets
 import string
+import time
+from array import array
 from datetime import datetime, timedelta
 
+from app.core.config import OTP_HASH_SECRET, OTP_STATELESS_PURPOSES, OTP_STATELESS_SECRET
+
+# OTP verification results
+OTP_OK = "ok"
+OTP_MISSING = "missing"    # no active code (never issued, already used, replayed)
+OTP_EXPIRED = "expired"
+OTP_MISMATCH = "mismatch"
+OTP_LOCKED = "locked"      # too many wrong guesses for the active code
+
+OTP_LENGTH = 6
+
+# A 6-digit code has only 10^6 values: with a weak or empty key, anyone who
+# can read otp_hash recovers the code by hashing them all.
+OTP_SECRET_MIN_LENGTH = 32
+
+
+def check_secret(name: str, value: str):
+    if len(value) < OTP_SECRET_MIN_LENGTH:
+        raise RuntimeError(f"{name} must be set to at least {OTP_SECRET_MIN_LENGTH} characters")
+
+
+# only login/start can issue a stateless code; any other purpose listed would
+# send codes issued by the store down the stateless verify path
+STATELESS_CAPABLE_PURPOSES = frozenset({"login"})
+
+
+def check_otp_settings():
+    """Startup check of the keys behind stored and derived codes, and of stateless mode."""
+    check_secret("ROOTS_VISION_AI_OTP_HASH_SECRET", OTP_HASH_SECRET)
+    unsupported = OTP_STATELESS_PURPOSES - STATELESS_CAPABLE_PURPOSES
+    if unsupported:
+        raise RuntimeError(
+            f"ROOTS_VISION_AI_OTP_STATELESS_PURPOSES: {', '.join(sorted(unsupported))} cannot be stateless "
+            f"(supported: {', '.join(sorted(STATELESS_CAPABLE_PURPOSES))})"
+        )
+    if OTP_STATELESS_PURPOSES:
+        check_secret("ROOTS_VISION_AI_OTP_STATELESS_SECRET", OTP_STATELESS_SECRET)
+
+
 def generate_otp(length: int = 6) -> str:
     return "".join(random.choices(string.digits, k=length))
 
 def compute_expiry(minutes: int = 10) -> datetime:
     return datetime.utcnow() + timedelta(minutes=minutes)
+
+def hash_otp(otp: str) -> str:
+    """
+    Keyed digest stored in otp_hash. Verification compares digests in SQL,
+    so comparison timing says nothing about the code itself.
+    """
+    return hmac.new(_hash_secret(), otp.encode(), hashlib.sha256).hexdigest()
+
+
+def _hash_secret() -> bytes:
+    # never an unkeyed digest, even where the startup check did not run (scripts)
+    if not OTP_HASH_SECRET:
+        raise RuntimeError("ROOTS_VISION_AI_OTP_HASH_SECRET is not set")
+    return OTP_HASH_SECRET.encode()
+
+
+def generate_otps(count: int, length: int = 6) -> list[str]:
+    """`count` codes from a single urandom read (for bulk invitations)."""
+    modulus = 10 ** length
+    return [f"{value % modulus:0{length}d}" for value in array("Q", os.urandom(8 * count))]
+
+
+def hash_otps(otps: list[str]) -> list[str]:
+    """hash_otp for many codes: the HMAC is keyed once and its state copied."""
+    keyed = hmac.new(_hash_secret(), digestmod=hashlib.sha256)
+    digests = []
+    for otp in otps:
+        digest = keyed.copy()
+        digest.update(otp.encode())
+        digests.append(digest.hexdigest())
+    return digests
+
+
+# --- stateless mode ----------------------------------------------------------
+# The nonce handed to the client is "<issued_at>.<random>.<mac>". The MAC
+# proves we issued it, so a client cannot mint fresh nonces (and with them
+# fresh codes to guess at) without calling start. issued_at is covered by
+# both MACs, so the client cannot stretch the window by editing it either.
+
+def is_stateless(purpose: str) -> bool:
+    return purpose in OTP_STATELESS_PURPOSES
+
+def _stateless_secret() -> bytes:
+    if not OTP_STATELESS_SECRET:
+        raise RuntimeError("ROOTS_VISION_AI_OTP_STATELESS_SECRET is not set")
+    return OTP_STATELESS_SECRET.encode()
+
+def _nonce_mac(body: str) -> str:
+    mac = hmac.new(_stateless_secret(), f"nonce|{body}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(mac[:12]).decode()
+
+def new_nonce(now: float | None = None) -> str:
+    issued_at = int(time.time() if now is None else now)
+    body = f"{issued_at}.{secrets.token_urlsafe(9)}"
+    return f"{body}.{_nonce_mac(body)}"
+
+def is_authentic_nonce(nonce: str) -> bool:
+    body, _, mac = nonce.rpartition(".")
+    return bool(body) and hmac.compare_digest(_nonce_mac(body), mac)
+
+def derive_otp(email: str, purpose: str, nonce: str, length: int = OTP_LENGTH) -> str:
+    """HOTP-style dynamic truncation of HMAC-SHA256(secret, email|purpose|nonce)."""
+    message = f"{email.lower()}|{purpose}|{nonce}".encode()
+    digest = hmac.new(_stateless_secret(), message, hashlib.sha256).digest()
+    offset = digest[-1] & 0x0F
+    value = int.from_bytes(digest[offset:offset + 4], "big") & 0x7FFFFFFF
+    return str(value % 10 ** length).zfill(length)
+
+def is_well_formed_otp(otp: str) -> bool:
+    """Codes are always OTP_LENGTH ASCII digits; anything else can never match."""
+    return len(otp) == OTP_LENGTH and otp.isascii() and otp.isdigit()
+
+def verify_stateless_otp(
+    email: str,
+    purpose: str,
+    otp: str,
+    nonce: str,
+    ttl_minutes: int = 10,
+    now: float | None = None,
+) -> str:
+    """
+    Check a derived code without any storage. Replays must be rejected by
+    the caller (see email_otp_service's consumed-code set).
+    """
+    if not is_authentic_nonce(nonce):
+        return OTP_MISSING
+    issued_at = int(nonce.split(".", 1)[0])
+
+    # never size the expected code from the guess: a 1-digit guess against
+    # a 1-digit code would succeed one time in ten
+    if not is_well_formed_otp(otp):
+        return OTP_MISMATCH
+    expected = derive_otp(email, purpose, nonce)
+    if not hmac.compare_digest(expected, otp):
+        return OTP_MISMATCH
+
+    now = time.time() if now is None else now
+    if not 0 <= now - issued_at <= ttl_minutes * 60:
+        return OTP_EXPIRED
+    return OTP_OK
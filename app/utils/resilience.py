@@ -0,0 +1,318 @@
+import asyncio
+import math
+import random
+import time
+from typing import Awaitable, Callable
+
+import httpx
+from fastapi import HTTPException
+
+from app.utils.metrics import record_dependency
+
+
+class CircuitBreaker:
+    """
+    Opens when at least `failure_ratio` of the last `window` calls failed
+    (once `min_calls` have been seen), rejecting calls for `open_seconds`.
+    Then one probe call is let through: success closes the circuit,
+    failure opens it again. Results arriving while the circuit is open are
+    ignored.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_ratio: float = 0.5,
+        window: int = 20,
+        min_calls: int = 10,
+        open_seconds: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_ratio = failure_ratio
+        self.window = window
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self._clock = clock
+        self.state = self.CLOSED
+        self._outcomes: list[bool] = []   # ring of the last `window` results, True = failed
+        self._next = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self) -> float:
+        """0 if a call may go ahead, else seconds until the circuit may let one through."""
+        if self.state == self.OPEN:
+            remaining = self._opened_at + self.open_seconds - self._clock()
+            if remaining > 0:
+                self.rejected += 1
+                return remaining
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                self.rejected += 1
+                return self.open_seconds
+            self._probing = True
+        return 0.0
+
+    def record(self, failed: bool):
+        if self.state == self.OPEN:
+            return
+        if self.state == self.HALF_OPEN:
+            if failed:
+                self._open()
+            else:
+                self.state = self.CLOSED
+                self._outcomes, self._next, self._failures = [], 0, 0
+            self._probing = False
+            return
+
+        if len(self._outcomes) < self.window:
+            self._outcomes.append(failed)
+        else:
+            self._failures -= self._outcomes[self._next]
+            self._outcomes[self._next] = failed
+            self._next = (self._next + 1) % self.window
+        self._failures += failed
+        if len(self._outcomes) >= self.min_calls and self._failures >= self.failure_ratio * len(self._outcomes):
+            self._open()
+
+    def abandon(self):
+        """A call ended without an outcome; let another probe through."""
+        self._probing = False
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = self._clock()
+        self.opened += 1
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "recent_failures": self._failures,
+            "recent_calls": len(self._outcomes),
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+class RetryBudget:
+    """
+    Retries as a share of traffic: each first attempt deposits `ratio` of a
+    token, each retry spends one, and `min_per_second` tokens trickle in so
+    low-traffic periods can still retry. Under a broad outage retries stay
+    at about `ratio` of calls instead of multiplying the load.
+    """
+
+    def __init__(
+        self,
+        ratio: float = 0.1,
+        min_per_second: float = 1.0,
+        max_tokens: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._clock = clock
+        self._tokens = max_tokens
+        self._updated = clock()
+        self.retries = 0
+        self.exhausted = 0
+
+    def _refill(self, tokens: float):
+        now = self._clock()
+        self._tokens = min(self.max_tokens, self._tokens + tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self):
+        self._refill(self.ratio)
+
+    def try_spend(self) -> bool:
+        self._refill(0.0)
+        if self._tokens < 1:
+            self.exhausted += 1
+            return False
+        self._tokens -= 1
+        self.retries += 1
+        return True
+
+    def stats(self) -> dict:
+        return {"tokens": self._tokens, "retries": self.retries, "exhausted": self.exhausted}
+
+
+class AdaptiveLimit:
+    """
+    AIMD limit on calls in flight. A call over the limit is refused rather
+    than queued. Each call that succeeds within `slow_seconds` raises the
+    limit by 1/limit (about +1 per round trip of the whole window); a
+    failed or slow call multiplies it by `backoff`, once per round trip:
+    calls started before the last decrease do not decrease it again.
+    """
+
+    def __init__(
+        self,
+        initial: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 100,
+        slow_seconds: float = 1.0,
+        backoff: float = 0.5,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.slow_seconds = slow_seconds
+        self.backoff = backoff
+        self._clock = clock
+        self._decreased_at = -math.inf
+        self.in_flight = 0
+        self.rejected = 0
+
+    def try_acquire(self, share: float = 1.0) -> float | None:
+        """
+        Start time of the admitted call, or None when at the limit. A call
+        with `share` < 1 is only admitted while fewer than that share of
+        the limit are in flight, which keeps the rest for other callers.
+        """
+        if self.in_flight >= int(self.limit * share):
+            self.rejected += 1
+            return None
+        self.in_flight += 1
+        return self._clock()
+
+    def cancel(self):
+        """Release a call that never reached the upstream."""
+        self.in_flight -= 1
+
+    def release(self, started_at: float, failed: bool):
+        self.in_flight -= 1
+        now = self._clock()
+        if failed or now - started_at > self.slow_seconds:
+            if started_at >= self._decreased_at:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._decreased_at = now
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def stats(self) -> dict:
+        return {"limit": int(self.limit), "in_flight": self.in_flight, "rejected": self.rejected}
+
+
+class Endpoint:
+    """
+    Per-endpoint policy: attempt timeout, whether a retry is safe, and the
+    share of the upstream's concurrency limit its calls may use.
+    """
+
+    __slots__ = ("name", "timeout", "idempotent", "limit_share")
+
+    def __init__(self, name: str, timeout: float, idempotent: bool = False, limit_share: float = 1.0):
+        self.name = name
+        self.timeout = timeout
+        self.idempotent = idempotent
+        self.limit_share = limit_share
+
+
+def _unavailable(detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class UpstreamGuard:
+    """
+    Outbound calls to one upstream: a circuit breaker per endpoint, one
+    adaptive concurrency limit and one retry budget for the upstream.
+    Timeouts, transport errors, 5xx and 429 count as failures; other
+    responses, 4xx included, are returned to the caller as they are.
+    Refused calls fail fast with 503, timeouts with 504. Only idempotent
+    endpoints are retried, and only while the budget allows.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: AdaptiveLimit,
+        budget: RetryBudget,
+        breaker_factory: Callable[[], CircuitBreaker] = CircuitBreaker,
+        max_attempts: int = 2,
+        retry_backoff_seconds: float = 0.05,
+    ):
+        self.name = name
+        self.limit = limit
+        self.budget = budget
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self._breaker_factory = breaker_factory
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self.timeouts = 0
+
+    def breaker(self, endpoint: Endpoint) -> CircuitBreaker:
+        breaker = self.breakers.get(endpoint.name)
+        if breaker is None:
+            breaker = self.breakers[endpoint.name] = self._breaker_factory()
+        return breaker
+
+    async def call(self, endpoint: Endpoint, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        breaker = self.breaker(endpoint)
+        self.budget.deposit()
+        attempt = 1
+        while True:
+            started_at = self.limit.try_acquire(endpoint.limit_share)
+            if started_at is None:
+                raise _unavailable(f"{self.name} is busy; please retry", 1)
+            retry_after = breaker.allow()
+            if retry_after:
+                self.limit.cancel()
+                raise _unavailable(f"{self.name} is unavailable; please retry later", retry_after)
+
+            response = error = None
+            sent_at = time.perf_counter()
+            try:
+                async with asyncio.timeout(endpoint.timeout):
+                    response = await send()
+            except TimeoutError as e:
+                self.timeouts += 1
+                error = e
+            except httpx.TransportError as e:
+                error = e
+            except BaseException:
+                # cancelled by our caller (or a bug): no verdict on the upstream
+                self.limit.cancel()
+                breaker.abandon()
+                raise
+            finally:
+                record_dependency("http", f"{self.name.lower()}.{endpoint.name}", time.perf_counter() - sent_at)
+
+            failed = response is None or response.status_code >= 500 or response.status_code == 429
+            self.limit.release(started_at, failed)
+            breaker.record(failed)
+
+            if not failed:
+                return response
+            if endpoint.idempotent and attempt < self.max_attempts and self.budget.try_spend():
+                attempt += 1
+                await asyncio.sleep(random.uniform(0, self.retry_backoff_seconds))
+                continue
+            if isinstance(error, TimeoutError):
+                raise HTTPException(status_code=504, detail=f"{self.name} timed out")
+            if error is not None:
+                raise HTTPException(status_code=502, detail=f"{self.name} is unreachable")
+            return response
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.limit.stats(),
+            "retry_budget": self.budget.stats(),
+            "timeouts": self.timeouts,
+            "breakers": {name: breaker.stats() for name, breaker in self.breakers.items()},
+        }
@@ -0,0 +1,73 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Hashable
+
+from app.utils.ttl_cache import TTLCache, _MISSING
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls that share a key into one upstream call.
+
+    Callers arriving while a call is in flight await the same task; a
+    successful result is then kept for `result_ttl` seconds so late
+    duplicates get the identical answer. Failures are never cached.
+    The upstream call runs in its own task, so a cancelled caller does not
+    cancel it for the others.
+    """
+
+    def __init__(
+        self,
+        result_ttl: float = 0.0,
+        max_results: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.result_ttl = result_ttl
+        self._results = TTLCache(max_results, ttl=result_ttl, clock=clock)
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.upstream_calls = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+
+        if self.result_ttl > 0:
+            cached = self._results.get(key, _MISSING)
+            if cached is not _MISSING:
+                self.cache_hits += 1
+                return cached
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.upstream_calls += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if task.cancelled():
+            return
+        # retrieve the exception so an all-callers-gone failure is not logged as unhandled
+        if task.exception() is None and self.result_ttl > 0:
+            self._results.set(key, task.result())
+
+    def clear(self):
+        self._results.clear()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+            "cache_hits": self.cache_hits,
+            "in_flight": len(self._in_flight),
+            "cached_results": len(self._results),
+        }
@@ -0,0 +1,76 @@
+import math
+import time
+from typing import Any, Callable
+
+
+class TimingWheel:
+    """
+    Hierarchical timing wheel (Varghese & Lauck). Level 0 has one slot per
+    tick; each higher level has one slot per full turn of the level below.
+    Scheduling is O(1); advancing by a tick empties one level-0 slot and,
+    on turn boundaries, cascades one slot per higher level down. An entry
+    moves at most `levels` times before it expires, so expiring N entries
+    costs O(N) in total regardless of how their deadlines are spread.
+
+    Deadlines beyond the wheel's range (slots ** levels ticks) wait in the
+    top level and are re-filed each time their slot comes round.
+    Cancellation is left to the caller: expire stale entries as no-ops.
+    """
+
+    def __init__(
+        self,
+        tick_seconds: float = 1.0,
+        slot_bits: int = 6,
+        levels: int = 4,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.tick_seconds = tick_seconds
+        self._bits = slot_bits
+        self._mask = (1 << slot_bits) - 1
+        self._levels: list[list[list[tuple[int, Any]]]] = [
+            [[] for _ in range(1 << slot_bits)] for _ in range(levels)
+        ]
+        self._clock = clock
+        self._tick = int(clock() // tick_seconds)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def schedule(self, item: Any, deadline: float):
+        """File `item` to come out of `advance()` once `deadline` has passed."""
+        target = max(math.ceil(deadline / self.tick_seconds), self._tick + 1)
+        self._file(target, item)
+        self._size += 1
+
+    def _file(self, target: int, item: Any):
+        bits, tick, top = self._bits, self._tick, len(self._levels) - 1
+        level = 0
+        # the lowest level whose turn contains both now and the deadline
+        while level < top and (target >> (bits * (level + 1))) != (tick >> (bits * (level + 1))):
+            level += 1
+        self._levels[level][(target >> (bits * level)) & self._mask].append((target, item))
+
+    def advance(self, now: float | None = None) -> list[Any]:
+        """Move the wheel up to `now` and return the items that expired."""
+        now = self._clock() if now is None else now
+        until = int(now // self.tick_seconds)
+        bits, mask = self._bits, self._mask
+        expired = []
+        while self._tick < until:
+            self._tick += 1
+            tick = self._tick
+            # cascade top-down so entries land in slots that are still ahead
+            for level in range(len(self._levels) - 1, 0, -1):
+                if tick & ((1 << (bits * level)) - 1) == 0:
+                    slot = self._levels[level][(tick >> (bits * level)) & mask]
+                    if slot:
+                        self._levels[level][(tick >> (bits * level)) & mask] = []
+                        for target, item in slot:
+                            self._file(target, item)
+            slot = self._levels[0][tick & mask]
+            if slot:
+                self._levels[0][tick & mask] = []
+                expired.extend(item for _, item in slot)
+        self._size -= len(expired)
+        return expired
@@ -0,0 +1 @@
+"""Local benchmarks for ai-labs-tn-auth (run with `python -m benchmarks.<name>`)"""
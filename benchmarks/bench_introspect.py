@@ -0,0 +1,69 @@
+"""
+Token validation throughput through the ASGI app: one request per token
+(a route guarded by get_current_user) vs batched POST /api/auth/introspect.
+
+    python -m benchmarks.bench_introspect --tokens 5000 --batch 100
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+
+from app.api.auth import router as auth_router
+from app.utils import auth_dependency
+from app.utils.auth_dependency import get_current_user
+from benchmarks.bench_token_verify import SECRET, make_tokens
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(auth_router)
+
+    @app.get("/whoami")
+    async def whoami(user: dict = Depends(get_current_user)):
+        return user
+
+    return app
+
+
+async def per_token(client: httpx.AsyncClient, tokens: list[str]) -> float:
+    start = time.perf_counter()
+    for token in tokens:
+        r = await client.get("/whoami", headers={"Authorization": f"Bearer {token}"})
+        r.raise_for_status()
+    return len(tokens) / (time.perf_counter() - start)
+
+
+async def batched(client: httpx.AsyncClient, tokens: list[str], batch: int) -> float:
+    start = time.perf_counter()
+    for i in range(0, len(tokens), batch):
+        r = await client.post("/api/auth/introspect", json=tokens[i:i + batch])
+        r.raise_for_status()
+    return len(tokens) / (time.perf_counter() - start)
+
+
+async def run(args):
+    # Distinct tokens with the cache off, so both paths pay the full decode
+    # and the difference is the per-request HTTP/ASGI overhead.
+    auth_dependency.SUPABASE_JWT_SECRET = SECRET
+    auth_dependency.TOKEN_CACHE_ENABLED = False
+    tokens = make_tokens(args.tokens)
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        single = await per_token(client, tokens)
+        batch = await batched(client, tokens, args.batch)
+    print(f"per-token requests:          {single:10,.0f} tokens/s")
+    print(f"introspect (batch={args.batch}):      {batch:10,.0f} tokens/s  ({batch / single:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=100)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Per-request cost of the metrics middleware: a small FastAPI route called
+straight through ASGI (no sockets), with and without MetricsMiddleware,
+plus the cost of one record_dependency call.
+
+    python -m benchmarks.bench_metrics --requests 10000 --rounds 5
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI
+
+from app.utils import metrics
+from app.utils.metrics import MetricsMiddleware, record_dependency
+
+
+def make_app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+    if instrumented:
+        app.add_middleware(MetricsMiddleware, server_timing=True)
+
+    @app.get("/api/users/{user_id}")
+    async def get_user(user_id: str):
+        # what a typical route reports: a couple of queries and one upstream call
+        record_dependency("db", "fetchrow", 0.001)
+        record_dependency("db", "execute", 0.001)
+        record_dependency("http", "supabase.login", 0.01)
+        return {"id": user_id}
+
+    return app
+
+
+async def call(app, path: str):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def run(app, requests: int, rounds: int) -> float:
+    """Best of `rounds` mean times per request, which filters out scheduler noise."""
+    for i in range(1000):   # warm up routing and the middleware stack
+        await call(app, f"/api/users/{i}")
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for i in range(requests):
+            await call(app, f"/api/users/{i}")
+        best = min(best, (time.perf_counter() - start) / requests)
+    return best
+
+
+async def bare_app(scope, receive, send):
+    """A response with no framework work, so the middleware's own cost stands out."""
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def report(label: str, plain: float, instrumented: float):
+    print(
+        f"{label:<8} without: {plain * 1e6:7.1f} us/request   with: {instrumented * 1e6:7.1f} us/request"
+        f"   overhead: {(instrumented - plain) * 1e6:5.1f} us"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    report(
+        "bare",
+        asyncio.run(run(bare_app, args.requests, args.rounds)),
+        asyncio.run(run(MetricsMiddleware(bare_app, server_timing=True), args.requests, args.rounds)),
+    )
+    report(
+        "fastapi",
+        asyncio.run(run(make_app(False), args.requests, args.rounds)),
+        asyncio.run(run(make_app(True), args.requests, args.rounds)),
+    )
+
+    calls = 1_000_000
+    start = time.perf_counter()
+    for _ in range(calls):
+        record_dependency("db", "fetch", 0.001)
+    print(f"record_dependency: {(time.perf_counter() - start) / calls * 1e9:.0f} ns/call")
+    print(f"series: {sum(len(h._series) for h in metrics.histograms)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+OTP creation against a real Postgres: the old BEGIN / UPDATE / INSERT /
+INSERT / COMMIT transaction vs the single-statement named prepared CTE.
+Reports creations per second and pool occupancy while N starts run at once.
+Every round repeats the same addresses, so the last run ("resend") shows
+how many writes and emails the resend cooldown saves on repeated starts.
+
+    ROOTS_VISION_AI_BENCH_DB_URL=postgresql://... \\
+        python -m benchmarks.bench_otp_create --concurrency 500 --rounds 4
+
+The target database needs the email_otp and email_outbox tables (run
+run_migrations.py first). Rows are written under @bench.invalid addresses
+and deleted afterwards.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import asyncpg
+
+from app.db import AuthConnection
+from app.services.email_otp_repo import create_email_otp
+from app.utils.otp_utils import generate_otp, compute_expiry
+
+
+async def create_email_otp_transaction(pool: asyncpg.pool.Pool, email: str, purpose: str, ttl_minutes: int = 10):
+    """The pre-CTE implementation, kept here as the baseline."""
+    otp = generate_otp(6)
+    expires_at = compute_expiry(ttl_minutes)
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute(
+                "update email_otp set consumed_at = now() "
+                "where email = $1 and purpose = $2 and consumed_at is null;",
+                email, purpose,
+            )
+            await conn.execute(
+                "insert into email_otp (email, otp_hash, purpose, expires_at) values ($1, $2, $3, $4);",
+                email, otp, purpose, expires_at,
+            )
+            await conn.execute("insert into email_outbox (to_email, otp) values ($1, $2);", email, otp)
+    return otp
+
+
+def on_pool(cooldown_seconds: float | None = None):
+    """create_email_otp on a connection acquired per call, like a request."""
+    async def create(pool: asyncpg.pool.Pool, email: str, purpose: str):
+        kwargs = {} if cooldown_seconds is None else {"cooldown_seconds": cooldown_seconds}
+        async with pool.acquire() as conn:
+            return await create_email_otp(conn, email=email, purpose=purpose, **kwargs)
+    return create
+
+
+async def sample_occupancy(pool: asyncpg.pool.Pool, samples: list[int], stop: asyncio.Event):
+    while not stop.is_set():
+        samples.append(pool.get_size() - pool.get_idle_size())
+        await asyncio.sleep(0.001)
+
+
+async def run(name: str, create, pool: asyncpg.pool.Pool, concurrency: int, rounds: int):
+    samples: list[int] = []
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_occupancy(pool, samples, stop))
+
+    start = time.perf_counter()
+    for r in range(rounds):
+        await asyncio.gather(*(
+            create(pool, email=f"{name}-{i}@bench.invalid", purpose="login")
+            for i in range(concurrency)
+        ))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await sampler
+    total = concurrency * rounds
+    print(
+        f"{name:<14} {total / elapsed:9.1f} creates/s  "
+        f"pool in use: mean {statistics.mean(samples):4.1f} / max {max(samples)} of {pool.get_max_size()}"
+    )
+
+
+async def main(args):
+    dsn = os.getenv("ROOTS_VISION_AI_BENCH_DB_URL") or os.getenv("ROOTS_VISION_AI_AUTH_DB_URL")
+    if not dsn:
+        raise SystemExit("Set ROOTS_VISION_AI_BENCH_DB_URL to a scratch database")
+
+    pool = await asyncpg.create_pool(dsn, min_size=1, max_size=args.pool_size, connection_class=AuthConnection)
+    try:
+        await run("transaction", create_email_otp_transaction, pool, args.concurrency, args.rounds)
+        await run("prepared-cte", on_pool(cooldown_seconds=0), pool, args.concurrency, args.rounds)
+
+        queued = "select count(*) from email_outbox where to_email like 'resend-%@bench.invalid';"
+        await run("resend", on_pool(), pool, args.concurrency, args.rounds)
+        print(f"resend: {await pool.fetchval(queued)} emails queued for {args.concurrency * args.rounds} starts")
+    finally:
+        await pool.execute("delete from email_outbox where to_email like '%@bench.invalid';")
+        await pool.execute("delete from email_otp where email like '%@bench.invalid';")
+        await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=4)
+    parser.add_argument("--pool-size", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
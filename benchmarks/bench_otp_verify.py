@@ -0,0 +1,82 @@
+"""
+OTP verification latency against a real Postgres: the old SELECT, compare
+in Python, then UPDATE path vs the single conditional UPDATE ... RETURNING
+statement.
+
+    ROOTS_VISION_AI_BENCH_DB_URL=postgresql://... python -m benchmarks.bench_otp_verify --codes 2000
+
+Needs the email_otp and email_outbox tables (run run_migrations.py first).
+Rows are written under @bench.invalid addresses and deleted afterwards.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from datetime import datetime
+
+import asyncpg
+
+from app.db import AuthConnection
+from app.services.email_otp_repo import OTP_OK, create_email_otp, verify_email_otp
+from app.utils.otp_utils import hash_otp
+from benchmarks.bench_supabase_client import percentile
+
+
+async def verify_email_otp_two_step(pool: asyncpg.pool.Pool, email: str, otp: str, purpose: str) -> str:
+    """The pre-CTE implementation (adapted to hashed codes), kept as the baseline."""
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            "select id, expires_at, consumed_at, otp_hash from email_otp "
+            "where email = $1 and purpose = $2 order by created_at desc limit 1;",
+            email, purpose,
+        )
+        if not row or row["consumed_at"] is not None or datetime.utcnow() > row["expires_at"]:
+            return "missing"
+        if row["otp_hash"] != hash_otp(otp):
+            return "mismatch"
+        await conn.execute("update email_otp set consumed_at = now() where id = $1;", row["id"])
+    return OTP_OK
+
+
+async def verify_email_otp_atomic(pool: asyncpg.pool.Pool, email: str, otp: str, purpose: str) -> str:
+    async with pool.acquire() as conn:
+        return await verify_email_otp(conn, email=email, otp=otp, purpose=purpose)
+
+
+async def run(name: str, verify, pool: asyncpg.pool.Pool, codes: int):
+    emails = [f"{name}-{i}@bench.invalid" for i in range(codes)]
+    async with pool.acquire() as conn:
+        otps = [await create_email_otp(conn, email=email, purpose="login") for email in emails]
+
+    latencies = []
+    for email, otp in zip(emails, otps):
+        start = time.perf_counter()
+        assert await verify(pool, email=email, otp=otp, purpose="login") == OTP_OK
+        latencies.append(time.perf_counter() - start)
+
+    print(
+        f"{name:<12} p50={percentile(latencies, 50) * 1000:6.3f}ms "
+        f"p99={percentile(latencies, 99) * 1000:6.3f}ms mean={statistics.mean(latencies) * 1000:6.3f}ms"
+    )
+
+
+async def main(args):
+    dsn = os.getenv("ROOTS_VISION_AI_BENCH_DB_URL") or os.getenv("ROOTS_VISION_AI_AUTH_DB_URL")
+    if not dsn:
+        raise SystemExit("Set ROOTS_VISION_AI_BENCH_DB_URL to a scratch database")
+
+    pool = await asyncpg.create_pool(dsn, min_size=1, max_size=5, connection_class=AuthConnection)
+    try:
+        await run("two-step", verify_email_otp_two_step, pool, args.codes)
+        await run("atomic", verify_email_otp_atomic, pool, args.codes)
+    finally:
+        await pool.execute("delete from email_outbox where to_email like '%@bench.invalid';")
+        await pool.execute("delete from email_otp where email like '%@bench.invalid';")
+        await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--codes", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,94 @@
+"""
+Hot OTP queries (create, then verify) in three setups:
+
+    direct      asyncpg straight to Postgres, statement cache on
+    cache-off   through PgBouncer in transaction mode, statement cache off
+                and every query unnamed (the usual asyncpg + PgBouncer advice)
+    pgbouncer   through PgBouncer with DB_PGBOUNCER_TRANSACTION_MODE's
+                pool options: only the hot queries stay named
+
+A local PgBouncer (>= 1.21) in front of the benchmark database will do:
+
+    docker run --rm -p 6432:5432 -e DATABASE_URL=postgresql://... \\
+        -e POOL_MODE=transaction -e MAX_PREPARED_STATEMENTS=100 edoburu/pgbouncer
+    ROOTS_VISION_AI_BENCH_DB_URL=postgresql://...:5432/... \\
+    ROOTS_VISION_AI_BENCH_PGBOUNCER_URL=postgresql://...:6432/... \\
+        python -m benchmarks.bench_pgbouncer --concurrency 50 --codes 2000
+
+The target database needs the email_otp and email_outbox tables (run
+run_migrations.py first). Rows are written under @bench.invalid addresses
+and deleted afterwards.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import asyncpg
+
+from app.db import PgBouncerConnection, pool_options
+from app.services.email_otp_repo import OTP_OK, create_email_otp, verify_email_otp
+from benchmarks.bench_supabase_client import percentile
+
+
+class CacheOffConnection(PgBouncerConnection):
+    named_statements = False
+
+
+async def run(name: str, dsn: str, options: dict, concurrency: int, codes: int):
+    pool = await asyncpg.create_pool(dsn, min_size=concurrency, max_size=concurrency, **options)
+    latencies: list[float] = []
+    queue: asyncio.Queue[str] = asyncio.Queue()
+    for i in range(codes):
+        queue.put_nowait(f"{name}-{i}@bench.invalid")
+
+    async def worker():
+        while not queue.empty():
+            email = queue.get_nowait()
+            start = time.perf_counter()
+            async with pool.acquire() as conn:
+                otp = await create_email_otp(conn, email=email, purpose="login", cooldown_seconds=0)
+            async with pool.acquire() as conn:
+                assert await verify_email_otp(conn, email=email, otp=otp, purpose="login") == OTP_OK
+            latencies.append(time.perf_counter() - start)
+
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    finally:
+        await pool.close()
+
+    print(
+        f"{name:<10} {codes / elapsed:8.1f} create+verify/s  "
+        f"p50={percentile(latencies, 50) * 1000:6.3f}ms p99={percentile(latencies, 99) * 1000:6.3f}ms"
+    )
+
+
+async def main(args):
+    dsn = os.getenv("ROOTS_VISION_AI_BENCH_DB_URL") or os.getenv("ROOTS_VISION_AI_AUTH_DB_URL")
+    bouncer_dsn = os.getenv("ROOTS_VISION_AI_BENCH_PGBOUNCER_URL")
+    if not dsn or not bouncer_dsn:
+        raise SystemExit("Set ROOTS_VISION_AI_BENCH_DB_URL and ROOTS_VISION_AI_BENCH_PGBOUNCER_URL")
+
+    try:
+        await run("direct", dsn, pool_options(False), args.concurrency, args.codes)
+        await run(
+            "cache-off", bouncer_dsn,
+            {"statement_cache_size": 0, "connection_class": CacheOffConnection}, args.concurrency, args.codes,
+        )
+        await run("pgbouncer", bouncer_dsn, pool_options(True), args.concurrency, args.codes)
+        if not PgBouncerConnection.named_statements:
+            print("pgbouncer: named statements were turned off; is max_prepared_statements set?")
+    finally:
+        conn = await asyncpg.connect(dsn)
+        await conn.execute("delete from email_outbox where to_email like '%@bench.invalid';")
+        await conn.execute("delete from email_otp where email like '%@bench.invalid';")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--codes", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,104 @@
+"""
+Supabase login latency: per-call `requests.post` (old) vs the shared
+keep-alive `httpx.AsyncClient` (new), against a local fake Supabase.
+
+    python -m benchmarks.bench_supabase_client --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import requests
+
+from benchmarks.fakes import FakeSupabase
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(name: str, latencies: list[float], elapsed: float, connections: int):
+    print(
+        f"{name:<28} p50={percentile(latencies, 50) * 1000:7.2f}ms "
+        f"p99={percentile(latencies, 99) * 1000:7.2f}ms "
+        f"mean={statistics.mean(latencies) * 1000:7.2f}ms "
+        f"rps={len(latencies) / elapsed:9.1f} "
+        f"upstream_connections={connections}"
+    )
+
+
+async def run_load(call, total: int, concurrency: int) -> tuple[list[float], float]:
+    latencies: list[float] = []
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+
+async def bench_old(url: str, total: int, concurrency: int):
+    def login():
+        r = requests.post(
+            f"{url}/auth/v1/token?grant_type=password",
+            json={"email": "bench@example.com", "password": "secret"},
+            headers={"Content-Type": "application/json"},
+        )
+        r.raise_for_status()
+        return r.json()
+
+    async def call():
+        # The old route ran the sync call on the event loop; running it in a
+        # thread is the most generous version of the old path.
+        await asyncio.to_thread(login)
+
+    return await run_load(call, total, concurrency)
+
+
+async def bench_new(url: str, total: int, concurrency: int):
+    from app.http_client import build_http_client
+
+    client = build_http_client()
+
+    async def call():
+        r = await client.post(
+            f"{url}/auth/v1/token?grant_type=password",
+            json={"email": "bench@example.com", "password": "secret"},
+            headers={"Content-Type": "application/json"},
+        )
+        r.raise_for_status()
+        r.json()
+
+    try:
+        return await run_load(call, total, concurrency)
+    finally:
+        await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02, help="fake upstream service time in seconds")
+    parser.add_argument("--handshake", type=float, default=0.04, help="fake TCP+TLS setup cost per new connection")
+    args = parser.parse_args()
+
+    for name, bench in (("requests.post per call", bench_old), ("shared httpx.AsyncClient", bench_new)):
+        upstream = FakeSupabase(latency=args.latency, handshake=args.handshake).start_process()
+        try:
+            latencies, elapsed = asyncio.run(bench(upstream.url, args.requests, args.concurrency))
+            report(name, latencies, elapsed, upstream.connections)
+        finally:
+            upstream.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Bearer token verifications per second on one core, with the verification
+cache on and off.
+
+    python -m benchmarks.bench_token_verify --iterations 200000 --distinct 1000
+"""
+import argparse
+import time
+
+import jwt
+
+from app.utils import auth_dependency
+
+SECRET = "bench-secret"
+
+
+def make_tokens(count: int) -> list[str]:
+    exp = int(time.time()) + 3600
+    return [
+        jwt.encode(
+            {"sub": f"user-{i}", "role": "authenticated", "email": f"user{i}@example.com", "exp": exp},
+            SECRET,
+            algorithm="HS256",
+        )
+        for i in range(count)
+    ]
+
+
+def run(tokens: list[str], iterations: int, cache: bool) -> float:
+    auth_dependency.TOKEN_CACHE_ENABLED = cache
+    auth_dependency.token_cache.clear()
+    verify = auth_dependency.verify_token
+    count = len(tokens)
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        verify(tokens[i % count])
+    return iterations / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200_000)
+    parser.add_argument("--distinct", type=int, default=1000, help="number of distinct tokens in rotation")
+    args = parser.parse_args()
+
+    auth_dependency.SUPABASE_JWT_SECRET = SECRET
+    tokens = make_tokens(args.distinct)
+
+    off = run(tokens, args.iterations, cache=False)
+    on = run(tokens, args.iterations, cache=True)
+    print(f"cache off: {off:12,.0f} verifications/s/core")
+    print(f"cache on:  {on:12,.0f} verifications/s/core  ({on / off:.1f}x)")
+    print(f"cache stats: {auth_dependency.token_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Local stand-ins for the upstream services used by the benchmarks (and by a
+few tests): a fake Supabase HTTP API and a fake SMTP relay. They run in
+background threads (or a child process) so that both sync (requests /
+smtplib) and async clients can talk to them.
+"""
+import asyncio
+import json
+import multiprocessing
+import socket
+import threading
+import time
+
+
+class FakeSupabase:
+    """
+    Minimal HTTP/1.1 server that answers the Supabase auth endpoints we call.
+    Supports keep-alive, so connection reuse is visible in `connections`.
+
+    `start()` serves from a thread of the current process (handy in tests);
+    `start_process()` serves from a child process so load generators do not
+    share a GIL with the server.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        handshake: float = 0.0,
+        fault_status: int | None = None,
+    ):
+        self.host = host
+        self.port = port
+        # per-request service time, and the extra cost of a fresh connection
+        # (stands in for the TCP + TLS round trips of a real remote upstream)
+        self.latency = latency
+        self.handshake = handshake
+        # when set, every request is answered with this status (e.g. 503);
+        # like `latency`, it can be changed while a thread server runs
+        self.fault_status = fault_status
+        self._connections = multiprocessing.Value("q", 0, lock=False)
+        self._requests = multiprocessing.Value("q", 0, lock=False)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._server: asyncio.AbstractServer | None = None
+        self._thread: threading.Thread | None = None
+        self._process: multiprocessing.Process | None = None
+        self._ready = threading.Event()
+
+    @property
+    def connections(self) -> int:
+        return self._connections.value
+
+    @property
+    def requests(self) -> int:
+        return self._requests.value
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def respond(self, method: str, path: str, body: bytes) -> tuple[int, dict]:
+        if self.fault_status:
+            return self.fault_status, {"error": "injected fault"}
+        if path.startswith("/auth/v1/admin/users"):
+            payload = json.loads(body or b"{}")
+            return 200, {"id": "user-1", "email": payload.get("email")}
+        if path.startswith("/auth/v1/token"):
+            return 200, {"access_token": "access", "refresh_token": "refresh", "expires_in": 3600}
+        return 404, {"error": "not found"}
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections.value += 1
+        if self.handshake:
+            await asyncio.sleep(self.handshake)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, value = line.decode("latin-1").split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", "0"))
+                body = await reader.readexactly(length) if length else b""
+
+                self._requests.value += 1
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                status, payload = self.respond(method, path, body)
+                data = json.dumps(payload).encode()
+                close = headers.get("connection", "").lower() == "close"
+                writer.write(
+                    f"HTTP/1.1 {status} OK\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n".encode()
+                    + data
+                )
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _run(self, sock: socket.socket | None = None):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        if sock is None:
+            start = asyncio.start_server(self._handle, self.host, self.port, backlog=1024)
+        else:
+            start = asyncio.start_server(self._handle, sock=sock, backlog=1024)
+        self._server = self._loop.run_until_complete(start)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    def start(self) -> "FakeSupabase":
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def start_process(self) -> "FakeSupabase":
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        self.port = sock.getsockname()[1]
+        context = multiprocessing.get_context("fork")
+        self._process = context.Process(target=self._run, args=(sock,), daemon=True)
+        self._process.start()
+        sock.close()
+        return self
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+            return
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    async def _shutdown(self):
+        # also end connections still mid-request (e.g. ones a client timed out on)
+        self._server.close()
+        handlers = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in handlers:
+            task.cancel()
+        await asyncio.gather(*handlers, return_exceptions=True)
+
+    def __enter__(self) -> "FakeSupabase":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+class FakeSMTP:
+    """
+    Minimal SMTP relay (no TLS, no AUTH) in a background thread, in the spirit
+    of aiosmtpd's Debugging handler. `latency` is added to every reply to
+    stand in for the round trip to a real relay; `drop_after` closes a
+    connection after that many messages to simulate relay-side disconnects;
+    recipients in `reject` are refused with 550; `hang_up_in_data` closes the
+    connection after taking a message's data, before acknowledging it.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        drop_after: int | None = None,
+        reject: tuple[str, ...] = (),
+        hang_up_in_data: bool = False,
+    ):
+        import socketserver
+
+        fake = self
+        self.latency = latency
+        self.drop_after = drop_after
+        self.reject = {address.lower() for address in reject}
+        self.hang_up_in_data = hang_up_in_data
+        self.connections = 0
+        self.messages: list[bytes] = []
+        self._lock = threading.Lock()
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line: str):
+                if fake.latency:
+                    time.sleep(fake.latency)
+                self.wfile.write(line.encode() + b"\r\n")
+
+            def handle(self):
+                with fake._lock:
+                    fake.connections += 1
+                sent = 0
+                self.reply("220 fake-smtp ready")
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode("latin-1").strip().upper()
+                    if command.startswith(("EHLO", "HELO")):
+                        self.reply("250 fake-smtp")
+                    elif command.startswith("RCPT") and command.partition("<")[2].rstrip(">").lower() in fake.reject:
+                        self.reply("550 No such user")
+                    elif command.startswith(("MAIL", "RCPT", "RSET", "NOOP")):
+                        self.reply("250 OK")
+                    elif command == "DATA":
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        data = []
+                        while (chunk := self.rfile.readline()) not in (b".\r\n", b""):
+                            data.append(chunk)
+                        with fake._lock:
+                            fake.messages.append(b"".join(data))
+                        if fake.hang_up_in_data:
+                            return
+                        self.reply("250 Queued")
+                        sent += 1
+                        if fake.drop_after and sent >= fake.drop_after:
+                            return
+                    elif command == "QUIT":
+                        self.reply("221 Bye")
+                        return
+                    else:
+                        self.reply("502 Not implemented")
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self._server = Server((host, port), Handler)
+        self.host, self.port = self._server.server_address
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "FakeSMTP":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeSMTP":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
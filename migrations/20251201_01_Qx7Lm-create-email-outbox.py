@@ -0,0 +1,34 @@
+"""
+create_email_outbox
+"""
+
+from yoyo import step
+
+__depends__ = {'20251127_02_ra79K-create-roots-vision-otp-table'}
+
+steps = [
+    step(
+        # --- UP ---
+        """
+        CREATE TABLE IF NOT EXISTS email_outbox (
+          id bigserial PRIMARY KEY,
+          to_email text NOT NULL,
+          otp text NOT NULL,
+          attempts int NOT NULL DEFAULT 0,
+          next_attempt_at timestamptz NOT NULL DEFAULT now(),
+          created_at timestamptz NOT NULL DEFAULT now(),
+          failed_at timestamptz,
+          last_error text
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_email_outbox_due
+          ON email_outbox (next_attempt_at)
+          WHERE failed_at IS NULL;
+        """,
+
+        """
+        DROP INDEX IF EXISTS idx_email_outbox_due;
+        DROP TABLE IF EXISTS email_outbox;
+        """
+    )
+]
@@ -0,0 +1,32 @@
+"""
+create_email_otp_table
+
+The table the OTP code actually queries (email + purpose, newest first).
+IF NOT EXISTS keeps this a no-op where it was created by hand.
+"""
+
+from yoyo import step
+
+__depends__ = {'20251201_01_Qx7Lm-create-email-outbox'}
+
+steps = [
+    step(
+        # --- UP ---
+        """
+        CREATE TABLE IF NOT EXISTS email_otp (
+          id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+          email text NOT NULL,
+          otp_hash text NOT NULL,
+          purpose text NOT NULL,
+          created_at timestamptz NOT NULL DEFAULT now(),
+          expires_at timestamptz NOT NULL,
+          consumed_at timestamptz,
+          retry_count int NOT NULL DEFAULT 0
+        );
+        """,
+
+        """
+        DROP TABLE IF EXISTS email_otp;
+        """
+    )
+]
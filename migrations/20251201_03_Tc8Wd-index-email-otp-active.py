@@ -0,0 +1,28 @@
+"""
+index_email_otp_active
+
+Partial index for the hot OTP queries: the retire UPDATE in create and the
+latest-active-code lookup in verify both filter on consumed_at IS NULL and
+read newest first. Built CONCURRENTLY so it can be applied online, which
+requires running outside a transaction.
+"""
+
+from yoyo import step
+
+__depends__ = {'20251201_02_Hn3Ve-create-email-otp-table'}
+__transactional__ = False
+
+steps = [
+    step(
+        # --- UP ---
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_email_otp_active
+          ON email_otp (email, purpose, created_at DESC)
+          WHERE consumed_at IS NULL;
+        """,
+
+        """
+        DROP INDEX CONCURRENTLY IF EXISTS idx_email_otp_active;
+        """
+    )
+]
@@ -0,0 +1,89 @@
+"""
+partition_email_otp_by_day
+
+Rebuild email_otp as a table range-partitioned by created_at, one partition
+per UTC day. Retention becomes dropping old partitions (run_otp_maintenance.py)
+instead of deleting rows. Only rows from the last day are carried over: codes
+live for minutes, and older rows are exactly what retention would drop.
+"""
+
+from yoyo import step
+
+__depends__ = {'20251201_03_Tc8Wd-index-email-otp-active'}
+
+steps = [
+    step(
+        # --- UP ---
+        """
+        ALTER TABLE email_otp RENAME TO email_otp_unpartitioned;
+        DROP INDEX IF EXISTS idx_email_otp_active;
+
+        CREATE TABLE email_otp (
+          id uuid NOT NULL DEFAULT gen_random_uuid(),
+          email text NOT NULL,
+          otp_hash text NOT NULL,
+          purpose text NOT NULL,
+          created_at timestamptz NOT NULL DEFAULT now(),
+          expires_at timestamptz NOT NULL,
+          consumed_at timestamptz,
+          retry_count int NOT NULL DEFAULT 0,
+          PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at);
+
+        CREATE INDEX idx_email_otp_active
+          ON email_otp (email, purpose, created_at DESC)
+          WHERE consumed_at IS NULL;
+
+        DO $$
+        DECLARE
+          day date;
+        BEGIN
+          FOR day IN
+            SELECT generate_series((now() AT TIME ZONE 'utc')::date - 1,
+                                   (now() AT TIME ZONE 'utc')::date + 7,
+                                   interval '1 day')::date
+          LOOP
+            EXECUTE format(
+              'CREATE TABLE IF NOT EXISTS %I PARTITION OF email_otp FOR VALUES FROM (%L) TO (%L)',
+              'email_otp_p' || to_char(day, 'YYYYMMDD'),
+              day::text || ' 00:00:00+00',
+              (day + 1)::text || ' 00:00:00+00'
+            );
+          END LOOP;
+        END $$;
+
+        INSERT INTO email_otp (id, email, otp_hash, purpose, created_at, expires_at, consumed_at, retry_count)
+        SELECT id, email, otp_hash, purpose, created_at, expires_at, consumed_at, retry_count
+          FROM email_otp_unpartitioned
+         WHERE created_at >= ((now() AT TIME ZONE 'utc')::date - 1)::timestamp AT TIME ZONE 'utc'
+           AND created_at < ((now() AT TIME ZONE 'utc')::date + 8)::timestamp AT TIME ZONE 'utc';
+
+        DROP TABLE email_otp_unpartitioned;
+        """,
+
+        """
+        CREATE TABLE email_otp_unpartitioned (
+          id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+          email text NOT NULL,
+          otp_hash text NOT NULL,
+          purpose text NOT NULL,
+          created_at timestamptz NOT NULL DEFAULT now(),
+          expires_at timestamptz NOT NULL,
+          consumed_at timestamptz,
+          retry_count int NOT NULL DEFAULT 0
+        );
+
+        INSERT INTO email_otp_unpartitioned
+        SELECT id, email, otp_hash, purpose, created_at, expires_at, consumed_at, retry_count
+          FROM email_otp;
+
+        DROP TABLE email_otp;
+        ALTER TABLE email_otp_unpartitioned RENAME TO email_otp;
+        ALTER TABLE email_otp RENAME CONSTRAINT email_otp_unpartitioned_pkey TO email_otp_pkey;
+
+        CREATE INDEX idx_email_otp_active
+          ON email_otp (email, purpose, created_at DESC)
+          WHERE consumed_at IS NULL;
+        """
+    )
+]
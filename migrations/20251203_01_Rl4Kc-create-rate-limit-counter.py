@@ -0,0 +1,35 @@
+"""
+create_rate_limit_counter
+
+Shared counters behind the OTP start rate limits: one row per limited key
+(email, client IP, global), holding the current and previous fixed window
+counts for the sliding-window estimate. UNLOGGED: no WAL for these hot
+upserts, and losing the counters on a crash only resets the limits.
+"""
+
+from yoyo import step
+
+__depends__ = {'20251202_01_Wp5Rk-partition-email-otp-by-day'}
+
+steps = [
+    step(
+        # --- UP ---
+        """
+        CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_counter (
+          key text PRIMARY KEY,
+          window_id bigint NOT NULL,
+          count int NOT NULL,
+          prev_count int NOT NULL DEFAULT 0,
+          expires_at timestamptz NOT NULL
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_rate_limit_counter_expires
+          ON rate_limit_counter (expires_at);
+        """,
+
+        """
+        DROP INDEX IF EXISTS idx_rate_limit_counter_expires;
+        DROP TABLE IF EXISTS rate_limit_counter;
+        """
+    )
+]
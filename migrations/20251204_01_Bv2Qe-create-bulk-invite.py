@@ -0,0 +1,63 @@
+"""
+create_bulk_invite
+
+Bulk OTP invitation jobs. `processed` counts the input rows already turned
+into codes and outbox rows; it is advanced in the same transaction as each
+chunk's COPY, so a job restarted from its input resumes exactly there.
+Invitation emails go out through email_outbox, scheduled `next_send_at`
+onwards at the job's rate, and keep their job id for progress reporting.
+The outbox's due index is split so workers can claim interactive codes
+before bulk ones without sorting the bulk backlog.
+"""
+
+from yoyo import step
+
+__depends__ = {'20251203_01_Rl4Kc-create-rate-limit-counter'}
+
+steps = [
+    step(
+        # --- UP ---
+        """
+        CREATE TABLE IF NOT EXISTS bulk_invite (
+          id bigserial PRIMARY KEY,
+          purpose text NOT NULL,
+          ttl_minutes int NOT NULL,
+          rate_per_second float8 NOT NULL,
+          source text,
+          processed bigint NOT NULL DEFAULT 0,
+          queued bigint NOT NULL DEFAULT 0,
+          skipped bigint NOT NULL DEFAULT 0,
+          next_send_at timestamptz NOT NULL DEFAULT now(),
+          created_at timestamptz NOT NULL DEFAULT now(),
+          finished_at timestamptz
+        );
+
+        ALTER TABLE email_outbox ADD COLUMN IF NOT EXISTS valid_minutes int NOT NULL DEFAULT 10;
+        ALTER TABLE email_outbox ADD COLUMN IF NOT EXISTS bulk_invite_id bigint;
+
+        CREATE INDEX IF NOT EXISTS idx_email_outbox_bulk_invite
+          ON email_outbox (bulk_invite_id)
+          WHERE bulk_invite_id IS NOT NULL;
+
+        DROP INDEX IF EXISTS idx_email_outbox_due;
+        CREATE INDEX IF NOT EXISTS idx_email_outbox_due_interactive
+          ON email_outbox (next_attempt_at)
+          WHERE failed_at IS NULL AND bulk_invite_id IS NULL;
+        CREATE INDEX IF NOT EXISTS idx_email_outbox_due_bulk
+          ON email_outbox (next_attempt_at)
+          WHERE failed_at IS NULL AND bulk_invite_id IS NOT NULL;
+        """,
+
+        """
+        DROP INDEX IF EXISTS idx_email_outbox_due_bulk;
+        DROP INDEX IF EXISTS idx_email_outbox_due_interactive;
+        CREATE INDEX IF NOT EXISTS idx_email_outbox_due
+          ON email_outbox (next_attempt_at)
+          WHERE failed_at IS NULL;
+        DROP INDEX IF EXISTS idx_email_outbox_bulk_invite;
+        ALTER TABLE email_outbox DROP COLUMN IF EXISTS bulk_invite_id;
+        ALTER TABLE email_outbox DROP COLUMN IF EXISTS valid_minutes;
+        DROP TABLE IF EXISTS bulk_invite;
+        """
+    )
+]
@@ -0,0 +1,29 @@
+"""
+drop_parked_outbox_codes
+
+A message parked as failed for good is kept for its error and the failure
+counts, but its code can never be sent: it is cleared when the message is
+parked, so plaintext codes do not outlive their delivery attempts.
+"""
+
+from yoyo import step
+
+__depends__ = {'20251204_01_Bv2Qe-create-bulk-invite'}
+
+steps = [
+    step(
+        # --- UP ---
+        """
+        ALTER TABLE email_outbox ALTER COLUMN otp DROP NOT NULL;
+
+        UPDATE email_outbox SET otp = NULL WHERE failed_at IS NOT NULL;
+        """,
+
+        """
+        -- only parked messages lack a code; without one they can never be
+        -- sent, so they go rather than get a fake code a rollback could queue
+        DELETE FROM email_outbox WHERE otp IS NULL;
+        ALTER TABLE email_outbox ALTER COLUMN otp SET NOT NULL;
+        """
+    )
+]
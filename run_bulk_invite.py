@@ -0,0 +1,75 @@
+import argparse
+import asyncio
+import json
+import os
+
+import asyncpg
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.core.config import BULK_INVITE_CHUNK_SIZE, BULK_INVITE_RATE_PER_SECOND, BULK_INVITE_TTL_MINUTES  # noqa: E402
+from app.db import pool_options  # noqa: E402
+from app.services.bulk_invites import (  # noqa: E402
+    bulk_invite_progress,
+    count_invite_rows,
+    create_bulk_invite,
+    read_invite_emails,
+    run_bulk_invite,
+)
+from app.utils.otp_utils import check_otp_settings  # noqa: E402
+
+KINDS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Issue OTP codes to a list of emails and queue the invitations.")
+    parser.add_argument("file", nargs="?", help="one email per line, or .csv / .ndjson with an email field")
+    parser.add_argument("--purpose", default="register", choices=("register", "login"))
+    parser.add_argument("--ttl-minutes", type=int, default=BULK_INVITE_TTL_MINUTES)
+    parser.add_argument("--rate", type=float, default=BULK_INVITE_RATE_PER_SECOND, help="emails per second")
+    parser.add_argument("--chunk-size", type=int, default=BULK_INVITE_CHUNK_SIZE)
+    parser.add_argument("--resume", type=int, metavar="JOB", help="continue JOB with the same file")
+    parser.add_argument("--status", type=int, metavar="JOB", help="print JOB's progress and exit")
+    args = parser.parse_args()
+    if args.status is None and args.file is None:
+        parser.error("a file is required unless --status is given")
+    return args
+
+
+async def main(args: argparse.Namespace):
+    db_url = os.getenv("ROOTS_VISION_AI_AUTH_DB_URL")
+    if not db_url:
+        raise RuntimeError("ROOTS_VISION_AI_AUTH_DB_URL is not set")
+    check_otp_settings()
+
+    pool = await asyncpg.create_pool(db_url, min_size=1, max_size=2, **pool_options())
+    try:
+        if args.status is not None:
+            async with pool.acquire() as conn:
+                progress = await bulk_invite_progress(conn, args.status)
+            print(json.dumps(progress, default=str, indent=2))
+            return
+
+        job_id = args.resume
+        if job_id is None:
+            async with pool.acquire() as conn:
+                job_id = await create_bulk_invite(
+                    conn, args.purpose, args.ttl_minutes, args.rate, source=os.path.basename(args.file)
+                )
+        print(f"bulk invite {job_id} (resume with --resume {job_id})")
+
+        kind = KINDS.get(os.path.splitext(args.file)[1].lower(), "text")
+        with open(args.file, "rb") as file:
+            total_rows = count_invite_rows(file, kind)
+            progress = await run_bulk_invite(
+                pool, job_id, read_invite_emails(file, kind), total_rows, args.chunk_size,
+                on_chunk=lambda processed: print(f"{processed} rows processed"),
+            )
+        print(json.dumps(progress, default=str, indent=2))
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
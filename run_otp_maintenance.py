@@ -0,0 +1,34 @@
+import asyncio
+import os
+
+import asyncpg
+from dotenv import load_dotenv
+
+from app.services.otp_partitions import ensure_partitions, drop_expired_partitions
+from app.services.rate_limiter import prune_rate_limit_counters
+
+load_dotenv()
+
+DB_URL = os.getenv("ROOTS_VISION_AI_AUTH_DB_URL")
+if not DB_URL:
+    raise RuntimeError("ROOTS_VISION_AI_AUTH_DB_URL is not set")
+
+
+async def main():
+    conn = await asyncpg.connect(DB_URL)
+    try:
+        created = await ensure_partitions(conn)
+        dropped = await drop_expired_partitions(conn)
+        pruned = await prune_rate_limit_counters(conn)
+    finally:
+        await conn.close()
+
+    for name in created:
+        print(f"created partition {name}")
+    for name, size in dropped:
+        print(f"dropped partition {name} ({size} bytes)")
+    print(f"bytes reclaimed: {sum(size for _, size in dropped)}")
+    print(f"expired rate limit counters removed: {pruned}")
+
+
+asyncio.run(main())
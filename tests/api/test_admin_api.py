@@ -0,0 +1,160 @@
+import json
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import jwt
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.admin import router as admin_router
+from app.db import get_db_pool
+from app.services import user_provisioning
+from app.utils import auth_dependency
+from app.utils.auth_dependency import get_current_user
+
+
+@pytest.fixture
+def claims():
+    return {"sub": "admin-1", "role": "authenticated", "app_metadata": {"role": "admin"}}
+
+
+@pytest.fixture
+def client(claims, monkeypatch):
+    async def fake_register(email, phone, password, endpoint=None):
+        return {"id": f"id-{email or phone}"}
+
+    monkeypatch.setattr(user_provisioning.supabase_service, "register", fake_register)
+    app = FastAPI()
+    app.include_router(admin_router)
+    app.dependency_overrides[get_current_user] = lambda: claims
+    return TestClient(app)
+
+
+def lines(response) -> list[dict]:
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_bulk_create_streams_ndjson_results(client):
+    body = "\n".join(json.dumps({"email": f"u{i}@example.com", "password": "p"}) for i in range(20))
+
+    response = client.post(
+        "/api/admin/users/bulk", content=body, headers={"Content-Type": "application/x-ndjson"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    results = lines(response)
+    assert results[-1]["summary"]["created"] == 20
+    assert {r["id"] for r in results[:-1]} == {f"id-u{i}@example.com" for i in range(20)}
+
+
+def test_bulk_create_accepts_csv(client):
+    body = "email,phone,password\na@example.com,,p\n,+21600000000,p\n"
+
+    response = client.post("/api/admin/users/bulk", content=body, headers={"Content-Type": "text/csv"})
+
+    assert response.status_code == 200
+    assert lines(response)[-1]["summary"]["created"] == 2
+
+
+def test_bulk_create_rejects_other_content_types(client):
+    response = client.post("/api/admin/users/bulk", json=[{"email": "a@example.com"}])
+    assert response.status_code == 415
+
+
+def test_bulk_create_rejects_oversized_uploads(client, monkeypatch):
+    monkeypatch.setattr("app.api.admin.BULK_PROVISION_MAX_BYTES", 10)
+
+    response = client.post(
+        "/api/admin/users/bulk", content=b"x" * 11, headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 413
+
+
+def test_bulk_create_requires_an_admin(client, claims):
+    claims["app_metadata"] = {"role": "user"}
+
+    response = client.post("/api/admin/users/bulk", content=b"", headers={"Content-Type": "text/csv"})
+
+    assert response.status_code == 403
+
+
+@pytest.fixture
+def invites(client, monkeypatch):
+    """Stand-ins for the bulk invite service, recording what the route passed."""
+    calls = {}
+
+    async def create_bulk_invite(conn, purpose, ttl_minutes, rate_per_second, source):
+        calls["created"] = (purpose, ttl_minutes, rate_per_second)
+        if purpose not in ("register", "login"):
+            raise ValueError("bad purpose")
+        return 7
+
+    async def run_bulk_invite(pool, job_id, emails, total_rows):
+        calls["emails"] = list(emails)
+        calls["total_rows"] = total_rows
+        return {"id": job_id, "processed": len(calls["emails"])}
+
+    async def bulk_invite_progress(conn, job_id):
+        return {"id": job_id} if job_id == 7 else None
+
+    pool = MagicMock()
+    pool.acquire.return_value.__aenter__ = AsyncMock()
+    pool.acquire.return_value.__aexit__ = AsyncMock(return_value=False)
+    client.app.dependency_overrides[get_db_pool] = lambda: pool
+    monkeypatch.setattr("app.api.admin.create_bulk_invite", create_bulk_invite)
+    monkeypatch.setattr("app.api.admin.run_bulk_invite", run_bulk_invite)
+    monkeypatch.setattr("app.api.admin.bulk_invite_progress", bulk_invite_progress)
+    return calls
+
+
+def test_bulk_invite_reads_a_plain_list(client, invites):
+    response = client.post(
+        "/api/admin/invitations?purpose=login&rate_per_second=50",
+        content="a@example.com\nb@example.com\n",
+        headers={"Content-Type": "text/plain"},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"id": 7, "processed": 2}
+    assert invites["created"][0::2] == ("login", 50)
+    assert invites["emails"] == ["a@example.com", "b@example.com"]
+    assert invites["total_rows"] == 2
+
+
+def test_bulk_invite_resumes_an_existing_job(client, invites):
+    response = client.post(
+        "/api/admin/invitations?job_id=7", content="email\na@example.com\n", headers={"Content-Type": "text/csv"}
+    )
+
+    assert response.json()["id"] == 7
+    assert "created" not in invites
+
+
+def test_bulk_invite_rejects_bad_settings(client, invites):
+    response = client.post(
+        "/api/admin/invitations?purpose=reset", content="a@example.com", headers={"Content-Type": "text/plain"}
+    )
+    assert response.status_code == 400
+
+
+def test_bulk_invite_status(client, invites):
+    assert client.get("/api/admin/invitations/7").json() == {"id": 7}
+    assert client.get("/api/admin/invitations/8").status_code == 404
+
+
+def test_admin_routes_refuse_tokens_signed_with_an_empty_secret(monkeypatch):
+    monkeypatch.setattr(auth_dependency, "SUPABASE_JWT_SECRET", "")
+    forged = jwt.encode({"sub": "x", "role": "service_role", "exp": int(time.time()) + 60}, "", algorithm="HS256")
+    app = FastAPI()
+    app.include_router(admin_router)
+
+    response = TestClient(app).post(
+        "/api/admin/invitations",
+        content="a@example.com",
+        headers={"Content-Type": "text/plain", "Authorization": f"Bearer {forged}"},
+    )
+
+    # no key at all: nothing is verified, and the token is never trusted
+    assert response.status_code == 503
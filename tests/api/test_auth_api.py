@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 from fastapi.testclient import TestClient
 from fastapi import FastAPI
 
@@ -21,7 +21,7 @@ def test_register_api_success(client):
     fake_response = {"id": "user123", "email": "test@example.com"}
 
     # Patch where supabase_service is imported: app.api.auth
-    with patch("app.api.auth.supabase_service.register") as mock_register:
+    with patch("app.api.auth.supabase_service.register", new_callable=AsyncMock) as mock_register:
         mock_register.return_value = fake_response
 
         response = client.get(
@@ -37,12 +37,12 @@ def test_register_api_success(client):
         assert response.json() == fake_response
 
         # FastAPI passed '' instead of None -> match actual call
-        mock_register.assert_called_once_with("test@example.com", "", "Pass123")
+        mock_register.assert_awaited_once_with("test@example.com", "", "Pass123")
 
 
 def test_register_api_failure(client):
     # Here FastAPI re-raises the exception instead of returning 500 in your env
-    with patch("app.api.auth.supabase_service.register") as mock_register:
+    with patch("app.api.auth.supabase_service.register", new_callable=AsyncMock) as mock_register:
         mock_register.side_effect = Exception("Registration failed")
 
         with pytest.raises(Exception) as exc:
@@ -64,7 +64,7 @@ def test_register_api_failure(client):
 def test_login_api_success(client):
     fake_response = {"access_token": "abc123"}
 
-    with patch("app.api.auth.supabase_service.login") as mock_login:
+    with patch("app.api.auth.supabase_service.login", new_callable=AsyncMock) as mock_login:
         mock_login.return_value = fake_response
 
         response = client.get(
@@ -74,11 +74,11 @@ def test_login_api_success(client):
 
         assert response.status_code == 200
         assert response.json() == fake_response
-        mock_login.assert_called_once_with("test@example.com", "Pass123")
+        mock_login.assert_awaited_once_with("test@example.com", "Pass123")
 
 
 def test_login_api_failure(client):
-    with patch("app.api.auth.supabase_service.login") as mock_login:
+    with patch("app.api.auth.supabase_service.login", new_callable=AsyncMock) as mock_login:
         mock_login.side_effect = Exception("Invalid credentials")
 
         with pytest.raises(Exception) as exc:
@@ -96,7 +96,7 @@ def test_login_api_failure(client):
 def test_refresh_api_success(client):
     fake_response = {"access_token": "newtoken"}
 
-    with patch("app.api.auth.supabase_service.refresh") as mock_refresh:
+    with patch("app.api.auth.supabase_service.refresh", new_callable=AsyncMock) as mock_refresh:
         mock_refresh.return_value = fake_response
 
         response = client.get(
@@ -106,11 +106,11 @@ def test_refresh_api_success(client):
 
         assert response.status_code == 200
         assert response.json() == fake_response
-        mock_refresh.assert_called_once_with("oldtoken123")
+        mock_refresh.assert_awaited_once_with("oldtoken123")
 
 
 def test_refresh_api_failure(client):
-    with patch("app.api.auth.supabase_service.refresh") as mock_refresh:
+    with patch("app.api.auth.supabase_service.refresh", new_callable=AsyncMock) as mock_refresh:
         mock_refresh.side_effect = Exception("Refresh failed")
 
         with pytest.raises(Exception) as exc:
@@ -120,3 +120,48 @@ def test_refresh_api_failure(client):
             )
 
         assert "Refresh failed" in str(exc.value)
+
+
+# ------------------------------------------------------------------------------
+# /api/auth/introspect
+# ------------------------------------------------------------------------------
+def test_introspect_returns_result_per_token(client, monkeypatch):
+    from fastapi import HTTPException
+    from app.utils import auth_dependency
+
+    monkeypatch.setattr(auth_dependency, "SUPABASE_JWT_SECRET", "test-secret")
+
+    def fake_verify(token):
+        if token == "good":
+            return {"sub": "user123"}
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    with patch("app.api.auth.verify_token", side_effect=fake_verify) as mock_verify:
+        response = client.post("/api/auth/introspect", json=["good", "bad", "good"])
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {"active": True, "claims": {"sub": "user123"}},
+        {"active": False, "error": "Invalid token"},
+        {"active": True, "claims": {"sub": "user123"}},
+    ]
+    # duplicate tokens within a batch are decoded once
+    assert mock_verify.call_count == 2
+
+
+def test_introspect_rejects_oversized_batch(client):
+    with patch("app.api.auth.INTROSPECT_MAX_TOKENS", 2):
+        response = client.post("/api/auth/introspect", json=["a", "b", "c"])
+
+    assert response.status_code == 400
+
+
+def test_introspect_is_unavailable_without_a_verification_key(client, monkeypatch):
+    from app.utils import auth_dependency, jwks
+
+    monkeypatch.setattr(auth_dependency, "SUPABASE_JWT_SECRET", "")
+    monkeypatch.setattr(jwks, "key_set", None)
+
+    response = client.post("/api/auth/introspect", json=["a"])
+
+    assert response.status_code == 503
@@ -4,34 +4,28 @@ from fastapi.testclient import TestClient
 from fastapi import FastAPI, Depends
 
 from app.api.auth_otp import router as auth_otp_router
-from app.db import get_db_pool
+from app.services.otp_store import get_otp_store
+from app.services.rate_limiter import limit_otp_start
 
 
 # ---------------------------------------------------------------------------
-# Fake DB connection + fake pool
+# Fake OTP store
 # ---------------------------------------------------------------------------
-class FakeDB(MagicMock):
-    """Minimal fake DB connection used by SQL-accessing functions."""
-    async def fetch(self, *args, **kwargs):
-        return []
-    async def execute(self, *args, **kwargs):
-        return None
-
-
-async def fake_get_db():
-    """Overrides get_db dependency in tests."""
-    return FakeDB()
+async def fake_get_otp_store():
+    """Overrides the OTP store dependency in tests."""
+    return MagicMock()
 
 
 # ---------------------------------------------------------------------------
-# Test client fixture with DB dependency override
+# Test client fixture with store dependency override
 # ---------------------------------------------------------------------------
 @pytest.fixture
 def client():
     app = FastAPI()
 
-    # Override DB dependency BEFORE including routers that use it
-    app.dependency_overrides[get_db_pool] = fake_get_db
+    # Override the store dependency BEFORE including routers that use it
+    app.dependency_overrides[get_otp_store] = fake_get_otp_store
+    app.dependency_overrides[limit_otp_start] = lambda: None
 
     # include your router
     app.include_router(auth_otp_router)
@@ -104,6 +98,17 @@ def test_complete_register_otp_invalid(client):
         assert body["detail"] == "Invalid or expired OTP"
 
 
+def test_complete_routes_refuse_malformed_otps(client):
+    with patch("app.api.auth_otp.complete_login_with_email_otp", new_callable=AsyncMock) as mock_complete:
+        for otp in ["1", "12345", "1234567", "12345a"]:
+            response = client.post(
+                "/api/auth/otp/login/complete", params={"email": "test@example.com", "otp": otp, "nonce": "n"}
+            )
+            assert response.status_code == 422
+
+    mock_complete.assert_not_awaited()
+
+
 # ---------------------------------------------------------------------------
 # /api/auth/otp/login/start
 # ---------------------------------------------------------------------------
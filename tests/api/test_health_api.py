@@ -21,3 +21,62 @@ def test_health_endpoint():
     # Expected keys in response
     assert data["ok"] is True
     assert data["service"] == "ai-labs-tn-api"
+
+
+def test_db_stats_endpoint():
+    response = client.get("/api/health/db")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert {"in_use", "idle", "waiters", "shed"} <= set(data["pool"])
+    assert "acquire_wait" in data
+
+
+def test_upstream_stats_endpoint():
+    response = client.get("/api/health/upstream")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert {"concurrency", "retry_budget", "timeouts", "breakers", "refresh"} <= set(data)
+
+
+def test_executor_stats_endpoint():
+    response = client.get("/api/health/executors")
+
+    assert response.status_code == 200
+    assert {"queued", "running", "rejected"} <= set(response.json()["smtp"])
+
+
+def test_auth_stats_endpoint():
+    response = client.get("/api/health/auth")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert {"hits", "misses"} <= set(data["token_cache"])
+    assert "jwks" in data
+
+
+def test_smtp_stats_endpoint():
+    response = client.get("/api/health/smtp")
+
+    assert response.status_code == 200
+    assert {"in_use", "idle", "reconnects", "send_failures"} <= set(response.json())
+
+
+def test_otp_stats_endpoint():
+    response = client.get("/api/health/otp")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert {'rate_limiter', 'store'} <= set(data)
+    assert {"executed", "replayed"} <= set(data["idempotency"])
+
+
+def test_outbox_endpoint_without_a_database(monkeypatch):
+    from app import db
+
+    monkeypatch.setattr(db, "pool", None)
+    response = client.get("/api/health/outbox")
+
+    assert response.status_code == 200
+    assert response.json() == {"backend": "memory"}
@@ -0,0 +1,55 @@
+import asyncio
+import os
+import uuid
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+
+# the OTP hash key is required; tests get a fixed one unless the environment sets it
+os.environ.setdefault("ROOTS_VISION_AI_OTP_HASH_SECRET", "test-otp-hash-secret-of-32-characters")
+
+# Tests marked `needs_db` run against a real Postgres when this points at a
+# scratch database (each test gets its own schema, migrated with yoyo).
+TEST_DB_URL = os.getenv("ROOTS_VISION_AI_TEST_DB_URL")
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[1] / "migrations"
+
+needs_db = pytest.mark.skipif(not TEST_DB_URL, reason="ROOTS_VISION_AI_TEST_DB_URL not set")
+
+
+def apply_migrations(schema: str):
+    from yoyo import get_backend, read_migrations
+
+    separator = "&" if "?" in TEST_DB_URL else "?"
+    backend = get_backend(f"{TEST_DB_URL}{separator}schema={schema}")
+    migrations = read_migrations(str(MIGRATIONS_DIR))
+    with backend.lock():
+        backend.apply_migrations(backend.to_apply(migrations))
+
+
+@pytest_asyncio.fixture
+async def db_pool():
+    """asyncpg pool bound to a throwaway, fully migrated schema."""
+    import asyncpg
+    from app.db import AuthConnection
+
+    schema = f"otp_test_{uuid.uuid4().hex[:8]}"
+    admin = await asyncpg.connect(TEST_DB_URL)
+    await admin.execute(f"create schema {schema}")
+    try:
+        await asyncio.to_thread(apply_migrations, schema)
+        pool = await asyncpg.create_pool(
+            TEST_DB_URL,
+            min_size=1,
+            max_size=20,
+            connection_class=AuthConnection,
+            server_settings={"search_path": schema},
+        )
+        try:
+            yield pool
+        finally:
+            await pool.close()
+    finally:
+        await admin.execute(f"drop schema {schema} cascade")
+        await admin.close()
@@ -0,0 +1,169 @@
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services import bulk_invites
+from app.utils.otp_utils import hash_otp
+from conftest import needs_db
+
+T0 = datetime(2025, 12, 4, 9, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def conn():
+    conn = MagicMock()
+    conn.transaction.return_value.__aenter__ = AsyncMock()
+    conn.transaction.return_value.__aexit__ = AsyncMock(return_value=False)
+    conn.fetchrow = AsyncMock(return_value={
+        "purpose": "register", "ttl_minutes": 60, "rate_per_second": 2.0, "processed": 0, "send_from": T0,
+        "kept_until": T0 + timedelta(days=2),
+    })
+    conn.execute = AsyncMock()
+    copied = {}
+
+    async def copy_records_to_table(table, columns, records):
+        copied[table] = [dict(zip(columns, record)) for record in records]
+
+    conn.copy_records_to_table = copy_records_to_table
+    conn.copied = copied
+    return conn
+
+
+def test_read_invite_emails_keeps_one_entry_per_row():
+    text = io.BytesIO(b"a@example.com\n\n b@example.com \n")
+    csv = io.BytesIO(b"email,name\na@example.com,A\n,B\n")
+    ndjson = io.BytesIO(b'{"email": "a@example.com"}\nnot json\n')
+
+    assert list(bulk_invites.read_invite_emails(text, "text")) == ["a@example.com", None, "b@example.com"]
+    assert list(bulk_invites.read_invite_emails(csv, "csv")) == ["a@example.com", None]
+    assert list(bulk_invites.read_invite_emails(ndjson, "ndjson")) == ["a@example.com", None]
+
+
+@pytest.mark.asyncio
+async def test_create_bulk_invite_validates_settings(conn):
+    for kwargs in ({"purpose": "reset"}, {"ttl_minutes": 0}, {"ttl_minutes": bulk_invites.MAX_TTL_MINUTES + 1},
+                   {"rate_per_second": 0}):
+        with pytest.raises(ValueError):
+            await bulk_invites.create_bulk_invite(conn, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_chunk_copies_codes_and_schedules_emails_at_the_job_rate(conn):
+    emails = ["a@example.com", None, "not-an-email", "b@example.com", "a@example.com"]
+
+    assert await bulk_invites.enqueue_invite_chunk(conn, 7, 0, emails)
+
+    otps, outbox = conn.copied["email_otp"], conn.copied["email_outbox"]
+    assert [row["to_email"] for row in outbox] == ["a@example.com", "b@example.com"]
+    assert [row["next_attempt_at"] for row in outbox] == [T0, T0 + timedelta(seconds=0.5)]
+    assert {row["bulk_invite_id"] for row in outbox} == {7}
+    assert {row["valid_minutes"] for row in outbox} == {60}
+    # each code is stored hashed and expires an hour after its own send
+    assert [row["otp_hash"] for row in otps] == [hash_otp(row["otp"]) for row in outbox]
+    assert [row["expires_at"] for row in otps] == [T0 + timedelta(hours=1), T0 + timedelta(hours=1, seconds=0.5)]
+
+    retire, advance = (call.args for call in conn.execute.await_args_list)
+    assert retire[1:] == ("register", ["a@example.com", "b@example.com"])
+    assert advance[1:] == (7, 5, 2, 3, T0 + timedelta(seconds=1))
+
+
+@pytest.mark.asyncio
+async def test_chunk_is_skipped_when_the_job_has_moved_on(conn):
+    conn.fetchrow.return_value = {**conn.fetchrow.return_value, "processed": 5000}
+
+    assert not await bulk_invites.enqueue_invite_chunk(conn, 7, 0, ["a@example.com"])
+
+    assert conn.copied == {}
+    conn.execute.assert_not_awaited()
+
+
+def test_count_invite_rows_rewinds_the_file():
+    csv = io.BytesIO(b"email\na@example.com\n\nb@example.com\n")
+
+    assert bulk_invites.count_invite_rows(csv, "csv") == 2
+    assert list(bulk_invites.read_invite_emails(csv, "csv")) == ["a@example.com", "b@example.com"]
+
+
+@pytest.mark.asyncio
+async def test_chunk_that_would_outlive_its_partition_writes_nothing(conn):
+    # the second address is sent 0.5s after the first and expires just past kept_until
+    conn.fetchrow.return_value = {
+        **conn.fetchrow.return_value, "kept_until": T0 + timedelta(hours=1, seconds=0.25),
+    }
+
+    with pytest.raises(bulk_invites.ScheduleTooLong):
+        await bulk_invites.enqueue_invite_chunk(conn, 7, 0, ["a@example.com", "b@example.com"])
+
+    assert conn.copied == {}
+    conn.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_run_refuses_a_list_too_long_for_its_rate_up_front():
+    conn = MagicMock()
+    conn.fetchrow = AsyncMock(return_value={
+        "processed": 0, "expires_at": T0 + timedelta(days=3), "kept_until": T0 + timedelta(days=2),
+    })
+    pool = MagicMock()
+    pool.acquire.return_value.__aenter__ = AsyncMock(return_value=conn)
+    pool.acquire.return_value.__aexit__ = AsyncMock(return_value=False)
+    rows = iter(["a@example.com"])
+
+    with pytest.raises(bulk_invites.ScheduleTooLong):
+        await bulk_invites.run_bulk_invite(pool, 7, rows, 1_000_000)
+
+    assert conn.fetchrow.await_args.args[1:] == (7, 1_000_000)
+    assert next(rows) == "a@example.com"
+
+
+@needs_db
+@pytest.mark.asyncio
+async def test_bulk_invite_resumes_where_it_stopped(db_pool):
+    emails = [f"u{i}@example.com" for i in range(25)] + [None]
+    async with db_pool.acquire() as conn:
+        job_id = await bulk_invites.create_bulk_invite(conn, rate_per_second=1)
+        # a first run that committed one chunk before dying
+        assert await bulk_invites.enqueue_invite_chunk(conn, job_id, 0, emails[:10])
+
+    progress = await bulk_invites.run_bulk_invite(db_pool, job_id, emails, len(emails), chunk_size=10)
+
+    assert (progress["processed"], progress["queued"], progress["skipped"]) == (26, 25, 1)
+    assert progress["pending"] == 25 and progress["finished_at"] is not None
+    async with db_pool.acquire() as conn:
+        assert await conn.fetchval("select count(distinct email) from email_otp where consumed_at is null") == 25
+        spread = await conn.fetchval("select max(next_attempt_at) - min(next_attempt_at) from email_outbox")
+    assert spread == timedelta(seconds=24)
+
+
+@needs_db
+@pytest.mark.asyncio
+async def test_bulk_invite_retires_earlier_codes(db_pool):
+    async with db_pool.acquire() as conn:
+        for _ in range(2):
+            job_id = await bulk_invites.create_bulk_invite(conn)
+            await bulk_invites.enqueue_invite_chunk(conn, job_id, 0, ["a@example.com"])
+
+        active = await conn.fetchval("select count(*) from email_otp where email = 'a@example.com' and consumed_at is null")
+    assert active == 1
+
+
+@needs_db
+@pytest.mark.asyncio
+async def test_outbox_claims_interactive_codes_before_a_bulk_backlog(db_pool):
+    from app.services.email_outbox import claim_batch
+
+    async with db_pool.acquire() as conn:
+        job_id = await bulk_invites.create_bulk_invite(conn, rate_per_second=1000)
+        await bulk_invites.enqueue_invite_chunk(conn, job_id, 0, [f"u{i}@example.com" for i in range(5)])
+        await conn.execute(
+            "update email_outbox set next_attempt_at = now() - interval '1 minute' where bulk_invite_id = $1;", job_id
+        )
+        await conn.execute("insert into email_outbox (to_email, otp) values ('login@example.com', '123456');")
+
+    claimed = await claim_batch(db_pool, 3, 60)
+
+    # older bulk rows are due, but the login code still makes the batch
+    assert len(claimed) == 3
+    assert "login@example.com" in {row["to_email"] for row in claimed}
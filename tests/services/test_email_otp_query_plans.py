@@ -0,0 +1,81 @@
+"""
+EXPLAIN checks for the hot OTP queries: fail if create or verify stop
+being served by the partial idx_email_otp_active index (or, on the
+partitioned table, its per-partition children).
+"""
+import json
+import re
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+
+from app.services.email_otp_repo import CREATE_EMAIL_OTP_SQL, VERIFY_EMAIL_OTP_SQL
+from conftest import needs_db
+
+INDEX = "idx_email_otp_active"
+# the parent table or one of its daily partitions (not email_outbox)
+OTP_RELATION = re.compile(r"^email_otp(_p\d{8})?$")
+
+
+async def explain(conn, sql: str, *args) -> dict:
+    rows = await conn.fetchval(f"explain (format json) {sql}", *args)
+    return json.loads(rows)[0]["Plan"]
+
+
+def otp_scans(plan: dict) -> list[dict]:
+    found = []
+    if OTP_RELATION.match(plan.get("Relation Name", "")) and "Scan" in plan["Node Type"]:
+        found.append(plan)
+    for child in plan.get("Plans", []):
+        found.extend(otp_scans(child))
+    return found
+
+
+def uses_active_index(scan: dict) -> bool:
+    # partition indexes are named after the partition and its columns
+    name = scan.get("Index Name", "")
+    return name == INDEX or name.endswith("_email_purpose_created_at_idx")
+
+
+@pytest_asyncio.fixture
+async def seeded_conn(db_pool):
+    async with db_pool.acquire() as conn:
+        await conn.execute(
+            """
+            insert into email_otp (email, otp_hash, purpose, created_at, expires_at, consumed_at)
+            select 'user' || (i % 2000) || '@example.com', md5(i::text), 'login',
+                   now() - i * interval '1 second', now() + interval '10 minutes',
+                   case when i % 5 = 0 then null else now() end
+              from generate_series(1, 20000) as i;
+            analyze email_otp;
+            """
+        )
+        # the tables are small: make a sequential scan the planner's last resort,
+        # so a seq scan in the plan means the index cannot serve the query
+        await conn.execute("set enable_seqscan = off;")
+        yield conn
+
+
+@needs_db
+@pytest.mark.asyncio
+async def test_verify_query_uses_partial_index(seeded_conn):
+    plan = await explain(seeded_conn, VERIFY_EMAIL_OTP_SQL, "user7@example.com", "login", "x", 5)
+
+    scans = otp_scans(plan)
+    assert scans, plan
+    assert any(uses_active_index(s) for s in scans), plan
+    assert not any(s["Node Type"] == "Seq Scan" for s in scans), plan
+
+
+@needs_db
+@pytest.mark.asyncio
+async def test_create_query_uses_partial_index(seeded_conn):
+    expires_at = datetime.utcnow() + timedelta(minutes=10)
+    plan = await explain(
+        seeded_conn, CREATE_EMAIL_OTP_SQL, "user7@example.com", "login", "123456", expires_at, "hash", 60, 5
+    )
+
+    scans = otp_scans(plan)
+    assert any(uses_active_index(s) for s in scans), plan
+    assert not any(s["Node Type"] == "Seq Scan" for s in scans), plan
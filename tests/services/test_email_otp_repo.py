@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services import email_otp_repo
+from app.utils.otp_utils import OTP_OK, OTP_MISSING, OTP_EXPIRED, OTP_MISMATCH, OTP_LOCKED
+from conftest import needs_db
+
+
+@pytest.fixture
+def conn():
+    conn = MagicMock()
+    conn.statement = MagicMock()
+    conn.statement.fetch = AsyncMock(return_value=[{"id": 1}])
+    conn.prepared = AsyncMock(return_value=conn.statement)
+    return conn
+
+
+@pytest.mark.asyncio
+async def test_create_email_otp_runs_one_named_statement(conn):
+    otp = await email_otp_repo.create_email_otp(conn, email="test@example.com", purpose="login")
+
+    assert len(otp) == 6 and otp.isdigit()
+    conn.prepared.assert_awaited_once_with("create_email_otp", email_otp_repo.CREATE_EMAIL_OTP_SQL)
+    args = conn.statement.fetch.await_args.args
+    assert args[:3] == ("test@example.com", "login", otp)
+    # no explicit transaction: the CTE is a single implicit one
+    conn.transaction.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_create_email_otp_returns_none_when_cooldown_reuses_code(conn):
+    conn.statement.fetch.return_value = []
+
+    otp = await email_otp_repo.create_email_otp(
+        conn, email="test@example.com", purpose="login", cooldown_seconds=60
+    )
+
+    assert otp is None
+    assert conn.statement.fetch.await_args.args[5:] == (60, email_otp_repo.OTP_MAX_ATTEMPTS)
+
+
+@pytest.mark.asyncio
+async def test_verify_email_otp_compares_hashes_in_one_statement(conn):
+    conn.statement.fetchval = AsyncMock(return_value=OTP_OK)
+
+    result = await email_otp_repo.verify_email_otp(
+        conn, email="test@example.com", otp="123456", purpose="login"
+    )
+
+    assert result == OTP_OK
+    conn.prepared.assert_awaited_once_with("verify_email_otp", email_otp_repo.VERIFY_EMAIL_OTP_SQL)
+    assert conn.statement.fetchval.await_args.args == (
+        "test@example.com", "login", email_otp_repo.hash_otp("123456"), email_otp_repo.OTP_MAX_ATTEMPTS,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Against a real Postgres (see tests/conftest.py)
+# ---------------------------------------------------------------------------
+async def with_conn(pool, fn, **kwargs):
+    """Run a repo function on a connection of its own, as a request would."""
+    async with pool.acquire() as conn:
+        return await fn(conn, **kwargs)
+
+
+@needs_db
+@pytest.mark.asyncio
+async def test_parallel_completes_have_exactly_one_winner(db_pool):
+    otp = await with_conn(db_pool, email_otp_repo.create_email_otp, email="race@example.com", purpose="login")
+
+    results = await asyncio.gather(*(
+        with_conn(db_pool, email_otp_repo.verify_email_otp, email="race@example.com", otp=otp, purpose="login")
+        for _ in range(50)
+    ))
+
+    assert results.count(OTP_OK) == 1
+    assert set(results) == {OTP_OK, OTP_MISSING}
+
+
+@needs_db
+@pytest.mark.asyncio
+async def test_verify_reports_failure_reasons(db_pool):
+    assert await with_conn(
+        db_pool, email_otp_repo.verify_email_otp, email="none@example.com", otp="000000", purpose="login"
+    ) == OTP_MISSING
+
+    otp = await with_conn(db_pool, email_otp_repo.create_email_otp, email="r@example.com", purpose="login")
+    wrong = "000000" if otp != "000000" else "111111"
+    assert await with_conn(
+        db_pool, email_otp_repo.verify_email_otp, email="r@example.com", otp=wrong, purpose="login"
+    ) == OTP_MISMATCH
+
+    await db_pool.execute("update email_otp set expires_at = now() - interval '1 minute'")
+    assert await with_conn(
+        db_pool, email_otp_repo.verify_email_otp, email="r@example.com", otp=otp, purpose="login"
+    ) == OTP_EXPIRED
+
+
+@needs_db
+@pytest.mark.asyncio
+async def test_parallel_wrong_guesses_stop_at_the_limit(db_pool):
+    otp = await with_conn(db_pool, email_otp_repo.create_email_otp, email="brute@example.com", purpose="login")
+    wrong = "000000" if otp != "000000" else "111111"
+
+    results = await asyncio.gather(*(
+        with_conn(
+            db_pool, email_otp_repo.verify_email_otp,
+            email="brute@example.com", otp=wrong, purpose="login", max_attempts=3,
+        )
+        for _ in range(20)
+    ))
+
+    assert results.count(OTP_MISMATCH) == 2
+    assert results.count(OTP_LOCKED) == 18
+    assert await db_pool.fetchval(
+        "select retry_count from email_otp where email = 'brute@example.com'"
+    ) == 3
+    # the right code no longer works either
+    assert await with_conn(
+        db_pool, email_otp_repo.verify_email_otp,
+        email="brute@example.com", otp=otp, purpose="login", max_attempts=3,
+    ) == OTP_LOCKED
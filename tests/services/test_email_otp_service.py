@@ -1,196 +1,259 @@
 import pytest
-from unittest.mock import AsyncMock, patch
-
-import asyncpg
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from app.services import email_otp_service
+from app.utils.otp_utils import OTP_OK, OTP_MISMATCH, OTP_LOCKED
 
 
 @pytest.fixture
-def mock_pool():
-    """
-    Create a fake asyncpg pool with a fake connection.
-    We only care that .acquire() returns an object with
-    .execute() and .fetchrow().
-    """
-    class FakeConn:
-        def __init__(self):
-            self.executed = []
-            self.rows = None
-
-        async def execute(self, *args, **kwargs):
-            self.executed.append((args, kwargs))
-
-        async def fetchrow(self, *args, **kwargs):
-            # just return last set row
-            return self.rows
-
-        async def transaction(self):
-            class DummyTx:
-                async def __aenter__(self_inner):
-                    return None
-
-                async def __aexit__(self_inner, exc_type, exc_val, exc_tb):
-                    return False
-
-            return DummyTx()
-
-    class FakePool:
-        def __init__(self):
-            self.conn = FakeConn()
-
-        async def acquire(self):
-            class DummyAcquire:
-                async def __aenter__(self_inner):
-                    return pool.conn
-
-                async def __aexit__(self_inner, exc_type, exc_val, exc_tb):
-                    return False
-
-            pool = self
-            return DummyAcquire()
-
-    return FakePool()
+def store():
+    """Stand-in OTP store; the backends have their own tests."""
+    store = MagicMock()
+    store.create = AsyncMock(return_value="123456")
+    store.verify = AsyncMock(return_value=OTP_OK)
+    store.release = AsyncMock()
+    return store
 
 
 @pytest.mark.asyncio
-async def test_start_register_with_email_otp_success(mock_pool):
-    # Patch create_email_otp and send_otp_email
-    with patch(
-        "app.services.email_otp_service.create_email_otp",
-        new_callable=AsyncMock,
-    ) as mock_create_otp, patch(
-        "app.services.email_otp_service.send_otp_email"
-    ) as mock_send_email:
-        mock_create_otp.return_value = "123456"
+async def test_start_register_with_email_otp_success(store):
+    result = await email_otp_service.start_register_with_email_otp(
+        store=store,
+        email="test@example.com",
+        password="Pass123",
+    )
 
-        result = await email_otp_service.start_register_with_email_otp(
-            pool=mock_pool,
-            email="test@example.com",
-            password="Pass123",
-        )
-
-        assert result["success"] is True
-        mock_create_otp.assert_awaited_once_with(
-            mock_pool, email="test@example.com", purpose="register", ttl_minutes=10
-        )
-        mock_send_email.assert_called_once_with("test@example.com", "123456")
+    assert result["success"] is True
+    # the store arranges the email; the code never reaches the response
+    assert "123456" not in str(result)
+    store.create.assert_awaited_once_with("test@example.com", "register", ttl_minutes=10)
 
 
 @pytest.mark.asyncio
-async def test_complete_register_with_email_otp_success(mock_pool):
+async def test_complete_register_with_email_otp_success(store):
     with patch(
-        "app.services.email_otp_service.verify_email_otp",
+        "app.services.email_otp_service.supabase_service.register",
         new_callable=AsyncMock,
-    ) as mock_verify, patch(
-        "app.services.email_otp_service.supabase_service.register"
     ) as mock_supabase_register:
-        mock_verify.return_value = True
-        mock_supabase_register.return_value = {"id": "user123"}
+        mock_supabase_register.side_effect = lambda *args: store.release.assert_awaited_once() or {"id": "user123"}
 
         result = await email_otp_service.complete_register_with_email_otp(
-            pool=mock_pool,
+            store=store,
             email="test@example.com",
             password="Pass123",
             otp="123456",
             phone=None,
         )
 
+        # the store's connection was given back before the Supabase call
         assert result == {"id": "user123"}
-        mock_verify.assert_awaited_once_with(
-            mock_pool, email="test@example.com", otp="123456", purpose="register"
-        )
-        mock_supabase_register.assert_called_once_with(
+        store.verify.assert_awaited_once_with("test@example.com", "123456", "register")
+        mock_supabase_register.assert_awaited_once_with(
             "test@example.com", None, "Pass123"
         )
 
 
 @pytest.mark.asyncio
-async def test_complete_register_with_email_otp_invalid_otp(mock_pool):
-    with patch(
-        "app.services.email_otp_service.verify_email_otp",
-        new_callable=AsyncMock,
-    ) as mock_verify:
-        mock_verify.return_value = False
+async def test_complete_register_with_email_otp_invalid_otp(store):
+    store.verify.return_value = OTP_MISMATCH
 
-        with pytest.raises(ValueError) as exc:
-            await email_otp_service.complete_register_with_email_otp(
-                pool=mock_pool,
-                email="test@example.com",
-                password="Pass123",
-                otp="000000",
-                phone=None,
-            )
+    with pytest.raises(ValueError) as exc:
+        await email_otp_service.complete_register_with_email_otp(
+            store=store,
+            email="test@example.com",
+            password="Pass123",
+            otp="000000",
+            phone=None,
+        )
 
-        assert "Invalid or expired OTP" in str(exc.value)
+    assert "Invalid OTP" in str(exc.value)
 
 
 @pytest.mark.asyncio
-async def test_start_login_with_email_otp_success(mock_pool):
-    with patch(
-        "app.services.email_otp_service.create_email_otp",
-        new_callable=AsyncMock,
-    ) as mock_create_otp, patch(
-        "app.services.email_otp_service.send_otp_email"
-    ) as mock_send_email:
-        mock_create_otp.return_value = "123456"
-
-        result = await email_otp_service.start_login_with_email_otp(
-            pool=mock_pool,
-            email="test@example.com",
-        )
+async def test_start_login_with_email_otp_success(store):
+    result = await email_otp_service.start_login_with_email_otp(
+        store=store,
+        email="test@example.com",
+    )
 
-        assert result["success"] is True
-        mock_create_otp.assert_awaited_once_with(
-            mock_pool, email="test@example.com", purpose="login", ttl_minutes=10
-        )
-        mock_send_email.assert_called_once_with("test@example.com", "123456")
+    assert result["success"] is True
+    store.create.assert_awaited_once_with("test@example.com", "login", ttl_minutes=10)
 
 
 @pytest.mark.asyncio
-async def test_complete_login_with_email_otp_without_new_password(mock_pool):
-    with patch(
-        "app.services.email_otp_service.verify_email_otp",
-        new_callable=AsyncMock,
-    ) as mock_verify:
-        mock_verify.return_value = True
+async def test_complete_login_with_email_otp_without_new_password(store):
+    result = await email_otp_service.complete_login_with_email_otp(
+        store=store,
+        email="test@example.com",
+        otp="123456",
+        new_password=None,
+    )
 
-        result = await email_otp_service.complete_login_with_email_otp(
-            pool=mock_pool,
-            email="test@example.com",
-            otp="123456",
-            new_password=None,
-        )
-
-        assert result == {
-            "success": True,
-            "message": "OTP verified; please set new password",
-        }
+    assert result == {
+        "success": True,
+        "message": "OTP verified; please set new password",
+    }
 
 
 @pytest.mark.asyncio
-async def test_complete_login_with_email_otp_with_new_password(mock_pool):
+async def test_complete_login_with_email_otp_with_new_password(store):
     with patch(
-        "app.services.email_otp_service.verify_email_otp",
+        "app.services.email_otp_service.supabase_service.login",
         new_callable=AsyncMock,
-    ) as mock_verify, patch(
-        "app.services.email_otp_service.supabase_service.login"
     ) as mock_login:
-        mock_verify.return_value = True
         mock_login.return_value = {
             "access_token": "token123",
             "refresh_token": "ref456",
         }
 
         result = await email_otp_service.complete_login_with_email_otp(
-            pool=mock_pool,
+            store=store,
             email="test@example.com",
             otp="123456",
             new_password="NewPass123",
         )
 
         assert result["access_token"] == "token123"
-        mock_verify.assert_awaited_once_with(
-            mock_pool, email="test@example.com", otp="123456", purpose="login"
+        store.verify.assert_awaited_once_with("test@example.com", "123456", "login")
+        mock_login.assert_awaited_once_with("test@example.com", "NewPass123")
+
+
+@pytest.fixture
+def stateless_login(monkeypatch):
+    from app.utils import otp_utils
+
+    monkeypatch.setattr(otp_utils, "OTP_STATELESS_SECRET", "test-secret")
+    monkeypatch.setattr(email_otp_service, "is_stateless", lambda purpose: purpose == "login")
+    email_otp_service.consumed_stateless_otps.clear()
+    email_otp_service.stateless_failures.clear()
+
+
+@pytest.mark.asyncio
+async def test_stateless_login_round_trip_without_db(stateless_login, store):
+    with patch("app.services.email_otp_service.send_otp_email_in_background") as mock_send:
+        started = await email_otp_service.start_login_with_email_otp(store=store, email="test@example.com")
+
+        assert started["success"] is True
+        email, otp = mock_send.call_args.args
+        assert email == "test@example.com"
+
+        result = await email_otp_service.complete_login_with_email_otp(
+            store=store, email="test@example.com", otp=otp, nonce=started["nonce"]
         )
-        mock_login.assert_called_once_with("test@example.com", "NewPass123")
+        assert result["success"] is True
+
+        # the same code cannot be used twice
+        with pytest.raises(ValueError):
+            await email_otp_service.complete_login_with_email_otp(
+                store=store, email="test@example.com", otp=otp, nonce=started["nonce"]
+            )
+
+        store.create.assert_not_awaited()
+        store.verify.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_stateless_login_requires_nonce(stateless_login, store):
+    with pytest.raises(ValueError) as exc:
+        await email_otp_service.complete_login_with_email_otp(
+            store=store, email="test@example.com", otp="123456"
+        )
+
+    assert "nonce" in str(exc.value)
+
+
+@pytest.fixture
+def no_lockouts():
+    email_otp_service.locked_otps.clear()
+    yield
+    email_otp_service.locked_otps.clear()
+
+
+@pytest.mark.asyncio
+async def test_locked_code_is_refused_without_asking_the_store(store, no_lockouts):
+    store.verify.return_value = OTP_LOCKED
+
+    for _ in range(3):
+        with pytest.raises(ValueError) as exc:
+            await email_otp_service.complete_login_with_email_otp(
+                store=store, email="test@example.com", otp="000000"
+            )
+        assert "Too many attempts" in str(exc.value)
+
+    store.verify.assert_awaited_once()
+
+    # requesting a new code lifts the local lock
+    await email_otp_service.start_login_with_email_otp(store=store, email="test@example.com")
+    store.verify.return_value = OTP_OK
+    result = await email_otp_service.complete_login_with_email_otp(
+        store=store, email="test@example.com", otp="123456"
+    )
+    assert result["success"] is True
+
+
+@pytest.mark.asyncio
+async def test_stateless_code_locks_after_max_attempts(stateless_login, store, no_lockouts):
+    with patch("app.services.email_otp_service.send_otp_email_in_background") as mock_send:
+        started = await email_otp_service.start_login_with_email_otp(store=store, email="test@example.com")
+    otp = mock_send.call_args.args[1]
+    wrong = str((int(otp) + 1) % 1_000_000).zfill(6)
+
+    errors = []
+    for _ in range(email_otp_service.OTP_MAX_ATTEMPTS):
+        with pytest.raises(ValueError) as exc:
+            await email_otp_service.complete_login_with_email_otp(
+                store=store, email="test@example.com", otp=wrong, nonce=started["nonce"]
+            )
+        errors.append(str(exc.value))
+
+    assert errors[-1].startswith("Too many attempts")
+    with pytest.raises(ValueError):
+        await email_otp_service.complete_login_with_email_otp(
+            store=store, email="test@example.com", otp=otp, nonce=started["nonce"]
+        )
+
+
+@pytest.mark.asyncio
+async def test_stateless_failures_add_up_across_nonces(stateless_login, store, no_lockouts):
+    from app.utils.otp_utils import new_nonce
+
+    # genuine nonces from several starts (start would reset the count, so mint them directly)
+    for _ in range(email_otp_service.OTP_MAX_ATTEMPTS):
+        with pytest.raises(ValueError) as exc:
+            await email_otp_service.complete_login_with_email_otp(
+                store=store, email="Test@example.com", otp="000000", nonce=new_nonce()
+            )
+    assert str(exc.value).startswith("Too many attempts")
+
+
+@pytest.mark.asyncio
+async def test_stateless_forged_nonce_is_refused(stateless_login, store, no_lockouts):
+    import time
+    from app.utils.otp_utils import derive_otp
+
+    forged = f"{int(time.time())}.anything.mac"
+    with pytest.raises(ValueError) as exc:
+        await email_otp_service.complete_login_with_email_otp(
+            store=store, email="test@example.com", otp=derive_otp("test@example.com", "login", forged), nonce=forged
+        )
+    assert "No active OTP" in str(exc.value)
+
+
+@pytest.mark.asyncio
+async def test_malformed_otp_never_reaches_the_store(store):
+    with pytest.raises(ValueError):
+        await email_otp_service.complete_login_with_email_otp(store=store, email="test@example.com", otp="1")
+    store.verify.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_changing_the_email_case_does_not_lift_a_lock(store, no_lockouts):
+    store.verify.return_value = OTP_LOCKED
+    with pytest.raises(ValueError):
+        await email_otp_service.complete_login_with_email_otp(store=store, email="user@example.com", otp="000000")
+
+    with pytest.raises(ValueError) as exc:
+        await email_otp_service.complete_login_with_email_otp(store=store, email="User@Example.com", otp="000000")
+
+    assert "Too many attempts" in str(exc.value)
+    store.verify.assert_awaited_once()
@@ -0,0 +1,111 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.services import email_outbox
+from app.services.email_outbox import OutboxWorker
+from conftest import needs_db
+
+
+def message(id: int, attempts: int = 1) -> dict:
+    return {
+        "id": id, "to_email": f"user{id}@example.com", "otp": "123456", "attempts": attempts, "valid_minutes": 10,
+    }
+
+
+@pytest.fixture
+def outbox_db():
+    """Patch the outbox SQL helpers so the worker logic runs without Postgres."""
+    with patch(
+        "app.services.email_outbox.claim_batch", new_callable=AsyncMock
+    ) as claim, patch(
+        "app.services.email_outbox.mark_sent", new_callable=AsyncMock
+    ) as sent, patch(
+        "app.services.email_outbox.mark_failed", new_callable=AsyncMock
+    ) as failed:
+        yield claim, sent, failed
+
+
+@pytest.mark.asyncio
+async def test_worker_sends_claimed_batch_and_deletes_it(outbox_db):
+    claim, mark_sent, mark_failed = outbox_db
+    claim.return_value = [message(1), message(2)]
+
+    with patch("app.services.email_outbox.send_otp_email") as mock_send:
+        worker = OutboxWorker(pool="pool")
+        assert await worker.run_once() == 2
+
+    assert mock_send.call_count == 2
+    assert [call.args[1] for call in mark_sent.await_args_list] == [[1], [2]]
+    mark_failed.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_worker_acknowledges_each_message_as_it_is_sent(outbox_db):
+    claim, mark_sent, _ = outbox_db
+    claim.return_value = [message(1), message(2)]
+    mark_sent.side_effect = [None, ConnectionError("db gone")]
+
+    with patch("app.services.email_outbox.send_otp_email"):
+        with pytest.raises(ConnectionError):
+            await OutboxWorker(pool="pool").run_once()
+
+    # message 1 was deleted before message 2's acknowledgement failed
+    assert mark_sent.await_args_list[0].args[1] == [1]
+
+
+def test_lease_must_outlast_a_batch_of_sends():
+    email_outbox.check_lease(lease_seconds=201, batch_size=10, smtp_timeout=10)
+    with pytest.raises(RuntimeError):
+        email_outbox.check_lease(lease_seconds=60, batch_size=10, smtp_timeout=10)
+
+
+@pytest.mark.asyncio
+async def test_worker_reschedules_failed_send_with_backoff(outbox_db):
+    claim, mark_sent, mark_failed = outbox_db
+    claim.return_value = [message(1, attempts=3)]
+
+    with patch("app.services.email_outbox.send_otp_email", side_effect=OSError("relay down")):
+        await OutboxWorker(pool="pool").run_once()
+
+    mark_sent.assert_not_awaited()
+    _, message_id, error, retry_in = mark_failed.await_args.args
+    assert message_id == 1
+    assert "relay down" in error
+    # attempt 3 -> between 1/2 and 1x of base * 2**2
+    base = email_outbox.EMAIL_OUTBOX_BACKOFF_BASE_SECONDS
+    assert base * 2 <= retry_in <= base * 4
+
+
+@pytest.mark.asyncio
+async def test_worker_parks_message_after_max_attempts(outbox_db):
+    claim, _, mark_failed = outbox_db
+    claim.return_value = [message(1, attempts=email_outbox.EMAIL_OUTBOX_MAX_ATTEMPTS)]
+
+    with patch("app.services.email_outbox.send_otp_email", side_effect=OSError("relay down")):
+        await OutboxWorker(pool="pool").run_once()
+
+    assert mark_failed.await_args.args[3] is None
+
+
+def test_backoff_is_capped():
+    assert email_outbox.backoff_seconds(50) <= email_outbox.EMAIL_OUTBOX_BACKOFF_MAX_SECONDS
+
+
+@needs_db
+@pytest.mark.asyncio
+async def test_parked_message_keeps_its_error_but_not_its_code(db_pool):
+    async with db_pool.acquire() as conn:
+        retried, parked = await conn.fetchval(
+            "with ids as (insert into email_outbox (to_email, otp) "
+            "values ('a@example.com', '123456'), ('b@example.com', '654321') returning id) "
+            "select array_agg(id order by id) from ids;"
+        )
+
+    await email_outbox.mark_failed(db_pool, retried, "relay down", 30)
+    await email_outbox.mark_failed(db_pool, parked, "relay down", None)
+
+    async with db_pool.acquire() as conn:
+        rows = {r["id"]: r for r in await conn.fetch("select id, otp, last_error, failed_at from email_outbox;")}
+    assert rows[retried]["otp"] == "123456" and rows[retried]["failed_at"] is None
+    assert rows[parked]["otp"] is None and rows[parked]["last_error"] == "relay down"
+    assert (await email_outbox.queue_stats(db_pool))["failed"] == 1
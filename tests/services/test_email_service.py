@@ -0,0 +1,155 @@
+import asyncio
+import smtplib
+import threading
+import time
+from email.mime.text import MIMEText
+
+import pytest
+
+from app.services import email_service
+from app.services.email_service import SMTPConnectionPool
+from app.utils.executors import BoundedExecutor, ExecutorRejected
+from benchmarks.fakes import FakeSMTP
+
+
+def make_message(i: int) -> MIMEText:
+    msg = MIMEText(f"code {i}")
+    msg["Subject"] = "Your Verification Code"
+    msg["From"] = "noreply@example.com"
+    msg["To"] = f"user{i}@example.com"
+    return msg
+
+
+def make_pool(relay: FakeSMTP, **kwargs) -> SMTPConnectionPool:
+    return SMTPConnectionPool(
+        host=relay.host, port=relay.port, user=None, password=None, starttls=False, **kwargs
+    )
+
+
+@pytest.fixture
+def relay():
+    with FakeSMTP() as relay:
+        yield relay
+
+
+def test_pool_reuses_one_connection_for_many_messages(relay):
+    pool = make_pool(relay)
+    for i in range(20):
+        pool.send(make_message(i))
+    pool.close()
+
+    assert len(relay.messages) == 20
+    # one connection instead of connect + EHLO (+ STARTTLS + AUTH) per message
+    assert relay.connections == 1
+    assert pool.stats()["messages_sent"] == 20
+
+
+def test_pool_beats_connection_per_message():
+    # each relay reply costs 5ms, like a nearby real relay
+    with FakeSMTP(latency=0.005) as relay:
+        pool = make_pool(relay)
+
+        start = time.perf_counter()
+        for i in range(10):
+            with smtplib.SMTP(relay.host, relay.port) as server:
+                server.send_message(make_message(i))
+        unpooled = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(10):
+            pool.send(make_message(i))
+        pooled = time.perf_counter() - start
+        pool.close()
+
+    # greeting + EHLO + QUIT per message are gone (STARTTLS + AUTH would be too)
+    assert pooled < unpooled * 0.75
+
+
+def test_pool_recycles_connection_after_max_messages(relay):
+    pool = make_pool(relay, max_messages=3)
+    for i in range(7):
+        pool.send(make_message(i))
+    pool.close()
+
+    assert relay.connections == 3
+    assert pool.stats()["connections_closed"] == 3
+
+
+def test_pool_reconnects_when_relay_drops_connection():
+    with FakeSMTP(drop_after=2) as relay:
+        pool = make_pool(relay, idle_check=0)
+        for i in range(5):
+            pool.send(make_message(i))
+        pool.close()
+
+    assert len(relay.messages) == 5
+    assert relay.connections >= 3
+
+
+def test_pool_does_not_resend_a_message_the_relay_refused():
+    with FakeSMTP(reject=("user1@example.com",)) as relay:
+        pool = make_pool(relay)
+        with pytest.raises(smtplib.SMTPRecipientsRefused):
+            pool.send(make_message(1))
+        pool.close()
+
+    # one attempt on one connection, no reconnect
+    assert relay.connections == 1
+    assert pool.stats()["reconnects"] == 0
+    assert pool.stats()["send_failures"] == 1
+
+
+def test_pool_does_not_resend_once_the_message_was_handed_off():
+    with FakeSMTP(hang_up_in_data=True) as relay:
+        pool = make_pool(relay)
+        with pytest.raises(smtplib.SMTPServerDisconnected):
+            pool.send(make_message(1))
+        pool.close()
+
+    # the relay took the message; a retry would have delivered it twice
+    assert len(relay.messages) == 1
+    assert pool.stats()["reconnects"] == 0
+
+
+def test_send_otp_email_uses_shared_pool(monkeypatch):
+    sent = []
+    monkeypatch.setattr(email_service.smtp_pool, "send", sent.append)
+    monkeypatch.setattr(email_service, "SMTP_USER", "noreply@example.com")
+
+    email_service.send_otp_email("test@example.com", "123456")
+
+    assert sent[0]["To"] == "test@example.com"
+    assert "123456" in sent[0].get_payload()
+    assert "valid for 10 minutes" in sent[0].get_payload()
+
+
+def test_otp_message_states_a_longer_validity_in_hours():
+    message = email_service.build_otp_message("test@example.com", "123456", valid_minutes=1440)
+    assert "valid for 24 hours" in message.get_payload()
+
+
+@pytest.mark.asyncio
+async def test_background_send_runs_on_the_smtp_executor(monkeypatch):
+    sent = []
+    monkeypatch.setattr(email_service, "send_otp_email", lambda to, otp: sent.append(threading.current_thread().name))
+
+    email_service.send_otp_email_in_background("test@example.com", "123456")
+    await asyncio.gather(*email_service._pending_sends)
+
+    assert sent[0].startswith("smtp")
+
+
+@pytest.mark.asyncio
+async def test_background_send_is_refused_when_smtp_queue_is_full(monkeypatch):
+    executor = BoundedExecutor("smtp-test", max_workers=1, max_queue=0)
+    gate = threading.Event()
+    monkeypatch.setattr(email_service, "smtp_executor", executor)
+    monkeypatch.setattr(email_service, "send_otp_email", lambda to, otp: gate.wait())
+    try:
+        email_service.send_otp_email_in_background("a@example.com", "123456")
+        with pytest.raises(ExecutorRejected):
+            email_service.send_otp_email_in_background("b@example.com", "123456")
+    finally:
+        gate.set()
+        await asyncio.gather(*email_service._pending_sends)
+        executor.shutdown()
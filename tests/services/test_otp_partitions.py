@@ -0,0 +1,105 @@
+import asyncio
+from datetime import date, datetime, time, timedelta, timezone
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.services import otp_partitions
+from conftest import needs_db
+
+
+def test_partition_name_round_trips():
+    day = date(2025, 12, 2)
+    name = otp_partitions.partition_name(day)
+
+    assert name == "email_otp_p20251202"
+    assert otp_partitions.partition_day(name) == day
+    assert otp_partitions.partition_day("email_otp_default") is None
+
+
+@pytest.mark.asyncio
+async def test_app_keeps_partitions_ahead_through_failures():
+    calls = asyncio.Event()
+    results = [RuntimeError("db down"), ["email_otp_p20251216"]]
+
+    async def ensure(pool):
+        result = results.pop(0)
+        if not results:
+            calls.set()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    with patch("app.services.otp_partitions.ensure_partitions_locked", side_effect=ensure):
+        task = asyncio.create_task(otp_partitions.keep_partitions_ahead("pool", interval=0))
+        await asyncio.wait_for(calls.wait(), timeout=1)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    # the failed round did not stop the loop
+    assert results == []
+
+
+@pytest.mark.asyncio
+async def test_partitions_are_ensured_before_serving():
+    with patch(
+        "app.services.otp_partitions.ensure_partitions_locked", new_callable=AsyncMock, return_value=[]
+    ) as ensure:
+        await otp_partitions.start_partition_maintenance(app=None, pool="pool")
+        ensure.assert_awaited_once_with("pool")
+        await otp_partitions.stop_partition_maintenance(app=None)
+
+    assert otp_partitions._task is None
+
+
+@pytest.mark.asyncio
+async def test_expired_partitions_are_detached_concurrently_before_the_drop():
+    today = date(2025, 12, 10)
+    conn = AsyncMock()
+    conn.fetch.return_value = [
+        {"name": "email_otp_p20251201", "bytes": 10, "attached": True, "detach_pending": False},
+        {"name": "email_otp_p20251202", "bytes": 20, "attached": True, "detach_pending": True},
+        {"name": "email_otp_p20251203", "bytes": 30, "attached": False, "detach_pending": False},
+        {"name": "email_otp_p20251209", "bytes": 40, "attached": True, "detach_pending": False},
+    ]
+
+    dropped = await otp_partitions.drop_expired_partitions(conn, retention_days=2, today=today)
+
+    assert [sql.split(";")[0] for sql, *_ in (call.args for call in conn.execute.await_args_list)] == [
+        "alter table email_otp detach partition email_otp_p20251201 concurrently",
+        "drop table if exists email_otp_p20251201",
+        "alter table email_otp detach partition email_otp_p20251202 finalize",
+        "drop table if exists email_otp_p20251202",
+        "drop table if exists email_otp_p20251203",
+    ]
+    assert [name for name, _ in dropped] == ["email_otp_p20251201", "email_otp_p20251202", "email_otp_p20251203"]
+
+
+@needs_db
+@pytest.mark.asyncio
+async def test_maintenance_creates_future_and_drops_expired_partitions(db_pool):
+    today = otp_partitions.utc_today()
+    old_day = today - timedelta(days=10)
+
+    async with db_pool.acquire() as conn:
+        # the migration pre-creates a week; maintenance tops it up
+        created = await otp_partitions.ensure_partitions(conn, days=14)
+        assert otp_partitions.partition_name(today + timedelta(days=14)) in created
+
+        await otp_partitions.ensure_partitions(conn, start=old_day, days=0)
+        await conn.execute(
+            """
+            insert into email_otp (email, otp_hash, purpose, created_at, expires_at)
+            select 'old' || i || '@example.com', md5(i::text), 'login', $1, $1
+              from generate_series(1, 1000) as i;
+            """,
+            datetime.combine(old_day, time(12), tzinfo=timezone.utc),
+        )
+
+        dropped = await otp_partitions.drop_expired_partitions(conn, retention_days=2)
+
+        names = [name for name, _ in dropped]
+        assert otp_partitions.partition_name(old_day) in names
+        assert otp_partitions.partition_name(today - timedelta(days=1)) not in names
+        assert sum(size for _, size in dropped) > 0
+        assert await conn.fetchval("select count(*) from email_otp where email like 'old%'") == 0
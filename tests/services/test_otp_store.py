@@ -0,0 +1,184 @@
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, patch
+
+from app.db import RequestConnection
+from app.services.otp_store import MemoryOtpStore, OtpStore, PostgresOtpStore
+from app.core.config import OTP_MAX_ATTEMPTS
+from app.utils.executors import ExecutorRejected
+from app.utils.otp_utils import OTP_OK, OTP_MISSING, OTP_EXPIRED, OTP_MISMATCH, OTP_LOCKED
+from conftest import needs_db
+
+
+@pytest.fixture(autouse=True)
+def no_email():
+    with patch("app.services.otp_store.send_otp_email_in_background"), patch(
+        "app.services.otp_store.wake_workers"
+    ):
+        yield
+
+
+@pytest_asyncio.fixture(params=["memory", pytest.param("postgres", marks=needs_db)])
+async def store(request):
+    """Every test below runs against both backends, without resend cooldown."""
+    if request.param == "memory":
+        yield MemoryOtpStore(cooldown_seconds=0)
+    else:
+        yield PostgresOtpStore(request.getfixturevalue("db_pool"), cooldown_seconds=0)
+
+
+def _wrong(otp: str) -> str:
+    return str((int(otp) + 1) % 1_000_000).zfill(6)
+
+
+@pytest.mark.asyncio
+async def test_code_is_consumed_once(store):
+    otp = await store.create("a@example.com", "login")
+
+    assert await store.verify("a@example.com", otp, "login") == OTP_OK
+    assert await store.verify("a@example.com", otp, "login") == OTP_MISSING
+
+
+@pytest.mark.asyncio
+async def test_wrong_code_leaves_code_active(store):
+    otp = await store.create("a@example.com", "login")
+
+    assert await store.verify("a@example.com", _wrong(otp), "login") == OTP_MISMATCH
+    assert await store.verify("a@example.com", otp, "login") == OTP_OK
+
+
+@pytest.mark.asyncio
+async def test_new_code_replaces_previous(store):
+    first = await store.create("a@example.com", "login")
+    second = await store.create("a@example.com", "login")
+
+    if first != second:
+        assert await store.verify("a@example.com", first, "login") == OTP_MISMATCH
+    assert await store.verify("a@example.com", second, "login") == OTP_OK
+
+
+@pytest.mark.asyncio
+async def test_purposes_and_emails_are_separate(store):
+    otp = await store.create("a@example.com", "login")
+
+    assert await store.verify("a@example.com", otp, "register") == OTP_MISSING
+    assert await store.verify("b@example.com", otp, "login") == OTP_MISSING
+
+
+@pytest.mark.asyncio
+async def test_code_locks_after_max_attempts(store):
+    otp = await store.create("a@example.com", "login")
+
+    results = [await store.verify("a@example.com", _wrong(otp), "login") for _ in range(OTP_MAX_ATTEMPTS)]
+
+    assert results == [OTP_MISMATCH] * (OTP_MAX_ATTEMPTS - 1) + [OTP_LOCKED]
+    assert await store.verify("a@example.com", otp, "login") == OTP_LOCKED
+
+    # a new code starts with a clean slate
+    otp = await store.create("a@example.com", "login")
+    assert await store.verify("a@example.com", otp, "login") == OTP_OK
+
+
+@pytest.mark.asyncio
+async def test_repeat_start_within_cooldown_reuses_the_code(store):
+    store.cooldown_seconds = 60
+    otp = await store.create("a@example.com", "login")
+
+    assert await store.create("a@example.com", "login") is None
+    assert await store.create("a@example.com", "login") is None
+    assert store.stats()["reused"] == 2
+    assert await store.verify("a@example.com", otp, "login") == OTP_OK
+
+    # once that code is used, the next start issues a new one
+    assert await store.create("a@example.com", "login") is not None
+
+
+@pytest.mark.asyncio
+async def test_expired_code(store):
+    otp = await store.create("a@example.com", "login", ttl_minutes=0)
+
+    assert await store.verify("a@example.com", otp, "login") == OTP_EXPIRED
+
+
+# ---------------------------------------------------------------------------
+# Memory backend internals
+# ---------------------------------------------------------------------------
+@pytest.mark.asyncio
+async def test_memory_store_purges_on_the_wheel():
+    now = [1_000_000.0]
+    store = MemoryOtpStore(cooldown_seconds=0, clock=lambda: now[0])
+    await store.create("a@example.com", "login", ttl_minutes=10)
+    otp = await store.create("b@example.com", "login", ttl_minutes=10)
+
+    now[0] += 601
+    assert await store.verify("b@example.com", otp, "login") == OTP_EXPIRED
+
+    # kept for one more TTL so the answer stays "expired", then dropped
+    now[0] += 600
+    assert await store.verify("b@example.com", otp, "login") == OTP_MISSING
+    assert len(store) == 0
+    assert store.stats()["purged"] == 2
+
+
+@pytest.mark.asyncio
+async def test_memory_store_records_are_slotted():
+    store = MemoryOtpStore()
+    await store.create("a@example.com", "login")
+
+    record = store._records[("a@example.com", "login")]
+    assert not hasattr(record, "__dict__")
+
+
+@pytest.mark.asyncio
+async def test_memory_store_cooldown_ends():
+    now = [1_000_000.0]
+    store = MemoryOtpStore(cooldown_seconds=60, clock=lambda: now[0])
+    first = await store.create("a@example.com", "login")
+
+    now[0] += 30
+    assert await store.create("a@example.com", "login") is None
+    now[0] += 31
+    second = await store.create("a@example.com", "login")
+
+    assert second is not None
+    if first != second:
+        assert await store.verify("a@example.com", first, "login") == OTP_MISMATCH
+
+
+@pytest.mark.asyncio
+async def test_memory_store_keeps_no_code_when_the_email_is_refused():
+    store = MemoryOtpStore()
+    with patch("app.services.otp_store.send_otp_email_in_background", side_effect=ExecutorRejected("smtp")):
+        with pytest.raises(ExecutorRejected):
+            await store.create("a@example.com", "login")
+
+    assert len(store) == 0
+    # nothing stored, so the resend cooldown does not swallow the next start
+    assert await store.create("a@example.com", "login") is not None
+
+
+@pytest.mark.asyncio
+async def test_bound_store_hands_the_request_connection_back_on_release():
+    pool = SimpleNamespace(acquire=AsyncMock(return_value="conn"), release=AsyncMock())
+    db = RequestConnection(pool)
+    store = PostgresOtpStore(None).bind(db)
+
+    with patch("app.services.otp_store.verify_email_otp", new_callable=AsyncMock, return_value=OTP_OK):
+        assert await store.verify("a@example.com", "123456", "login") == OTP_OK
+    await store.release()
+
+    pool.release.assert_awaited_once_with("conn")
+    # a later use on the same request acquires afresh
+    await db.get()
+    assert pool.acquire.await_count == 2
+
+
+def test_a_store_must_implement_create_and_verify():
+    class HalfStore(OtpStore):
+        async def create(self, email, purpose, ttl_minutes=10):
+            return None
+
+    with pytest.raises(TypeError):
+        HalfStore()
@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.auth_otp import router as auth_otp_router
+from app.services import rate_limiter
+from app.services.otp_store import get_otp_store
+from app.services.rate_limiter import MemoryCounter, PostgresCounter, RateLimit, RateLimiter
+from conftest import needs_db
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_800_000_000.0):   # a multiple of 60 and 600
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.mark.asyncio
+async def test_requests_over_the_limit_are_refused(clock):
+    limiter = RateLimiter(MemoryCounter(), clock=clock)
+    rule = RateLimit("t", limit=3, window_seconds=60)
+
+    results = [await limiter.hit(rule, "a@example.com") for _ in range(4)]
+
+    assert results[:3] == [0.0, 0.0, 0.0]
+    assert results[3] > 0
+    # other keys have their own budget
+    assert await limiter.hit(rule, "b@example.com") == 0.0
+
+
+@pytest.mark.asyncio
+async def test_leased_tokens_are_answered_locally(clock):
+    counter = MemoryCounter()
+    counter.take = AsyncMock(wraps=counter.take)
+    limiter = RateLimiter(counter, clock=clock)
+    rule = RateLimit("t", limit=100, window_seconds=60, lease=10)
+
+    assert all([await limiter.hit(rule, "*") == 0.0 for _ in range(100)])
+    assert counter.take.await_count == 10
+
+    # once refused, repeat requests do not reach the shared counter
+    assert await limiter.hit(rule, "*") > 0
+    calls = counter.take.await_count
+    for _ in range(50):
+        assert await limiter.hit(rule, "*") > 0
+    assert counter.take.await_count == calls
+    assert limiter.stats()["local_denials"] == 50
+
+
+@pytest.mark.asyncio
+async def test_lease_falls_back_to_single_tokens_near_the_limit(clock):
+    limiter = RateLimiter(MemoryCounter(), clock=clock)
+    rule = RateLimit("t", limit=25, window_seconds=60, lease=10)
+
+    results = [await limiter.hit(rule, "*") for _ in range(26)]
+
+    assert results.count(0.0) == 25
+
+
+@pytest.mark.asyncio
+async def test_window_slides(clock):
+    limiter = RateLimiter(MemoryCounter(), clock=clock)
+    rule = RateLimit("t", limit=10, window_seconds=60)
+    for _ in range(10):
+        await limiter.hit(rule, "k")
+
+    # just after the boundary the previous window still counts in full
+    clock.now += 60
+    assert await limiter.hit(rule, "k") > 0
+
+    # half way through, half of it has slid out
+    clock.now += 30
+    limiter._local.clear()
+    allowed = [await limiter.hit(rule, "k") for _ in range(10)].count(0.0)
+    assert allowed == 5
+
+
+# ---------------------------------------------------------------------------
+# As a route dependency
+# ---------------------------------------------------------------------------
+@pytest.fixture
+def store():
+    store = MagicMock()
+    store.create = AsyncMock(return_value="123456")
+    return store
+
+
+@pytest.fixture
+def client(monkeypatch, store):
+    monkeypatch.setattr(rate_limiter, "rate_limiter", RateLimiter(MemoryCounter()))
+    monkeypatch.setattr(rate_limiter, "EMAIL_LIMIT", RateLimit("otp_start:email", 2, 600))
+
+    app = FastAPI()
+    app.dependency_overrides[get_otp_store] = lambda: store
+    app.include_router(auth_otp_router)
+    return TestClient(app)
+
+
+def test_start_over_the_limit_gets_429_before_the_store(client, store):
+    responses = [
+        client.post("/api/auth/otp/login/start", params={"email": "test@example.com"})
+        for _ in range(3)
+    ]
+
+    assert [r.status_code for r in responses] == [200, 200, 429]
+    assert int(responses[2].headers["Retry-After"]) > 0
+    assert store.create.await_count == 2
+
+
+def test_client_ip_trusts_only_the_configured_proxy_hops():
+    from starlette.requests import Request
+
+    def request(*forwarded: str) -> Request:
+        headers = [(b"x-forwarded-for", value.encode()) for value in forwarded]
+        return Request({"type": "http", "headers": headers, "client": ("10.0.0.1", 1234)})
+
+    # without trusted proxies the header is ignored
+    assert rate_limiter.client_ip(request("203.0.113.7"), trusted_proxies=0) == "10.0.0.1"
+    # a spoofed left-most entry is skipped; the balancer appended the real one
+    assert rate_limiter.client_ip(request("1.2.3.4, 203.0.113.7"), trusted_proxies=1) == "203.0.113.7"
+    assert rate_limiter.client_ip(request("1.2.3.4", "203.0.113.7, 10.0.0.9"), trusted_proxies=2) == "203.0.113.7"
+    # too few hops: the request bypassed a proxy
+    assert rate_limiter.client_ip(request(), trusted_proxies=1) == "10.0.0.1"
+
+
+# ---------------------------------------------------------------------------
+# Against a real Postgres (see tests/conftest.py)
+# ---------------------------------------------------------------------------
+@needs_db
+@pytest.mark.asyncio
+async def test_shared_counter_never_overshoots(db_pool):
+    counter = PostgresCounter(db_pool)
+
+    granted = await asyncio.gather(*(
+        counter.take("otp_start:global:*", 100, 1, 0.0, 10, 1_800_000_000.0)
+        for _ in range(50)
+    ))
+
+    assert granted.count(True) == 10
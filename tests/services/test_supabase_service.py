@@ -1,6 +1,8 @@
+import asyncio
 import json
 import pytest
-from unittest.mock import patch, MagicMock
+import pytest_asyncio
+from unittest.mock import AsyncMock, patch, MagicMock
 
 from app.services import supabase_service
 from app.core.config import SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
@@ -8,17 +10,22 @@ from app.core.config import SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
 
 @pytest.fixture
 def mock_post():
-    """Mock for requests.post to avoid making real HTTP calls."""
-    with patch("app.services.supabase_service.requests.post") as mock:
-        yield mock
+    """Mock the shared async HTTP client's post() to avoid real HTTP calls."""
+    client = MagicMock()
+    client.post = AsyncMock()
+    supabase_service.refresh_flight.clear()
+    with patch("app.services.supabase_service.get_http_client", return_value=client), \
+            patch("app.services.supabase_service.supabase_guard", supabase_service.build_supabase_guard()):
+        yield client.post
 
 
 # ------------------------------------------------------------------------------
 # TEST: register()
 # ------------------------------------------------------------------------------
-def test_register_success(mock_post):
+@pytest.mark.asyncio
+async def test_register_success(mock_post):
     # Mock response object
-    mock_response = MagicMock()
+    mock_response = MagicMock(status_code=200)
     mock_response.json.return_value = {"id": "user123", "email": "test@example.com"}
     mock_response.raise_for_status.return_value = None
 
@@ -28,7 +35,7 @@ def test_register_success(mock_post):
     phone = None
     password = "Pass123"
 
-    result = supabase_service.register(email=email, phone=phone, password=password)
+    result = await supabase_service.register(email=email, phone=phone, password=password)
 
     # Validate return value
     assert result["id"] == "user123"
@@ -60,21 +67,23 @@ def test_register_success(mock_post):
     }
 
 
-def test_register_failure(mock_post):
+@pytest.mark.asyncio
+async def test_register_failure(mock_post):
     """Ensure register() raises exception when Supabase returns 400."""
-    mock_response = MagicMock()
+    mock_response = MagicMock(status_code=200)
     mock_response.raise_for_status.side_effect = Exception("Bad Request")
     mock_post.return_value = mock_response
 
     with pytest.raises(Exception):
-        supabase_service.register(email="x@test.com", phone=None, password="123456")
+        await supabase_service.register(email="x@test.com", phone=None, password="123456")
 
 
 # ------------------------------------------------------------------------------
 # TEST: login()
 # ------------------------------------------------------------------------------
-def test_login_success(mock_post):
-    mock_response = MagicMock()
+@pytest.mark.asyncio
+async def test_login_success(mock_post):
+    mock_response = MagicMock(status_code=200)
     mock_response.json.return_value = {
         "access_token": "token123",
         "refresh_token": "refreshXYZ",
@@ -85,7 +94,7 @@ def test_login_success(mock_post):
     email = "test@example.com"
     password = "Pass123"
 
-    result = supabase_service.login(email, password)
+    result = await supabase_service.login(email, password)
 
     assert result["access_token"] == "token123"
 
@@ -99,20 +108,22 @@ def test_login_success(mock_post):
     assert called_payload == {"email": email, "password": password}
 
 
-def test_login_failure(mock_post):
-    mock_response = MagicMock()
+@pytest.mark.asyncio
+async def test_login_failure(mock_post):
+    mock_response = MagicMock(status_code=200)
     mock_response.raise_for_status.side_effect = Exception("Unauthorized")
     mock_post.return_value = mock_response
 
     with pytest.raises(Exception):
-        supabase_service.login("wrong@example.com", "badpassword")
+        await supabase_service.login("wrong@example.com", "badpassword")
 
 
 # ------------------------------------------------------------------------------
 # TEST: refresh()
 # ------------------------------------------------------------------------------
-def test_refresh_success(mock_post):
-    mock_response = MagicMock()
+@pytest.mark.asyncio
+async def test_refresh_success(mock_post):
+    mock_response = MagicMock(status_code=200)
     mock_response.json.return_value = {
         "access_token": "new_access",
         "refresh_token": "new_refresh",
@@ -122,7 +133,7 @@ def test_refresh_success(mock_post):
     mock_post.return_value = mock_response
 
     refresh_token = "old_refresh"
-    result = supabase_service.refresh(refresh_token)
+    result = await supabase_service.refresh(refresh_token)
 
     assert result["access_token"] == "new_access"
 
@@ -133,10 +144,88 @@ def test_refresh_success(mock_post):
     assert called_payload == {"refresh_token": refresh_token}
 
 
-def test_refresh_failure(mock_post):
-    mock_response = MagicMock()
+@pytest.mark.asyncio
+async def test_refresh_coalesces_concurrent_duplicates(mock_post):
+    """Concurrent refreshes of one token must hit Supabase only once."""
+    async def slow_post(*args, **kwargs):
+        await asyncio.sleep(0.01)
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"access_token": "a", "refresh_token": "r"}
+        return response
+
+    mock_post.side_effect = slow_post
+
+    results = await asyncio.gather(
+        *(supabase_service.refresh("dup_refresh") for _ in range(5))
+    )
+
+    assert mock_post.await_count == 1
+    assert all(r == {"access_token": "a", "refresh_token": "r"} for r in results)
+
+
+@pytest.mark.asyncio
+async def test_refresh_failure(mock_post):
+    mock_response = MagicMock(status_code=200)
     mock_response.raise_for_status.side_effect = Exception("Invalid refresh token")
     mock_post.return_value = mock_response
 
     with pytest.raises(Exception):
-        supabase_service.refresh("badtoken")
+        await supabase_service.refresh("badtoken")
+
+
+# ------------------------------------------------------------------------------
+# Resilience against a local fake Supabase
+# ------------------------------------------------------------------------------
+@pytest_asyncio.fixture
+async def fake_supabase(monkeypatch):
+    from app.http_client import build_http_client
+    from benchmarks.fakes import FakeSupabase
+
+    supabase_service.refresh_flight.clear()
+    with FakeSupabase() as upstream:
+        client = build_http_client()
+        monkeypatch.setattr(supabase_service, "SUPABASE_URL", upstream.url)
+        monkeypatch.setattr(supabase_service, "SUPABASE_SERVICE_ROLE_KEY", "service-role-key")
+        monkeypatch.setattr(supabase_service, "get_http_client", lambda: client)
+        monkeypatch.setattr(supabase_service, "supabase_guard", supabase_service.build_supabase_guard())
+        try:
+            yield upstream
+        finally:
+            await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_slow_supabase_times_out_and_then_fails_fast(fake_supabase, monkeypatch):
+    from app.utils.resilience import Endpoint
+    from fastapi import HTTPException
+
+    monkeypatch.setattr(supabase_service, "REFRESH", Endpoint("refresh", 0.05))
+    fake_supabase.latency = 0.5
+
+    statuses = []
+    for i in range(supabase_service.SUPABASE_BREAKER_MIN_CALLS + 1):
+        with pytest.raises(HTTPException) as exc:
+            await supabase_service.refresh(f"token-{i}")
+        statuses.append(exc.value.status_code)
+
+    assert statuses[-1] == 503 and set(statuses[:-1]) == {504}
+    # the shed call never reached the upstream
+    assert fake_supabase.requests == supabase_service.SUPABASE_BREAKER_MIN_CALLS
+
+
+@pytest.mark.asyncio
+async def test_login_is_retried_on_upstream_errors_but_register_is_not(fake_supabase):
+    import httpx
+
+    fake_supabase.fault_status = 503
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await supabase_service.login("test@example.com", "Pass123")
+    assert fake_supabase.requests == supabase_service.SUPABASE_MAX_ATTEMPTS
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await supabase_service.register("test@example.com", None, "Pass123")
+    assert fake_supabase.requests == supabase_service.SUPABASE_MAX_ATTEMPTS + 1
+
+    fake_supabase.fault_status = None
+    assert (await supabase_service.login("test@example.com", "Pass123"))["access_token"] == "access"
@@ -0,0 +1,142 @@
+import asyncio
+import io
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.services import user_provisioning
+from app.services.user_provisioning import provision_users, read_csv, read_ndjson
+
+
+def test_read_ndjson_reports_bad_lines_by_number():
+    data = b'{"email": "a@example.com", "password": "p"}\n\nnot json\n[1]\n'
+
+    rows = list(read_ndjson(io.BytesIO(data)))
+
+    assert rows == [
+        (1, {"email": "a@example.com", "password": "p"}, None),
+        (3, None, "invalid JSON"),
+        (4, None, "expected a JSON object"),
+    ]
+
+
+def test_read_csv_uses_the_header_and_drops_empty_fields():
+    data = b"email,phone,password\r\na@example.com,,p1\r\n,+21600000000,p2\r\n"
+
+    rows = list(read_csv(io.BytesIO(data)))
+
+    assert rows == [
+        (2, {"email": "a@example.com", "password": "p1"}, None),
+        (3, {"phone": "+21600000000", "password": "p2"}, None),
+    ]
+
+
+@pytest.fixture
+def register(monkeypatch):
+    calls = []
+    state = {"in_flight": 0, "peak": 0}
+
+    async def fake_register(email, phone, password, endpoint=None):
+        assert endpoint is user_provisioning.supabase_service.BULK_REGISTER
+        calls.append(email)
+        state["in_flight"] += 1
+        state["peak"] = max(state["peak"], state["in_flight"])
+        await asyncio.sleep(0.001)
+        state["in_flight"] -= 1
+        if email == "taken@example.com":
+            response = httpx.Response(422, json={"msg": "User already registered"})
+            raise httpx.HTTPStatusError("422", request=httpx.Request("POST", "http://sb"), response=response)
+        return {"id": f"id-{email}"}
+
+    monkeypatch.setattr(user_provisioning.supabase_service, "register", fake_register)
+    fake_register.calls = calls
+    fake_register.state = state
+    return fake_register
+
+
+async def collect(rows, concurrency=4):
+    return [result async for result in provision_users(iter(rows), concurrency=concurrency)]
+
+
+@pytest.mark.asyncio
+async def test_provisions_rows_with_bounded_concurrency(register):
+    rows = [(i + 1, {"email": f"u{i}@example.com", "password": "p"}, None) for i in range(50)]
+
+    results = await collect(rows, concurrency=4)
+
+    summary = results.pop()["summary"]
+    assert summary["rows"] == summary["created"] == 50
+    assert sorted(r["line"] for r in results) == list(range(1, 51))
+    assert all(r["status"] == "created" and "password" not in r for r in results)
+    assert register.state["peak"] == 4
+
+
+@pytest.mark.asyncio
+async def test_reports_failed_and_invalid_rows_without_stopping(register):
+    rows = [
+        (1, {"email": "taken@example.com", "password": "p"}, None),
+        (2, {"email": "no-password@example.com"}, None),
+        (3, None, "invalid JSON"),
+        (4, {"email": "ok@example.com", "password": "p"}, None),
+    ]
+
+    results = {r.get("line"): r for r in await collect(rows)}
+
+    assert results[1]["error"] == "422 User already registered"
+    assert results[2]["status"] == results[3]["status"] == "invalid"
+    assert results[4]["status"] == "created"
+    assert register.calls.count("no-password@example.com") == 0
+    summary = results[None]["summary"]
+    assert (summary["rows"], summary["created"], summary["failed"], summary["invalid"]) == (4, 1, 1, 2)
+
+
+@pytest.mark.asyncio
+async def test_rows_refused_locally_are_retried(monkeypatch):
+    attempts = []
+
+    async def busy_then_ok(email, phone, password, endpoint=None):
+        attempts.append(email)
+        if len(attempts) == 1:
+            raise HTTPException(status_code=503, detail="busy", headers={"Retry-After": "0"})
+        return {"id": "id-1"}
+
+    monkeypatch.setattr(user_provisioning.supabase_service, "register", busy_then_ok)
+
+    results = await collect([(1, {"email": "a@example.com", "password": "p"}, None)])
+
+    assert results[0]["status"] == "created"
+    assert len(attempts) == 2
+
+
+@pytest.mark.asyncio
+async def test_unexpected_errors_fail_only_their_row(monkeypatch):
+    async def flaky(email, phone, password, endpoint=None):
+        if email == "a@example.com":
+            raise HTTPException(status_code=504, detail="Upstream timed out")
+        if email == "b@example.com":
+            raise httpx.ConnectError("reset")
+        return {"id": "id-c"}
+
+    monkeypatch.setattr(user_provisioning.supabase_service, "register", flaky)
+    rows = [(i + 1, {"email": f"{name}@example.com", "password": "p"}, None) for i, name in enumerate("abc")]
+
+    results = {r.get("line"): r for r in await asyncio.wait_for(collect(rows), 5)}
+
+    assert results[1]["error"] == "504 Upstream timed out"
+    assert results[2]["status"] == "failed" and "ConnectError" in results[2]["error"]
+    assert results[3]["status"] == "created"
+    assert results[None]["summary"]["failed"] == 2
+
+
+@pytest.mark.asyncio
+async def test_a_failing_worker_ends_the_stream_with_its_error(register):
+    def rows():
+        yield 1, {"email": "a@example.com", "password": "p"}, None
+        raise OSError("upload went away")
+
+    async def drain():
+        return [result async for result in provision_users(rows(), concurrency=1)]
+
+    with pytest.raises(ExceptionGroup):
+        await asyncio.wait_for(drain(), 5)
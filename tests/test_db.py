@@ -0,0 +1,180 @@
+import asyncio
+
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import asyncpg
+
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app import db
+from app.db import AuthConnection, PgBouncerConnection, RequestConnection, get_db_conn, pool_options
+
+
+@pytest.mark.asyncio
+async def test_named_statement_is_prepared_once_per_connection():
+    # stand-in for a live connection: only what prepared() touches
+    conn = SimpleNamespace(_named_statements={}, prepare=AsyncMock(return_value="stmt"))
+
+    first = await AuthConnection.prepared(conn, "create_email_otp", "select 1")
+    second = await AuthConnection.prepared(conn, "create_email_otp", "select 1")
+
+    assert first is second and first.statement == "stmt"
+    conn.prepare.assert_awaited_once_with("select 1", name="create_email_otp")
+
+
+@pytest.fixture
+def pool():
+    pool = SimpleNamespace(acquire=AsyncMock(return_value="conn"), release=AsyncMock())
+    return pool
+
+
+@pytest.mark.asyncio
+async def test_request_connection_is_acquired_lazily_once(pool):
+    db.acquire_stats.clear()
+    conn = RequestConnection(pool, route="/r")
+
+    await conn.release()
+    pool.acquire.assert_not_awaited()
+
+    async with conn.acquire() as first:
+        pass
+    async with conn.acquire() as second:
+        pass
+    await conn.release()
+
+    assert first == second == "conn"
+    pool.acquire.assert_awaited_once()
+    pool.release.assert_awaited_once_with("conn")
+    assert db.acquire_stats.stats()["/r"]["acquires"] == 1
+
+
+def test_dependency_shares_one_connection_per_request(monkeypatch, pool):
+    monkeypatch.setattr(db, "pool", pool)
+    db.acquire_stats.clear()
+    app = FastAPI()
+
+    async def uses_db(conn: RequestConnection = Depends(get_db_conn, scope="function")):
+        return await conn.get()
+
+    @app.post("/things/{thing_id}")
+    async def handler(
+        a=Depends(uses_db),
+        b: RequestConnection = Depends(get_db_conn, scope="function"),
+    ):
+        assert a == await b.get()
+        return {"ok": True}
+
+    @app.get("/idle")
+    async def idle(conn: RequestConnection = Depends(get_db_conn, scope="function")):
+        return {"ok": True}
+
+    client = TestClient(app)
+    assert client.post("/things/1").status_code == 200
+    assert client.get("/idle").status_code == 200
+
+    pool.acquire.assert_awaited_once()
+    pool.release.assert_awaited_once_with("conn")
+    # recorded under the route template, not the concrete path
+    assert list(db.acquire_stats.stats()) == ["/things/{thing_id}"]
+
+
+@pytest.fixture
+def gauges(monkeypatch):
+    gauges = db.PoolGauges()
+    monkeypatch.setattr(db, "pool_gauges", gauges)
+    return gauges
+
+
+@pytest.mark.asyncio
+async def test_requests_are_shed_when_too_many_are_waiting(monkeypatch, gauges):
+    monkeypatch.setattr(db, "DB_MAX_ACQUIRE_WAITERS", 2)
+    release = asyncio.Event()
+
+    async def slow_acquire(timeout=None):
+        await release.wait()
+        return "conn"
+
+    pool = SimpleNamespace(acquire=slow_acquire, release=AsyncMock())
+    waiting = [asyncio.create_task(RequestConnection(pool).get()) for _ in range(2)]
+    await asyncio.sleep(0)
+    assert gauges.waiters == 2
+
+    with pytest.raises(HTTPException) as exc:
+        await RequestConnection(pool).get()
+    assert exc.value.status_code == 503
+    assert exc.value.headers["Retry-After"] == "1"
+
+    release.set()
+    assert await asyncio.gather(*waiting) == ["conn", "conn"]
+    assert gauges.waiters == 0
+    assert gauges.shed == 1 and gauges.acquires == 2
+
+
+@pytest.mark.asyncio
+async def test_acquire_timeout_becomes_503(gauges):
+    pool = SimpleNamespace(acquire=AsyncMock(side_effect=asyncio.TimeoutError), release=AsyncMock())
+
+    with pytest.raises(HTTPException) as exc:
+        await RequestConnection(pool).get()
+
+    assert exc.value.status_code == 503
+    assert pool.acquire.await_args.kwargs["timeout"] == db.DB_POOL_ACQUIRE_TIMEOUT_SECONDS
+    assert gauges.timeouts == 1 and gauges.waiters == 0
+
+
+def test_pool_gauges_report_occupancy(gauges):
+    pool = SimpleNamespace(get_size=lambda: 8, get_idle_size=lambda: 3, get_max_size=lambda: 10)
+    gauges.record(0.25)
+
+    stats = gauges.stats(pool)
+
+    assert (stats["size"], stats["in_use"], stats["idle"], stats["max_size"]) == (8, 5, 3, 10)
+    assert stats["wait_seconds_max"] == 0.25
+
+
+def test_pool_options_for_transaction_pooling():
+    direct, pooled = pool_options(False), pool_options(True)
+
+    assert direct["connection_class"] is AuthConnection
+    assert direct["statement_cache_size"] == db.DB_STATEMENT_CACHE_SIZE
+    assert pooled == {"statement_cache_size": 0, "connection_class": PgBouncerConnection}
+    assert PgBouncerConnection.get_reset_query(None) == ""
+
+
+class FakePgBouncerConnection:
+    """What the PgBouncer statements touch on their connection."""
+
+    named_statements = True
+    disable_named_statements = classmethod(PgBouncerConnection.disable_named_statements.__func__)
+
+    def __init__(self):
+        self.fetchval = AsyncMock(return_value="unnamed")
+
+
+@pytest.mark.asyncio
+async def test_pooled_statement_runs_named_while_pgbouncer_keeps_it():
+    conn = FakePgBouncerConnection()
+    statement = SimpleNamespace(fetchval=AsyncMock(return_value="named"))
+
+    assert await db._PooledStatement(conn, "select $1", statement).fetchval(1) == "named"
+    conn.fetchval.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_pooled_statement_falls_back_to_unnamed_when_server_lacks_it(monkeypatch):
+    monkeypatch.setattr(FakePgBouncerConnection, "named_statements", True)
+    conn = FakePgBouncerConnection()
+    missing = asyncpg.exceptions.InvalidSQLStatementNameError("prepared statement does not exist")
+    statement = SimpleNamespace(fetchval=AsyncMock(side_effect=missing))
+    pooled = db._PooledStatement(conn, "select $1", statement)
+
+    assert await pooled.fetchval(1) == "unnamed"
+    assert await pooled.fetchval(2) == "unnamed"
+
+    statement.fetchval.assert_awaited_once()
+    assert conn.fetchval.await_args.args == ("select $1", 2)
+    assert FakePgBouncerConnection.named_statements is False
+    assert PgBouncerConnection.named_statements is True
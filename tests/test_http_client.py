@@ -0,0 +1,23 @@
+import pytest
+
+from app.http_client import build_http_client
+from benchmarks.fakes import FakeSupabase
+
+
+@pytest.mark.asyncio
+async def test_shared_client_reuses_upstream_connections():
+    """Sequential calls through the shared client should ride one keep-alive connection."""
+    with FakeSupabase() as upstream:
+        client = build_http_client()
+        try:
+            for _ in range(5):
+                r = await client.post(
+                    f"{upstream.url}/auth/v1/token?grant_type=password",
+                    json={"email": "test@example.com", "password": "Pass123"},
+                )
+                r.raise_for_status()
+        finally:
+            await client.aclose()
+
+        assert upstream.requests == 5
+        assert upstream.connections == 1
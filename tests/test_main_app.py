@@ -44,3 +44,15 @@ def test_health_endpoint_from_main_app():
     data = response.json()
     assert data["ok"] is True
     assert data["service"] == "ai-labs-tn-api"
+
+
+def test_main_app_times_requests_and_serves_metrics():
+    client = TestClient(create_app())
+
+    response = client.get("/api/health/")
+    # timings are not handed to unauthenticated callers unless turned on
+    assert "Server-Timing" not in response.headers
+
+    metrics = client.get("/metrics")
+    assert metrics.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/health/",status="200"}' in metrics.text
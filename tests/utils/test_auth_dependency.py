@@ -0,0 +1,87 @@
+import time
+
+import jwt
+import pytest
+from fastapi import HTTPException
+
+from app.utils import auth_dependency
+
+SECRET = "test-secret"
+
+
+@pytest.fixture(autouse=True)
+def jwt_secret(monkeypatch):
+    monkeypatch.setattr(auth_dependency, "SUPABASE_JWT_SECRET", SECRET)
+    auth_dependency.token_cache.clear()
+    yield
+    auth_dependency.token_cache.clear()
+
+
+def make_token(exp_in: int = 3600, secret: str = SECRET, **claims) -> str:
+    payload = {"sub": "user123", "exp": int(time.time()) + exp_in, **claims}
+    return jwt.encode(payload, secret, algorithm="HS256")
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_returns_claims():
+    token = make_token()
+    payload = await auth_dependency.get_current_user(authorization=f"Bearer {token}")
+    assert payload["sub"] == "user123"
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_rejects_bad_header():
+    with pytest.raises(HTTPException) as exc:
+        await auth_dependency.get_current_user(authorization="Token abc")
+    assert exc.value.status_code == 401
+
+
+def test_verify_token_rejects_expired_and_invalid_tokens():
+    with pytest.raises(HTTPException) as exc:
+        auth_dependency.verify_token(make_token(exp_in=-10))
+    assert exc.value.detail == "Token expired"
+
+    with pytest.raises(HTTPException) as exc:
+        auth_dependency.verify_token(make_token(secret="other-secret"))
+    assert exc.value.detail == "Invalid token"
+
+    # failures are never cached
+    assert len(auth_dependency.token_cache) == 0
+
+
+def test_verify_token_serves_repeat_tokens_from_cache():
+    token = make_token()
+    auth_dependency.verify_token(token)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(auth_dependency.jwt, "decode", lambda *a, **kw: pytest.fail("decoded twice"))
+        payload = auth_dependency.verify_token(token)
+
+    assert payload["sub"] == "user123"
+    assert auth_dependency.token_cache.stats()["hits"] == 1
+
+
+def test_cache_entry_expires_with_token(monkeypatch):
+    token = make_token(exp_in=60)
+    auth_dependency.verify_token(token)
+
+    now = time.monotonic()
+    monkeypatch.setattr(auth_dependency.token_cache, "_clock", lambda: now + 61)
+    assert auth_dependency.token_cache.get(auth_dependency.hashlib.sha256(token.encode()).digest()) is None
+
+
+def test_cache_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(auth_dependency, "TOKEN_CACHE_ENABLED", False)
+    auth_dependency.verify_token(make_token())
+    assert len(auth_dependency.token_cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_require_admin_accepts_service_role_and_admin_users():
+    assert await auth_dependency.require_admin({"role": "service_role"})
+    assert await auth_dependency.require_admin({"role": "authenticated", "app_metadata": {"role": "admin"}})
+
+    with pytest.raises(HTTPException) as exc:
+        # user_metadata is writable by the user, so it must not grant access
+        await auth_dependency.require_admin({"role": "authenticated", "user_metadata": {"role": "admin"}})
+    assert exc.value.status_code == 403
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.utils.executors import BoundedExecutor, ExecutorRejected, bounded_executor, executors
+
+
+@pytest.mark.asyncio
+async def test_runs_calls_and_reports_latency():
+    executor = BoundedExecutor("test", max_workers=2, max_queue=2)
+    try:
+        assert await executor.run(pow, 2, 10) == 1024
+        with pytest.raises(ZeroDivisionError):
+            await executor.run(divmod, 1, 0)
+    finally:
+        executor.shutdown()
+
+    stats = executor.stats()
+    assert (stats["submitted"], stats["completed"], stats["failed"]) == (2, 2, 1)
+    assert stats["queued"] == stats["running"] == 0
+    assert stats["run_seconds_max"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_is_rejected_without_waiting():
+    executor = BoundedExecutor("slow", max_workers=1, max_queue=1)
+    gate = threading.Event()
+    try:
+        running = executor.submit(gate.wait)
+        queued = executor.submit(gate.wait)
+
+        with pytest.raises(ExecutorRejected) as exc:
+            executor.submit(gate.wait)
+        assert exc.value.status_code == 503
+
+        gate.set()
+        await asyncio.gather(running, queued)
+    finally:
+        executor.shutdown()
+
+    assert executor.rejected == 1
+    assert executor.pending == 0
+    # room again once the backlog drained
+    assert await executor.run(len, "ok") == 2
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_a_stalled_dependency_does_not_hold_up_another():
+    stalled = BoundedExecutor("stalled", max_workers=1, max_queue=10)
+    other = BoundedExecutor("other", max_workers=1, max_queue=10)
+    gate = threading.Event()
+    try:
+        blocked = [stalled.submit(gate.wait) for _ in range(5)]
+        assert await asyncio.wait_for(other.run(sum, [1, 2]), timeout=1) == 3
+        assert stalled.stats()["queued"] == 4
+    finally:
+        gate.set()
+        await asyncio.gather(*blocked)
+        stalled.shutdown()
+        other.shutdown()
+
+
+def test_named_executors_are_registered_once():
+    executor = bounded_executor("test-registry", 1, 1)
+    try:
+        assert executors["test-registry"] is executor
+        with pytest.raises(ValueError):
+            bounded_executor("test-registry", 1, 1)
+    finally:
+        del executors["test-registry"]
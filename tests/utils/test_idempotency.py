@@ -0,0 +1,175 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from app.api.auth_otp import router as auth_otp_router
+from app.services.otp_store import get_otp_store
+from app.services.rate_limiter import limit_otp_start
+from app.utils import idempotency
+from app.utils.idempotency import REPLAYED_HEADER, IdempotencyRoute, IdempotencyStore, _StoredResponse
+
+
+@pytest.fixture(autouse=True)
+def fresh_store(monkeypatch):
+    store = IdempotencyStore()
+    monkeypatch.setattr(idempotency, "idempotency_store", store)
+    return store
+
+
+@pytest.fixture
+def otp_store():
+    return MagicMock()
+
+
+@pytest.fixture
+def client(otp_store):
+    app = FastAPI()
+    app.dependency_overrides[get_otp_store] = lambda: otp_store
+    app.dependency_overrides[limit_otp_start] = lambda: None
+    app.include_router(auth_otp_router)
+    return TestClient(app)
+
+
+def register_complete(client, key, otp="123456"):
+    return client.post(
+        "/api/auth/otp/register/complete",
+        params={"email": "test@example.com", "password": "Pass123", "otp": otp},
+        headers={"Idempotency-Key": key},
+    )
+
+
+def test_retry_is_replayed_without_running_the_handler(client):
+    with patch(
+        "app.api.auth_otp.complete_register_with_email_otp", new_callable=AsyncMock
+    ) as mock_complete:
+        mock_complete.return_value = {"id": "user123"}
+
+        first = register_complete(client, "k1")
+        second = register_complete(client, "k1")
+
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json() == {"success": True, "user": {"id": "user123"}}
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert second.headers["content-type"] == "application/json"
+    mock_complete.assert_awaited_once()
+
+
+def test_client_errors_are_replayed_too(client):
+    with patch(
+        "app.api.auth_otp.complete_register_with_email_otp", new_callable=AsyncMock
+    ) as mock_complete:
+        mock_complete.side_effect = ValueError("Invalid OTP")
+
+        responses = [register_complete(client, "k2") for _ in range(2)]
+
+    assert [r.status_code for r in responses] == [400, 400]
+    assert responses[1].json() == {"detail": "Invalid OTP"}
+    mock_complete.assert_awaited_once()
+
+
+def test_key_reused_with_a_different_request_is_rejected(client):
+    with patch(
+        "app.api.auth_otp.complete_register_with_email_otp", new_callable=AsyncMock
+    ) as mock_complete:
+        mock_complete.return_value = {"id": "user123"}
+
+        register_complete(client, "k3", otp="123456")
+        response = register_complete(client, "k3", otp="654321")
+
+    assert response.status_code == 422
+    mock_complete.assert_awaited_once()
+
+
+def test_requests_without_a_key_always_run(client):
+    with patch(
+        "app.api.auth_otp.complete_register_with_email_otp", new_callable=AsyncMock
+    ) as mock_complete:
+        mock_complete.return_value = {"id": "user123"}
+        for _ in range(2):
+            client.post(
+                "/api/auth/otp/register/complete",
+                params={"email": "test@example.com", "password": "Pass123", "otp": "123456"},
+            )
+
+    assert mock_complete.await_count == 2
+
+
+def test_server_errors_and_throttling_are_not_stored():
+    statuses = iter([503, 429, 200])
+    calls = []
+    router = APIRouter(route_class=IdempotencyRoute)
+
+    @router.post("/thing")
+    async def thing():
+        calls.append(1)
+        status = next(statuses)
+        if status == 429:
+            raise HTTPException(status_code=429, detail="slow down", headers={"Retry-After": "3"})
+        return JSONResponse({"status": status}, status_code=status)
+
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+
+    responses = [client.post("/thing", headers={"Idempotency-Key": "k"}) for _ in range(4)]
+
+    assert [r.status_code for r in responses] == [503, 429, 200, 200]
+    assert responses[1].headers["Retry-After"] == "3"
+    assert len(calls) == 3
+
+
+# ---------------------------------------------------------------------------
+# Concurrent duplicates
+# ---------------------------------------------------------------------------
+def stored() -> _StoredResponse:
+    return _StoredResponse("fp", JSONResponse({"ok": True}))
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_wait_for_the_first_response():
+    store = IdempotencyStore()
+    release = asyncio.Event()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await release.wait()
+        return stored()
+
+    tasks = [asyncio.create_task(store.run("k", "fp", call)) for _ in range(10)]
+    await asyncio.sleep(0)
+    release.set()
+    responses = await asyncio.gather(*tasks)
+
+    assert len(calls) == 1
+    assert all(r.status_code == 200 for r in responses)
+    assert sum(REPLAYED_HEADER in r.headers for r in responses) == 9
+    assert store.stats()["coalesced"] == 9
+
+
+@pytest.mark.asyncio
+async def test_failure_reaches_waiters_and_is_not_stored():
+    store = IdempotencyStore()
+    release = asyncio.Event()
+
+    async def failing():
+        await release.wait()
+        raise RuntimeError("boom")
+
+    tasks = [asyncio.create_task(store.run("k", "fp", failing)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    async def ok():
+        return stored()
+
+    response = await store.run("k", "fp", ok)
+    assert response.status_code == 200
+    assert REPLAYED_HEADER not in response.headers
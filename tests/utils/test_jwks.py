@@ -0,0 +1,128 @@
+import json
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from fastapi import HTTPException
+from jwt.algorithms import ECAlgorithm, RSAAlgorithm
+
+from app.utils import auth_dependency, jwks
+from app.utils.jwks import JWKSKeySet, file_jwks_fetcher
+
+
+def rsa_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def jwk_for(private_key, kid: str) -> dict:
+    if isinstance(private_key, rsa.RSAPrivateKey):
+        data = RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+        data["alg"] = "RS256"
+    else:
+        data = ECAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+        data["alg"] = "ES256"
+    data.update(kid=kid, use="sig")
+    return data
+
+
+def sign(private_key, kid: str, algorithm: str) -> str:
+    payload = {"sub": "user123", "exp": int(time.time()) + 3600}
+    return jwt.encode(payload, private_key, algorithm=algorithm, headers={"kid": kid})
+
+
+@pytest.fixture
+def jwks_file(tmp_path):
+    path = tmp_path / "jwks.json"
+
+    def write(*keys):
+        path.write_text(json.dumps({"keys": list(keys)}))
+
+    write.path = path
+    return write
+
+
+@pytest.fixture
+def key_set(jwks_file, monkeypatch):
+    key_set = JWKSKeySet(file_jwks_fetcher(jwks_file.path), min_refresh_interval=0)
+    monkeypatch.setattr(jwks, "key_set", key_set)
+    auth_dependency.token_cache.clear()
+    yield key_set
+    auth_dependency.token_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_verifies_rs256_and_es256_tokens_by_kid(jwks_file, key_set):
+    rsa_private = rsa_key()
+    ec_private = ec.generate_private_key(ec.SECP256R1())
+    jwks_file(jwk_for(rsa_private, "rsa-1"), jwk_for(ec_private, "ec-1"))
+    assert await key_set.refresh()
+
+    assert auth_dependency.verify_token(sign(rsa_private, "rsa-1", "RS256"))["sub"] == "user123"
+    assert auth_dependency.verify_token(sign(ec_private, "ec-1", "ES256"))["sub"] == "user123"
+
+
+@pytest.mark.asyncio
+async def test_unknown_kid_is_rejected_and_triggers_refresh(jwks_file, key_set):
+    old, new = rsa_key(), rsa_key()
+    jwks_file(jwk_for(old, "old"))
+    await key_set.refresh()
+
+    token = sign(new, "new", "RS256")
+    with pytest.raises(HTTPException) as exc:
+        auth_dependency.verify_token(token)
+    assert exc.value.status_code == 401
+    assert key_set._wake.is_set()
+
+    # key rotation: the refresher picks up the new kid
+    jwks_file(jwk_for(old, "old"), jwk_for(new, "new"))
+    await key_set.refresh()
+    assert auth_dependency.verify_token(token)["sub"] == "user123"
+
+
+@pytest.mark.asyncio
+async def test_token_signed_with_wrong_key_is_rejected(jwks_file, key_set):
+    jwks_file(jwk_for(rsa_key(), "rsa-1"))
+    await key_set.refresh()
+
+    with pytest.raises(HTTPException):
+        auth_dependency.verify_token(sign(rsa_key(), "rsa-1", "RS256"))
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_keeps_previous_keys(jwks_file, key_set):
+    jwks_file(jwk_for(rsa_key(), "rsa-1"))
+    await key_set.refresh()
+
+    jwks_file.path.write_text("not json")
+    assert not await key_set.refresh()
+    assert key_set.kids == ["rsa-1"]
+    assert key_set.stats()["refresh_failures"] == 1
+
+
+@pytest.mark.asyncio
+async def test_hs256_is_refused_when_no_secret_is_set(jwks_file, key_set, monkeypatch):
+    monkeypatch.setattr(auth_dependency, "SUPABASE_JWT_SECRET", "")
+    jwks_file(jwk_for(rsa_key(), "rsa-1"))
+    await key_set.refresh()
+    forged = jwt.encode({"sub": "x", "role": "service_role", "exp": int(time.time()) + 60}, "", algorithm="HS256")
+
+    with pytest.raises(HTTPException) as exc:
+        auth_dependency.verify_token(forged)
+    assert exc.value.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_without_a_secret_or_a_jwks_only_token_checks_fail(monkeypatch, caplog):
+    monkeypatch.setattr(jwks, "SUPABASE_JWKS_URL", "")
+    monkeypatch.setattr(jwks, "SUPABASE_JWT_SECRET", "")
+    monkeypatch.setattr(auth_dependency, "SUPABASE_JWT_SECRET", "")
+    monkeypatch.setattr(jwks, "key_set", None)
+
+    await jwks.init_jwks(None)
+    assert "cannot be verified" in caplog.text
+
+    token = jwt.encode({"sub": "x", "exp": int(time.time()) + 60}, "", algorithm="HS256")
+    with pytest.raises(HTTPException) as exc:
+        auth_dependency.verify_token(token)
+    assert exc.value.status_code == 503
@@ -0,0 +1,85 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.utils import metrics
+from app.utils.executors import BoundedExecutor
+from app.utils.metrics import Histogram, MetricsMiddleware, RequestTimings, current_timings, record_dependency
+
+
+@pytest.fixture(autouse=True)
+def clear_histograms():
+    for histogram in metrics.histograms:
+        histogram.clear()
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("h_seconds", "help", ("route",), buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 0.5, 5):
+        histogram.observe(("/a",), seconds)
+
+    lines = list(histogram.render())
+
+    assert lines[:2] == ["# HELP h_seconds help", "# TYPE h_seconds histogram"]
+    assert lines[2:] == [
+        'h_seconds_bucket{route="/a",le="0.1"} 1',
+        'h_seconds_bucket{route="/a",le="1.0"} 3',
+        'h_seconds_bucket{route="/a",le="+Inf"} 4',
+        'h_seconds_sum{route="/a"} 6.05',
+        'h_seconds_count{route="/a"} 4',
+    ]
+
+
+def test_dependency_calls_outside_a_request_are_only_counted():
+    record_dependency("db", "fetch", 0.01)
+    assert metrics.dependency_duration.count(("db", "fetch")) == 1
+
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, server_timing=True)
+
+    @app.get("/users/{user_id}")
+    async def get_user(user_id: str):
+        record_dependency("db", "fetchrow", 0.004)
+        record_dependency("db", "fetchrow", 0.002)
+        record_dependency("http", "supabase.login", 0.03)
+        return {"id": user_id}
+
+    return app
+
+
+def test_middleware_labels_by_route_template_and_sets_server_timing(app):
+    client = TestClient(app)
+
+    response = client.get("/users/1")
+    client.get("/users/2")
+    client.get("/nowhere")
+
+    assert response.headers["Server-Timing"].startswith("app;dur=")
+    assert 'db;dur=6.0;desc="2 calls"' in response.headers["Server-Timing"]
+    assert "http;dur=30.0" in response.headers["Server-Timing"]
+    assert metrics.request_duration.count(("GET", "/users/{user_id}", "200")) == 2
+    assert metrics.request_duration.count(("GET", "unmatched", "404")) == 1
+    assert metrics.request_dependency_duration.count(("/users/{user_id}", "db")) == 2
+    assert current_timings.get() is None
+
+
+def test_server_timing_can_be_turned_off(app):
+    app.user_middleware[0].kwargs["server_timing"] = False
+    assert "Server-Timing" not in TestClient(app).get("/users/1").headers
+
+
+@pytest.mark.asyncio
+async def test_executor_calls_are_charged_to_the_submitting_request():
+    executor = BoundedExecutor("test", max_workers=1, max_queue=1)
+    timings = RequestTimings()
+    token = current_timings.set(timings)
+    try:
+        await executor.run(record_dependency, "smtp", "send", 0.1)
+    finally:
+        current_timings.reset(token)
+        executor.shutdown()
+
+    assert timings.seconds == {"smtp": 0.1}
@@ -0,0 +1,121 @@
+import pytest
+
+from app.utils import otp_utils
+from app.utils.otp_utils import (
+    derive_otp,
+    new_nonce,
+    verify_stateless_otp,
+    OTP_OK,
+    OTP_MISSING,
+    OTP_EXPIRED,
+    OTP_MISMATCH,
+)
+
+NOW = 1_760_000_000
+
+
+@pytest.fixture(autouse=True)
+def stateless_secret(monkeypatch):
+    monkeypatch.setattr(otp_utils, "OTP_STATELESS_SECRET", "test-secret")
+
+
+def test_derive_otp_is_deterministic_six_digits():
+    nonce = new_nonce(now=NOW)
+    otp = derive_otp("a@example.com", "login", nonce)
+
+    assert len(otp) == 6 and otp.isdigit()
+    assert derive_otp("A@example.com", "login", nonce) == otp
+    # a fresh nonce yields a fresh code
+    assert len({derive_otp("a@example.com", p, new_nonce(now=NOW)) for p in ["login"] * 20}) > 1
+
+
+def test_derive_otp_requires_secret(monkeypatch):
+    monkeypatch.setattr(otp_utils, "OTP_STATELESS_SECRET", "")
+    with pytest.raises(RuntimeError):
+        derive_otp("a@example.com", "login", new_nonce())
+
+
+def test_verify_stateless_otp_results():
+    nonce = new_nonce(now=NOW)
+    otp = derive_otp("a@example.com", "login", nonce)
+    wrong = str((int(otp) + 1) % 1_000_000).zfill(6)
+
+    assert verify_stateless_otp("a@example.com", "login", otp, nonce, now=NOW + 60) == OTP_OK
+    assert verify_stateless_otp("a@example.com", "login", wrong, nonce, now=NOW + 60) == OTP_MISMATCH
+    assert verify_stateless_otp("a@example.com", "login", otp, nonce, now=NOW + 601) == OTP_EXPIRED
+    assert verify_stateless_otp("a@example.com", "login", otp, "garbage", now=NOW) == OTP_MISSING
+
+
+def test_verify_stateless_otp_rejects_edited_issue_time():
+    nonce = new_nonce(now=NOW)
+    otp = derive_otp("a@example.com", "login", nonce)
+    stretched = f"{NOW + 3600}.{nonce.split('.', 1)[1]}"
+
+    assert verify_stateless_otp("a@example.com", "login", otp, stretched, now=NOW + 3700) == OTP_MISSING
+
+
+def test_nonces_we_did_not_issue_are_refused():
+    nonce = new_nonce(now=NOW)
+    forged = f"{NOW}.made-up.{nonce.rsplit('.', 1)[1]}"
+
+    assert otp_utils.is_authentic_nonce(nonce)
+    assert not otp_utils.is_authentic_nonce(forged)
+    assert not otp_utils.is_authentic_nonce(f"{NOW}.made-up")
+    otp = derive_otp("a@example.com", "login", forged)
+    assert verify_stateless_otp("a@example.com", "login", otp, forged, now=NOW) == OTP_MISSING
+
+
+def test_verify_stateless_otp_only_accepts_six_digit_codes():
+    nonce = new_nonce(now=NOW)
+    otp = derive_otp("a@example.com", "login", nonce)
+
+    # the expected code is never sized from the guess
+    for guess in [otp[-1], otp[-3:], "", otp + "0", "１２３４５６"]:
+        assert verify_stateless_otp("a@example.com", "login", guess, nonce, now=NOW) == OTP_MISMATCH
+
+
+def test_generate_otps_are_six_digit_codes():
+    otps = otp_utils.generate_otps(1000)
+
+    assert len(otps) == 1000
+    assert all(len(otp) == 6 and otp.isdigit() for otp in otps)
+    assert len(set(otps)) > 990
+
+
+def test_hash_otps_matches_hash_otp():
+    otps = ["000123", "999999"]
+    assert otp_utils.hash_otps(otps) == [otp_utils.hash_otp(otp) for otp in otps]
+
+
+def test_codes_are_never_hashed_without_a_key(monkeypatch):
+    monkeypatch.setattr(otp_utils, "OTP_HASH_SECRET", "")
+    with pytest.raises(RuntimeError):
+        otp_utils.hash_otp("123456")
+    with pytest.raises(RuntimeError):
+        otp_utils.hash_otps(["123456"])
+
+
+def test_startup_refuses_a_short_hash_secret(monkeypatch):
+    monkeypatch.setattr(otp_utils, "OTP_HASH_SECRET", "short")
+    with pytest.raises(RuntimeError):
+        otp_utils.check_otp_settings()
+
+    monkeypatch.setattr(otp_utils, "OTP_HASH_SECRET", "x" * otp_utils.OTP_SECRET_MIN_LENGTH)
+    otp_utils.check_otp_settings()
+
+
+def test_startup_allows_stateless_mode_for_login_only(monkeypatch):
+    monkeypatch.setattr(otp_utils, "OTP_HASH_SECRET", "x" * otp_utils.OTP_SECRET_MIN_LENGTH)
+    monkeypatch.setattr(otp_utils, "OTP_STATELESS_SECRET", "y" * otp_utils.OTP_SECRET_MIN_LENGTH)
+    monkeypatch.setattr(otp_utils, "OTP_STATELESS_PURPOSES", frozenset({"login"}))
+    otp_utils.check_otp_settings()
+
+    monkeypatch.setattr(otp_utils, "OTP_STATELESS_PURPOSES", frozenset({"login", "register"}))
+    with pytest.raises(RuntimeError, match="register"):
+        otp_utils.check_otp_settings()
+
+    # stateless login needs its own key
+    monkeypatch.setattr(otp_utils, "OTP_STATELESS_PURPOSES", frozenset({"login"}))
+    monkeypatch.setattr(otp_utils, "OTP_STATELESS_SECRET", "")
+    with pytest.raises(RuntimeError):
+        otp_utils.check_otp_settings()
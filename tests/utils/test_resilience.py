@@ -0,0 +1,232 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.utils.resilience import AdaptiveLimit, CircuitBreaker, Endpoint, RetryBudget, UpstreamGuard
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_breaker_opens_on_failure_ratio_and_probes_after_cooldown():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_ratio=0.5, window=4, min_calls=4, open_seconds=10, clock=clock)
+
+    for failed in (False, True, False):
+        assert breaker.allow() == 0
+        breaker.record(failed)
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow() == 10
+
+    clock.now += 10
+    assert breaker.allow() == 0          # the probe
+    assert breaker.allow() > 0           # nobody else while it runs
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats()["recent_calls"] == 0
+
+
+def test_breaker_failed_probe_reopens():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_ratio=1.0, window=2, min_calls=2, open_seconds=5, clock=clock)
+    breaker.record(True)
+    breaker.record(True)
+
+    clock.now += 5
+    assert breaker.allow() == 0
+    breaker.record(True)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened == 2
+
+
+def test_breaker_window_forgets_old_failures():
+    breaker = CircuitBreaker(failure_ratio=0.5, window=4, min_calls=4, clock=FakeClock())
+    for failed in (True, False, False, False, False):
+        breaker.record(failed)
+    assert breaker.stats()["recent_failures"] == 0
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_retry_budget_is_a_share_of_traffic():
+    clock = FakeClock()
+    budget = RetryBudget(ratio=0.5, min_per_second=0, max_tokens=1, clock=clock)
+
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    budget.deposit()
+    budget.deposit()
+    assert budget.try_spend()
+    assert (budget.retries, budget.exhausted) == (2, 1)
+
+
+def test_retry_budget_trickles_in_over_time():
+    clock = FakeClock()
+    budget = RetryBudget(ratio=0, min_per_second=1, max_tokens=1, clock=clock)
+    assert budget.try_spend()
+    assert not budget.try_spend()
+
+    clock.now += 1
+    assert budget.try_spend()
+
+
+def test_adaptive_limit_refuses_over_limit_and_backs_off_once_per_round_trip():
+    clock = FakeClock()
+    limit = AdaptiveLimit(initial=4, min_limit=1, max_limit=8, slow_seconds=1, clock=clock)
+    started = [limit.try_acquire() for _ in range(4)]
+    assert limit.try_acquire() is None
+
+    clock.now += 2                       # all four were slow
+    for started_at in started:
+        limit.release(started_at, failed=False)
+
+    assert limit.limit == 2
+    assert limit.stats() == {"limit": 2, "in_flight": 0, "rejected": 1}
+
+
+def test_adaptive_limit_grows_additively():
+    clock = FakeClock()
+    limit = AdaptiveLimit(initial=2, max_limit=3, clock=clock)
+    for _ in range(10):
+        limit.release(limit.try_acquire(), failed=False)
+    assert limit.limit == 3
+
+
+def test_adaptive_limit_keeps_the_rest_of_the_limit_from_a_capped_share():
+    limit = AdaptiveLimit(initial=4, clock=FakeClock())
+    assert limit.try_acquire(share=0.5) is not None
+    assert limit.try_acquire(share=0.5) is not None
+    assert limit.try_acquire(share=0.5) is None
+
+    # full-share callers still get the other half
+    assert limit.try_acquire() is not None
+    assert limit.try_acquire() is not None
+    assert limit.try_acquire() is None
+
+
+def response(status: int) -> httpx.Response:
+    return httpx.Response(status, json={})
+
+
+def guard(**kwargs) -> UpstreamGuard:
+    return UpstreamGuard(
+        "Upstream",
+        limit=kwargs.pop("limit", AdaptiveLimit(initial=10)),
+        budget=kwargs.pop("budget", RetryBudget(max_tokens=10)),
+        breaker_factory=lambda: CircuitBreaker(failure_ratio=0.5, window=4, min_calls=4),
+        retry_backoff_seconds=0,
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_guard_retries_idempotent_calls_only():
+    upstream = guard()
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        return response(503 if len(calls) == 1 else 200)
+
+    r = await upstream.call(Endpoint("read", 1, idempotent=True), flaky)
+    assert r.status_code == 200 and len(calls) == 2
+
+    calls.clear()
+    r = await upstream.call(Endpoint("write", 1), flaky)
+    assert r.status_code == 503 and len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_guard_passes_client_errors_through_without_counting_them():
+    upstream = guard()
+
+    for _ in range(5):
+        assert (await upstream.call(Endpoint("login", 1), lambda: asyncio.sleep(0, response(400)))).status_code == 400
+
+    assert upstream.breakers["login"].state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_guard_times_out_then_sheds_while_open():
+    upstream = guard(budget=RetryBudget(max_tokens=0, min_per_second=0))
+    sent = 0
+
+    async def hangs():
+        nonlocal sent
+        sent += 1
+        await asyncio.sleep(1)
+
+    endpoint = Endpoint("slow", 0.01, idempotent=True)
+    for _ in range(4):
+        with pytest.raises(HTTPException) as exc:
+            await upstream.call(endpoint, hangs)
+        assert exc.value.status_code == 504
+
+    with pytest.raises(HTTPException) as exc:
+        await upstream.call(endpoint, hangs)
+    assert exc.value.status_code == 503
+    assert int(exc.value.headers["Retry-After"]) >= 1
+    assert sent == 4
+    assert upstream.stats()["timeouts"] == 4
+
+
+@pytest.mark.asyncio
+async def test_guard_refuses_calls_over_the_concurrency_limit():
+    upstream = guard(limit=AdaptiveLimit(initial=1))
+    release = asyncio.Event()
+
+    async def held():
+        await release.wait()
+        return response(200)
+
+    first = asyncio.create_task(upstream.call(Endpoint("e", 1), held))
+    await asyncio.sleep(0)
+    with pytest.raises(HTTPException) as exc:
+        await upstream.call(Endpoint("e", 1), held)
+    assert exc.value.status_code == 503
+
+    release.set()
+    assert (await first).status_code == 200
+    assert upstream.limit.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_guard_maps_transport_errors_to_502():
+    upstream = guard()
+
+    async def refused():
+        raise httpx.ConnectError("connection refused")
+
+    with pytest.raises(HTTPException) as exc:
+        await upstream.call(Endpoint("e", 1), refused)
+    assert exc.value.status_code == 502
+
+
+@pytest.mark.asyncio
+async def test_guard_refuses_a_capped_endpoint_before_the_full_limit():
+    upstream = guard(limit=AdaptiveLimit(initial=2))
+    release = asyncio.Event()
+
+    async def held():
+        await release.wait()
+        return response(200)
+
+    bulk = Endpoint("bulk", 1, limit_share=0.5)
+    first = asyncio.create_task(upstream.call(bulk, held))
+    await asyncio.sleep(0)
+    with pytest.raises(HTTPException) as exc:
+        await upstream.call(bulk, held)
+    assert exc.value.status_code == 503
+
+    interactive = asyncio.create_task(upstream.call(Endpoint("login", 1), held))
+    await asyncio.sleep(0)
+    release.set()
+    assert (await first).status_code == (await interactive).status_code == 200
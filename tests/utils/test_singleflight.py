@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from app.utils.singleflight import SingleFlight
+from app.utils.ttl_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+# ------------------------------------------------------------------------------
+# TTLCache
+# ------------------------------------------------------------------------------
+def test_ttl_cache_expires_entries():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    clock.now = 5
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert cache.stats()["evictions"] == 1
+
+
+# ------------------------------------------------------------------------------
+# SingleFlight
+# ------------------------------------------------------------------------------
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_upstream_call():
+    flight = SingleFlight()
+    calls = 0
+
+    async def upstream():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"access_token": "new"}
+
+    results = await asyncio.gather(*(flight.do("k", upstream) for _ in range(10)))
+
+    assert calls == 1
+    assert all(r == {"access_token": "new"} for r in results)
+    assert flight.stats()["coalesced"] == 9
+
+
+@pytest.mark.asyncio
+async def test_late_duplicates_get_cached_result():
+    clock = FakeClock()
+    flight = SingleFlight(result_ttl=5, clock=clock)
+    calls = 0
+
+    async def upstream():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert await flight.do("k", upstream) == 1
+    assert await flight.do("k", upstream) == 1
+    clock.now = 6
+    assert await flight.do("k", upstream) == 2
+    assert flight.stats()["cache_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failures_are_shared_but_not_cached():
+    flight = SingleFlight(result_ttl=5)
+    calls = 0
+
+    async def upstream():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("rotated")
+
+    results = await asyncio.gather(
+        *(flight.do("k", upstream) for _ in range(3)), return_exceptions=True
+    )
+    assert calls == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    with pytest.raises(RuntimeError):
+        await flight.do("k", upstream)
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_cancel_followers():
+    flight = SingleFlight()
+
+    async def upstream():
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    leader = asyncio.ensure_future(flight.do("k", upstream))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flight.do("k", upstream))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == "ok"
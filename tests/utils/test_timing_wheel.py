@@ -0,0 +1,47 @@
+import random
+
+from app.utils.timing_wheel import TimingWheel
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_items_expire_on_their_tick():
+    clock = FakeClock()
+    wheel = TimingWheel(clock=clock)
+    wheel.schedule("a", clock.now + 3)
+    wheel.schedule("b", clock.now + 10)
+
+    assert wheel.advance(clock.now + 2) == []
+    assert wheel.advance(clock.now + 3) == ["a"]
+    assert wheel.advance(clock.now + 10) == ["b"]
+    assert len(wheel) == 0
+
+
+def test_deadlines_across_levels_and_beyond_range():
+    clock = FakeClock()
+    # 4 slots x 2 levels = 16 ticks of range; later deadlines wrap in the top level
+    wheel = TimingWheel(slot_bits=2, levels=2, clock=clock)
+    delays = random.Random(7).sample(range(1, 200), 60)
+    for delay in delays:
+        wheel.schedule(delay, clock.now + delay)
+
+    seen = {}
+    for step in range(1, 201):
+        for item in wheel.advance(clock.now + step):
+            seen[item] = step
+
+    assert seen == {delay: delay for delay in delays}
+
+
+def test_past_deadline_expires_on_next_tick():
+    clock = FakeClock()
+    wheel = TimingWheel(clock=clock)
+    wheel.schedule("late", clock.now - 5)
+
+    assert wheel.advance(clock.now + 1) == ["late"]